@@ -0,0 +1,82 @@
+"""
+Benchmarks of the DB-backed pipeline on synthetic extraction API payloads.
+
+Every round runs on a fresh copy of a template database, so writes of one
+round do not affect the next.
+"""
+import shutil
+
+import pytest
+
+from modules.lca_processor import LCAProcessor
+from modules.cost_processor import CostProcessor
+from modules.storage.db_manager import DatabaseManager
+from conftest import BENCH_PROJECT_ID, BENCH_ROUNDS
+
+
+def run_lca(db):
+    processor = LCAProcessor(None, None, db, project_id=BENCH_PROJECT_ID)
+    processor.load_data()
+    processor.process_data()
+    return processor.results
+
+
+def run_cost(db):
+    processor = CostProcessor(None, None, None, db, project_id=BENCH_PROJECT_ID)
+    processor.load_data()
+    processor.process_data()
+    return processor.results
+
+
+@pytest.fixture(scope="session")
+def lca_results(seeded_db, scale, tmp_path_factory):
+    """LCA results of the current scale, computed once as input for save_project_results"""
+    db_path = tmp_path_factory.mktemp(f"lca_{scale}") / "lca.duckdb"
+    shutil.copy(seeded_db, db_path)
+    db = DatabaseManager(str(db_path))
+    try:
+        return run_lca(db)
+    finally:
+        db.close()
+
+
+def bench_store_ifc_elements(benchmark, scale, elements, reference_db, db_copy):
+    def setup():
+        return (db_copy(reference_db), elements, BENCH_PROJECT_ID), {}
+
+    benchmark.extra_info["elements"] = scale
+    benchmark.pedantic(lambda db, *args: db.store_ifc_elements(*args), setup=setup, rounds=BENCH_ROUNDS)
+
+
+def bench_lca_processor(benchmark, scale, seeded_db, db_copy):
+    results = benchmark.pedantic(run_lca, setup=lambda: ((db_copy(seeded_db),), {}), rounds=BENCH_ROUNDS)
+
+    benchmark.extra_info["elements"] = scale
+    assert len(results) == scale
+    assert not any(component["failed"] for result in results for component in result["components"])
+
+
+def bench_cost_processor(benchmark, scale, seeded_db, db_copy):
+    results = benchmark.pedantic(run_cost, setup=lambda: ((db_copy(seeded_db),), {}), rounds=BENCH_ROUNDS)
+
+    benchmark.extra_info["elements"] = scale
+    assert len(results) == scale
+
+
+def bench_save_project_results(benchmark, scale, seeded_db, lca_results, db_copy):
+    def setup():
+        return (db_copy(seeded_db), BENCH_PROJECT_ID, lca_results), {}
+
+    benchmark.extra_info["elements"] = scale
+    benchmark.extra_info["components"] = sum(len(result["components"]) for result in lca_results)
+    benchmark.pedantic(lambda db, *args: db.save_project_results(*args), setup=setup, rounds=BENCH_ROUNDS)
+
+
+def bench_get_ifc_results(benchmark, scale, seeded_db, db_copy):
+    db = db_copy(seeded_db)
+
+    result = benchmark.pedantic(db.get_ifc_results, args=(BENCH_PROJECT_ID,), rounds=BENCH_ROUNDS)
+
+    benchmark.extra_info["elements"] = scale
+    assert result["ifcData"]["materials"]
+    assert result["materialMappings"]
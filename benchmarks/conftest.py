@@ -0,0 +1,69 @@
+import os
+import sys
+import shutil
+from pathlib import Path
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import pytest
+
+from modules.storage.db_manager import DatabaseManager
+from scripts.synthetic_elements import generate_elements, seed_reference_data
+
+BENCH_PROJECT_ID = "bench_project"
+
+# Element counts to benchmark, e.g. BENCH_SCALES=1000,10000,100000,1000000
+BENCH_SCALES = [int(scale) for scale in os.getenv("BENCH_SCALES", "1000,10000").split(",") if scale.strip()]
+BENCH_ROUNDS = int(os.getenv("BENCH_ROUNDS", "3"))
+
+
+def pytest_generate_tests(metafunc):
+    if "scale" in metafunc.fixturenames:
+        metafunc.parametrize("scale", BENCH_SCALES, ids=[f"{scale}" for scale in BENCH_SCALES], scope="session")
+
+
+@pytest.fixture(scope="session")
+def elements(scale):
+    """Extraction-API-shaped elements for the current scale"""
+    return generate_elements(scale, seed=scale)
+
+
+@pytest.fixture(scope="session")
+def reference_db(tmp_path_factory):
+    """Database file holding only reference data and material mappings"""
+    db_path = tmp_path_factory.mktemp("reference") / "reference.duckdb"
+    db = DatabaseManager(str(db_path))
+    seed_reference_data(db, BENCH_PROJECT_ID)
+    db.close()
+    return db_path
+
+
+@pytest.fixture(scope="session")
+def seeded_db(tmp_path_factory, reference_db, elements, scale):
+    """Database file with reference data and the stored elements of the current scale"""
+    db_path = tmp_path_factory.mktemp(f"seeded_{scale}") / "seeded.duckdb"
+    shutil.copy(reference_db, db_path)
+    db = DatabaseManager(str(db_path))
+    db.store_ifc_elements(elements, BENCH_PROJECT_ID)
+    db.close()
+    return db_path
+
+
+@pytest.fixture
+def db_copy(tmp_path):
+    """Factory opening a fresh copy of a template database, so every round starts from the same state"""
+    opened = []
+
+    def copy(template: Path) -> DatabaseManager:
+        db_path = tmp_path / f"round_{len(opened)}.duckdb"
+        shutil.copy(template, db_path)
+        db = DatabaseManager(str(db_path))
+        opened.append(db)
+        return db
+
+    yield copy
+    for db in opened:
+        db.close()
@@ -1,12 +1,21 @@
 from abc import ABC, abstractmethod
 import pandas as pd
-from typing import Any, Dict, List, Optional
+import pyarrow as pa
+from typing import Any, Dict, Iterator, List, Optional
 from modules.storage.minio_manager import MinioManager
-from utils.shared_utils import load_data, save_data_to_json, ensure_output_directory
+from modules.storage.db_manager import DEFAULT_PROJECT_ID
+from utils.shared_utils import load_data, stream_data_to_json, ensure_output_directory
 import os
 import logging
 
+# Number of result components converted to Arrow at a time
+RESULT_BATCH_SIZE = 10_000
+
 class BaseProcessor(ABC):
+    # Prefix and file name of the results in MinIO: {result_type}/{project_id}/{result_filename}_{timestamp}.parquet
+    result_type = "results"
+    result_filename = "results"
+
     def __init__(self, input_file_path: str, output_file: Optional[str] = None, minio_config: Optional[Dict[str, Any]] = None):
         self.input_file_path = input_file_path
         self.output_file = output_file
@@ -29,19 +38,62 @@ class BaseProcessor(ABC):
         """Process the data and store results."""
         pass
 
+    def iter_result_rows(self) -> Iterator[Dict[str, Any]]:
+        """Yield one flat row per result component, tagged with its element's shared_guid flag."""
+        for result in self.results:
+            for component in result.get("components", []):
+                row = dict(component)
+                row.setdefault("guid", result.get("guid"))
+                row["shared_guid"] = result.get("shared_guid", False)
+                yield row
+
+    def results_to_table(self) -> pa.Table:
+        """Convert the results into an Arrow table with one row per component.
+
+        Rows are collected column-wise in batches of RESULT_BATCH_SIZE, so
+        only the values of one batch exist as Python lists at a time. Columns
+        are the union of the component keys: failed components lack the
+        metric columns, which are null for them. NaN values (e.g. empty CSV
+        cells) are stored as null.
+        """
+        def batch(columns: Dict[str, List[Any]]) -> pa.Table:
+            return pa.table({key: pa.array(values, from_pandas=True) for key, values in columns.items()})
+
+        tables = []
+        columns: Dict[str, List[Any]] = {}
+        num_rows = 0
+        for row in self.iter_result_rows():
+            for key in row:
+                if key not in columns:
+                    columns[key] = [None] * num_rows
+            for key, values in columns.items():
+                values.append(row.get(key))
+            num_rows += 1
+            if num_rows >= RESULT_BATCH_SIZE:
+                tables.append(batch(columns))
+                columns, num_rows = {}, 0
+        if num_rows or not tables:
+            tables.append(batch(columns))
+        # Batches may still differ in their columns, have all-null ones or integers where others have
+        # floats, so schemas are unified with type widening
+        return pa.concat_tables(tables, promote_options="permissive")
+
     def save_results(self):
-        """Save results to output file."""
+        """Upload results to MinIO as Parquet and optionally write them to a local JSON file."""
         if self.results is None:
             raise ValueError("No results to save. Run process_data first.")
 
+        if self.minio_manager:
+            project_id = getattr(self, "project_id", None) or DEFAULT_PROJECT_ID
+            object_path = self.minio_manager.store_results(
+                project_id, self.result_filename, self.results_to_table(), self.result_type
+            )
+            logging.info(f"Results uploaded to MinIO: {object_path}")
+
         if self.output_file:
-            save_data_to_json(self.results, self.output_file)
+            stream_data_to_json(self.results, self.output_file)
             logging.info(f"Results saved to {self.output_file}")
 
-            if self.minio_manager:
-                self.minio_manager.upload_file(self.output_file)
-                logging.info(f"Results uploaded to MinIO")
-
     def run(self):
         """Run the complete processing pipeline."""
         self.load_data()
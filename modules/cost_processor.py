@@ -7,18 +7,27 @@ import pandas as pd
 
 
 from modules.base_processor import BaseProcessor
+from modules.ebkp_index import EbkpIndex, cost_index
 from modules.storage.db_manager import DatabaseManager, DEFAULT_PROJECT_ID
+from utils.metrics import stage_timer
 from utils.shared_utils import validate_columns, validate_value, ensure_output_directory, save_data_to_json
 
 class CostProcessor(BaseProcessor):
+    result_type = "cost"
+    result_filename = "cost_results"
+
     def __init__(self, input_file_path, data_file_path, output_file, 
-                 db, minio_config=None, project_id=None, project_name=None):
+                 db, minio_config=None, project_id=None, project_name=None, element_ids=None):
         super().__init__(input_file_path, output_file, minio_config)
         self.data_file_path = data_file_path
         self.db = db
         self.project_id = project_id or DEFAULT_PROJECT_ID
         self.project_name = project_name or f"Cost Project {self.project_id}"
+        # Elements to (re)compute when loading from the database; None for all of the project
+        self.element_ids = element_ids
         self.processing_start_time = None
+        # Project status set at the end of process_data
+        self.project_status = None
     
     def load_data(self):
         # Initialize project in the database (Cost processing doesn't use a KBOB version)
@@ -34,7 +43,7 @@ class CostProcessor(BaseProcessor):
         # Load IFC element data. If no file was provided, load from the database.
         if self.input_file_path is None:
             # Load data from the database
-            elements = self.db.get_ifc_elements(self.project_id)
+            elements = self.db.get_ifc_elements(self.project_id, self.element_ids)
             for element in elements:
                 element["GUID"] = element.get("id")
                 element["Volume"] = element.get("volume_net")
@@ -69,13 +78,14 @@ class CostProcessor(BaseProcessor):
         else:
             self.data = pd.read_csv(self.data_file_path)
         
-        # Convert DataFrame to list of dictionaries if needed (for storing IFC elements)
-        csv_elements = self.element_data.to_dict('records')
-        if not csv_elements:
+        if self.element_data.empty:
             raise ValueError("No elements found in input data")
         
-        # Store IFC elements in database
-        self.db.store_ifc_elements(csv_elements, self.project_id)
+        # Store IFC elements from CSV input in the database. Elements loaded from the
+        # database are already stored; writing the flattened rows back would clear
+        # their quantities and eBKP codes.
+        if self.input_file_path is not None:
+            self.db.store_ifc_elements(self.element_data.to_dict('records'), self.project_id)
         
         self.validate_data()
         self.processing_start_time = time.time()
@@ -95,11 +105,21 @@ class CostProcessor(BaseProcessor):
             failed_elements = 0
             results = []
             
+            # Cost data per element, matched on normalized eBKP codes with fallback to parent codes
+            if self.data_file_path is None:
+                index = cost_index(self.db)
+            else:
+                index = EbkpIndex(zip(cost_data_df.index, cost_data_df.to_dict("records")), name="cost")
+            lookups = {}
+            element_costs = index.resolve(self.element_data['eBKP-H'], stats=lookups)
+            logging.info("Cost lookups of %d elements: %s", total_elements,
+                         ", ".join(f"{outcome}={count}" for outcome, count in lookups.items()))
+            
             # Process each element
-            for _, element in self.element_data.iterrows():
+            for (_, element), cost_data in zip(self.element_data.iterrows(), element_costs):
                 try:
-                    # Get cost data for element
-                    cost_data = cost_data_df.loc[element['eBKP-H']]
+                    if cost_data is None:
+                        raise KeyError(element['eBKP-H'])
                     
                     # Determine quantity based on reference unit
                     if cost_data['reference'] == 'm2':
@@ -160,7 +180,13 @@ class CostProcessor(BaseProcessor):
             
             self.results = results
             
-            # Update processing history
+            # Project-wide totals: a run over part of the elements adds the stored results of the others
+            if self.element_ids is not None:
+                unchanged = self.db.get_stored_result_counts(self.project_id, self.result_type, self.element_ids)
+                total_elements += unchanged["elements"]
+                failed_elements += unchanged["failed_components"]
+
+            # Update processing history; processed_elements are the ones computed in this run
             processing_time = time.time() - self.processing_start_time
             self.db.update_processing_history(
                 project_id=self.project_id,
@@ -176,6 +202,7 @@ class CostProcessor(BaseProcessor):
             # Update project status
             final_status = "completed" if failed_elements == 0 else "failed"
             self.db.update_project_status(self.project_id, final_status)
+            self.project_status = final_status
             
         except Exception as e:
             self.db.update_project_status(self.project_id, "failed")
@@ -183,11 +210,19 @@ class CostProcessor(BaseProcessor):
 
     def save_results(self):
         try:
-            self.db.save_project_results(self.project_id, self.results)
+            self.db.save_project_results(
+                self.project_id, self.results, result_type=self.result_type, element_ids=self.element_ids
+            )
             logging.info("Results successfully saved to the database.")
         except Exception as e:
             logging.error("Error saving results to the database", exc_info=True)
 
+        # Export to MinIO / local JSON if configured; results stay in the database on failure
+        try:
+            super().save_results()
+        except Exception as e:
+            logging.error("Error exporting results", exc_info=True)
+
         # Get and log final project info
         project_info = self.db.get_project_info(self.project_id)
         logging.info(f"Project processing completed. Status: {project_info['status']}")
@@ -196,9 +231,17 @@ class CostProcessor(BaseProcessor):
         if project_info.get('latest_processing'):
             logging.info(f"Processing time: {project_info['latest_processing'].get('processing_time', 0):.2f}s")
 
-    def __del__(self):
-        if hasattr(self, 'db'):
-            self.db.close()
+    def run(self):
+        """Run the cost pipeline, timing the load, compute and save phases."""
+        with stage_timer("cost") as stage:
+            with stage_timer("cost_load"):
+                self.load_data()
+            with stage_timer("cost_compute", rows=len(self.element_data)):
+                self.process_data()
+            with stage_timer("cost_save"):
+                self.save_results()
+            stage["rows"] = len(self.results)
+        return self.results
 
     def validate_data(self) -> None:
         """Validate that the required columns are present in the element data and cost data."""
@@ -0,0 +1,163 @@
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.metrics import EBKP_LOOKUPS
+
+_CODE_PATTERN = re.compile(r'([A-Z])(\d+)(?:\.(\d+))?(?:\.(\d+))?')
+
+# Lookup outcomes counted in EbkpIndex.stats
+HIT, FALLBACK, MISS = "hit", "fallback", "miss"
+
+# Indexes by kind and hash of their reference table, shared by all jobs
+_indexes: Dict[Tuple[str, Optional[str]], "EbkpIndex"] = {}
+_indexes_lock = threading.Lock()
+
+
+def _path(code) -> Optional[Tuple[str, ...]]:
+    """Trie path of a code: letter, main number and sub numbers without leading zeros."""
+    if code is None:
+        return None
+    code = str(code).replace(" ", "").upper()
+    if len(code) == 1 and "A" <= code <= "Z":
+        # A main group on its own
+        return (code,)
+    match = _CODE_PATTERN.match(code)
+    if not match:
+        return None
+    letter, main, *subs = match.groups()
+    return (letter, str(int(main))) + tuple(str(int(sub)) for sub in subs if sub is not None)
+
+
+def normalize_ebkp_code(code):
+    """Normalize an eBKP code: no spaces and no leading zeros, e.g. "C 02.01" -> "C2.1".
+
+    Anything after the code is dropped ("C2.1 Wand" -> "C2.1"); values that
+    do not start with a code are returned without spaces.
+    """
+    path = _path(code)
+    if path is None:
+        return str(code).replace(" ", "")
+    letter, *numbers = path
+    return letter + ".".join(numbers)
+
+
+class _Node:
+    __slots__ = ("children", "value", "has_value")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.value = None
+        self.has_value = False
+
+
+class EbkpIndex:
+    """Values per eBKP code in a trie of normalized codes, with fallback to parent codes.
+
+    Codes are matched after normalization (C02.01 finds C2.1); a code without
+    a value of its own resolves to its closest ancestor that has one (C2.1.5
+    -> C2.1 -> C2 -> C). Codes normalizing to the same one are merged with
+    combine (by default the first value is kept). Lookups are counted as
+    hits, fallbacks and misses in stats and in the nhmzh_ebkp_lookups_total
+    metric labelled with name.
+    """
+
+    def __init__(self, values: Iterable[Tuple[str, Any]], name: str = "ebkp",
+                 combine: Optional[Callable[[Any, Any], Any]] = None):
+        self.name = name
+        self._root = _Node()
+        self.size = 0
+        for code, value in values:
+            path = _path(code)
+            if path is None:
+                continue
+            node = self._root
+            for segment in path:
+                node = node.children.setdefault(segment, _Node())
+            if node.has_value:
+                node.value = combine(node.value, value) if combine else node.value
+            else:
+                node.value, node.has_value = value, True
+                self.size += 1
+        self._lock = threading.Lock()
+        self.stats = {HIT: 0, FALLBACK: 0, MISS: 0}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _find(self, code) -> Tuple[Any, str]:
+        path = _path(code)
+        if path is None:
+            return None, MISS
+        node, found = self._root, None
+        for segment in path:
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.has_value:
+                found = node
+        else:
+            if node.has_value:
+                return node.value, HIT
+        return (found.value, FALLBACK) if found is not None else (None, MISS)
+
+    def lookup(self, code, default: Any = None) -> Any:
+        """Value of a code or its closest ancestor, default when there is none."""
+        return self.resolve([code], default)[0]
+
+    def resolve(self, codes: Iterable, default: Any = None, stats: Optional[Dict[str, int]] = None) -> List[Any]:
+        """Values of a whole column of codes, each distinct code resolved once.
+
+        The outcomes are also added to stats if given, e.g. to report them per run.
+        """
+        resolved: Dict[Any, Tuple[Any, str]] = {}
+        counts = {HIT: 0, FALLBACK: 0, MISS: 0}
+        values = []
+        for code in codes:
+            found = resolved.get(code)
+            if found is None:
+                found = resolved[code] = self._find(code)
+            counts[found[1]] += 1
+            values.append(default if found[1] == MISS else found[0])
+        with self._lock:
+            for outcome, count in counts.items():
+                self.stats[outcome] += count
+        if stats is not None:
+            for outcome, count in counts.items():
+                stats[outcome] = stats.get(outcome, 0) + count
+        for outcome, count in counts.items():
+            if count:
+                EBKP_LOOKUPS.labels(index=self.name, result=outcome).inc(count)
+        return values
+
+
+def cached_index(kind: str, reference_hash: Optional[str], build: Callable[[], EbkpIndex]) -> EbkpIndex:
+    """The index of kind for a reference table with the given content hash, built on first use."""
+    key = (kind, reference_hash)
+    with _indexes_lock:
+        index = _indexes.get(key)
+    if index is None:
+        index = build()
+        with _indexes_lock:
+            # Replaces the index of an older version of the reference table
+            for stale in [stale for stale in _indexes if stale[0] == kind and stale != key]:
+                del _indexes[stale]
+            index = _indexes.setdefault(key, index)
+    return index
+
+
+def life_expectancy_index(db) -> EbkpIndex:
+    """Life expectancy in years per eBKP code (the shortest of merged codes), built once per table version."""
+    return cached_index(
+        "life_expectancy", db.get_reference_hash("life_expectancy"),
+        lambda: EbkpIndex(db.get_life_expectancies().items(), name="life_expectancy", combine=min),
+    )
+
+
+def cost_index(db) -> EbkpIndex:
+    """Cost reference rows (Kennwert, reference) per eBKP code, built once per table version."""
+    return cached_index(
+        "cost", db.get_reference_hash("cost_reference"),
+        lambda: EbkpIndex(((row["Code"], {"Kennwert": row["Kennwert"], "reference": row["reference"]})
+                           for row in db.get_cost_data(None)), name="cost"),
+    )
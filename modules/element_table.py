@@ -0,0 +1,224 @@
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Number of elements converted back to result dictionaries at a time
+RESULT_BATCH_SIZE = 10_000
+
+
+def _intern(values: Iterable[Optional[str]], vocabulary: Dict[str, int]) -> np.ndarray:
+    """Map strings to int32 codes into vocabulary (extended in place); missing values get -1."""
+    codes = []
+    for value in values:
+        if value is None or value == "":
+            codes.append(-1)
+            continue
+        code = vocabulary.get(value)
+        if code is None:
+            code = vocabulary[value] = len(vocabulary)
+        codes.append(code)
+    return np.array(codes, dtype=np.int32)
+
+
+def _float_column(values: List[Optional[float]]) -> np.ndarray:
+    """Convert values to float64, with NaN for missing values."""
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+class ElementTable:
+    """IFC elements and their material components as a struct of NumPy arrays.
+
+    Elements are stored column-wise (ids, ebkp) and their components in
+    contiguous runs: the components of element i are the rows
+    offsets[i]:offsets[i + 1] of the component columns. Material names and
+    eBKP codes are interned as int32 codes into the materials and ebkp_codes
+    vocabularies (-1 when missing), missing quantities are NaN.
+
+    Compared to the nested element dictionaries of the extraction API this
+    needs a fixed number of bytes per component plus one string per distinct
+    material, and lookups happen once per distinct material instead of once
+    per component.
+    """
+
+    def __init__(self, ids: np.ndarray, ebkp: np.ndarray, offsets: np.ndarray, material: np.ndarray,
+                 volume: np.ndarray, fraction: np.ndarray, density: np.ndarray,
+                 materials: List[str], ebkp_codes: List[str]):
+        self.ids = ids
+        self.ebkp = ebkp
+        self.offsets = offsets
+        self.material = material
+        self.volume = volume
+        self.fraction = fraction
+        self.density = density
+        self.materials = materials
+        self.ebkp_codes = ebkp_codes
+
+    @classmethod
+    def from_elements(cls, elements: List[Dict[str, Any]]) -> "ElementTable":
+        """Build the table from extraction API elements (id/guid, properties.ebkp, materials, material_volumes)."""
+        ids, ebkp, counts = [], [], []
+        material_names, volume, fraction, density = [], [], [], []
+        for element in elements:
+            ids.append(element.get("id") or element.get("guid"))
+            ebkp.append((element.get("properties") or {}).get("ebkp") or element.get("ebkp"))
+            materials = element.get("materials") or []
+            material_volumes = element.get("material_volumes") or {}
+            counts.append(len(materials))
+            for material_name in materials:
+                material_data = material_volumes.get(material_name) or {}
+                material_names.append(material_name)
+                volume.append(material_data.get("volume"))
+                fraction.append(material_data.get("fraction"))
+                density.append(material_data.get("density"))
+
+        material_vocabulary: Dict[str, int] = {}
+        ebkp_vocabulary: Dict[str, int] = {}
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(
+            ids=np.array(ids, dtype=object),
+            ebkp=_intern(ebkp, ebkp_vocabulary),
+            offsets=offsets,
+            material=_intern(material_names, material_vocabulary),
+            volume=_float_column(volume),
+            fraction=_float_column(fraction),
+            density=_float_column(density),
+            materials=list(material_vocabulary),
+            ebkp_codes=list(ebkp_vocabulary),
+        )
+
+    @classmethod
+    def from_arrow(cls, table: pa.Table) -> "ElementTable":
+        """Build the table from one row per component, grouped by element.
+
+        Expects the columns element_id, ebkp, material_name, volume, fraction
+        and density as returned by DatabaseManager.get_ifc_element_components;
+        elements without materials appear once with a null material_name.
+        """
+        element_ids = table.column("element_id").to_numpy(zero_copy_only=False)
+        num_rows = len(element_ids)
+        if num_rows:
+            starts = np.flatnonzero(np.r_[True, element_ids[1:] != element_ids[:-1]])
+        else:
+            starts = np.zeros(0, dtype=np.int64)
+
+        has_material = table.column("material_name").is_valid().to_numpy(zero_copy_only=False)
+        components = table.filter(pa.array(has_material))
+        # Components of an element = its rows that carry a material
+        component_counts = np.add.reduceat(has_material.astype(np.int64), starts) if num_rows else starts
+        offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+        np.cumsum(component_counts, out=offsets[1:])
+
+        material = pc.dictionary_encode(components.column("material_name").combine_chunks())
+        ebkp = pc.dictionary_encode(table.column("ebkp").take(pa.array(starts)).combine_chunks())
+        return cls(
+            ids=element_ids[starts],
+            ebkp=ebkp.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int32),
+            offsets=offsets,
+            material=material.indices.to_numpy(zero_copy_only=False).astype(np.int32),
+            volume=components.column("volume").to_numpy().astype(np.float64),
+            fraction=components.column("fraction").to_numpy().astype(np.float64),
+            density=components.column("density").to_numpy().astype(np.float64),
+            materials=material.dictionary.to_pylist(),
+            ebkp_codes=ebkp.dictionary.to_pylist(),
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def num_components(self) -> int:
+        return len(self.material)
+
+    @property
+    def component_counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def element_index(self) -> np.ndarray:
+        """Index of the owning element for every component."""
+        return np.repeat(np.arange(len(self), dtype=np.int64), self.component_counts)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory of the table including the interned strings."""
+        arrays = (self.ebkp, self.offsets, self.material, self.volume, self.fraction, self.density)
+        strings = sum(len(value) for value in self.materials) + sum(len(value) for value in self.ebkp_codes)
+        ids = sum(len(value) for value in self.ids if value)
+        return sum(array.nbytes for array in arrays) + self.ids.nbytes + strings + ids
+
+    def select(self, mask: np.ndarray) -> "ElementTable":
+        """Keep the elements where mask is True, together with their components."""
+        counts = self.component_counts[mask]
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        component_mask = np.repeat(mask, self.component_counts)
+        return ElementTable(
+            ids=self.ids[mask],
+            ebkp=self.ebkp[mask],
+            offsets=offsets,
+            material=self.material[component_mask],
+            volume=self.volume[component_mask],
+            fraction=self.fraction[component_mask],
+            density=self.density[component_mask],
+            materials=self.materials,
+            ebkp_codes=self.ebkp_codes,
+        )
+
+
+class ElementResults(Sequence):
+    """Per-element result dictionaries backed by an Arrow table with one row per component.
+
+    Rows of an element are offsets[i]:offsets[i + 1]. Dictionaries in the
+    format of BaseProcessor.results are only built when accessed, so
+    persistence and the Parquet export work on the table directly. Failed
+    components carry guid, material, failed and error only.
+    """
+
+    def __init__(self, table: pa.Table, offsets: np.ndarray):
+        self.table = table
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("element index out of range")
+        return next(self._iter_range(index, index + 1))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for start in range(0, len(self), RESULT_BATCH_SIZE):
+            yield from self._iter_range(start, min(start + RESULT_BATCH_SIZE, len(self)))
+
+    def _iter_range(self, start: int, stop: int) -> Iterator[Dict[str, Any]]:
+        first_row = int(self.offsets[start])
+        rows = self.table.slice(first_row, int(self.offsets[stop]) - first_row).to_pylist()
+        for index in range(start, stop):
+            components = [
+                self._component(row)
+                for row in rows[self.offsets[index] - first_row:self.offsets[index + 1] - first_row]
+            ]
+            yield {
+                "guid": components[0]["guid"] if components else None,
+                "components": components,
+                "shared_guid": len(components) > 1,
+            }
+
+    @staticmethod
+    def _component(row: Dict[str, Any]) -> Dict[str, Any]:
+        if row["failed"]:
+            return {"guid": row["guid"], "material": row["material"], "failed": True, "error": row["error"]}
+        row.pop("error", None)
+        row.pop("shared_guid", None)
+        return row
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return list(self)
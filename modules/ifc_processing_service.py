@@ -4,10 +4,13 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import uuid
+import hashlib
 import logging
 import requests
 import json
-from modules.storage.db_manager import DatabaseManager, DEFAULT_PROJECT_ID
+from modules.storage.db_manager import DatabaseManager, DEFAULT_PROJECT_ID, stable_element_id
+from utils.metrics import stage_timer
+from utils.pipeline import fingerprint
 from minio import Minio
 import io
 from typing import Optional, Dict, Any
@@ -20,7 +23,8 @@ class IFCExtractBuildingElementsService:
                  project_name: str = None,
                  query_params: Optional[Dict[str, Any]] = None,
                  callback_config: Optional[Dict[str, Any]] = None,
-                 project_id: Optional[str] = None):
+                 project_id: Optional[str] = None,
+                 minio_client: Optional[Minio] = None):
         """
         Args:
             ifc_url (str): Public URL to fetch the IFC file.
@@ -33,6 +37,8 @@ class IFCExtractBuildingElementsService:
                                     the API will return immediately with a task ID and
                                     use the callback URL to send progress and final data.
             project_id (str): Optional project ID.
+            minio_client (Minio): Optional client for fetching the IFC file. Defaults to
+                                  a client configured from the MINIO_* environment variables.
         """
         self.ifc_url = ifc_url
         self.api_endpoint = api_endpoint
@@ -42,9 +48,11 @@ class IFCExtractBuildingElementsService:
         self.project_name = project_name or f"IFC Building Elements Project {self.project_id}"
         self.query_params = query_params or {}
         self.callback_config = callback_config
+        # Added, changed and removed element IDs of the last stored revision (DatabaseManager.sync_ifc_elements)
+        self.diff = None
         
         # Initialize MinIO client
-        self.minio_client = Minio(
+        self.minio_client = minio_client or Minio(
             endpoint=os.getenv('MINIO_ENDPOINT', 'minio1:9000'),
             access_key=os.getenv('MINIO_ACCESS_KEY', 'minioadmin'),
             secret_key=os.getenv('MINIO_SECRET_KEY', 'minioadmin'),
@@ -76,6 +84,14 @@ class IFCExtractBuildingElementsService:
             logging.error(f"Error fetching IFC file from MinIO: {str(e)}")
             raise
 
+    def content_fingerprint(self, ifc_data: bytes) -> str:
+        """Fingerprint of an extraction: the IFC content hash and the API endpoint and parameters used."""
+        return fingerprint(
+            hashlib.sha256(ifc_data).hexdigest(),
+            self.api_endpoint,
+            json.dumps(self.query_params, sort_keys=True)
+        )
+
     def send_to_api(self, ifc_data: bytes) -> dict:
         """
         Sends the IFC file along with query parameters and an optional callback configuration
@@ -108,44 +124,52 @@ class IFCExtractBuildingElementsService:
 
     def store_data(self, data: dict):
         """
-        Stores the extracted building elements data into the database.
+        Stores the extracted building elements data into the database, writing
+        only the elements added, changed or removed since the stored revision.
         
         The expected response object (in synchronous mode) should have an "elements" key.
         """
         if "elements" not in data:
             raise ValueError("Processed data is missing the 'elements' key")
         
-        # Instead of deduplication logic with original IDs, assign a unique random id to every element.
+        # Elements are identified by their IFC GlobalId (the "id" of the API) within the project, so that
+        # revisions of a model can be matched; elements without one get a random id.
         elements = data["elements"]
         for element in elements:
-            element["id"] = str(uuid.uuid4())
+            global_id = element.get("global_id") or element.get("id") or element.get("guid")
+            element["global_id"] = global_id
+            element["id"] = stable_element_id(self.project_id, global_id) if global_id else str(uuid.uuid4())
         
         logging.info("Initializing project in the database")
         self.db.init_project(project_id=self.project_id, name=self.project_name, kbob_version="N/A")
         logging.info("Storing extracted IFC elements into the database")
-        self.db.store_ifc_elements(elements, self.project_id)
+        self.diff = self.db.sync_ifc_elements(elements, self.project_id)
         logging.info(f"Stored {len(elements)} IFC elements for project {self.project_id} into the database.")
 
-    def run(self):
+    def run(self, ifc_data: Optional[bytes] = None):
         """
         Executes the entire workflow:
-         - Fetches the IFC file from MinIO
+         - Fetches the IFC file from MinIO (unless already fetched and passed in)
          - Sends it to the extraction API
          - Processes the response
         """
         try:
             # Fetch the IFC file from MinIO
-            ifc_data = self.fetch_ifc()
+            if ifc_data is None:
+                with stage_timer("minio_fetch"):
+                    ifc_data = self.fetch_ifc()
             
             # Send to API and get response
-            result = self.send_to_api(ifc_data)
+            with stage_timer("extraction_api"):
+                result = self.send_to_api(ifc_data)
             
             if self.callback_config and "task_id" in result:
                 logging.info(f"Asynchronous processing initiated. Task ID: {result['task_id']}")
                 return result
             else:
                 logging.info("Synchronous processing completed.")
-                self.store_data(result)
+                with stage_timer("store", rows=len(result.get("elements", []))):
+                    self.store_data(result)
                 logging.info(f"IFC extraction stored successfully. Project ID: {self.project_id}")
                 return result
                 
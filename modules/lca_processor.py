@@ -1,25 +1,184 @@
 import logging
 from typing import Any, Dict, List, Optional
 
+import numpy as np
 import pandas as pd
-import re
+import pyarrow as pa
 import os
 import time
-import uuid
+from functools import partial
+
+from joblib import effective_n_jobs
 
 from modules.base_processor import BaseProcessor
+from modules.ebkp_index import life_expectancy_index
+from modules.element_table import ElementResults, ElementTable
 from modules.storage.db_manager import DatabaseManager, DEFAULT_PROJECT_ID
-from utils.shared_utils import load_data, validate_columns, validate_value, ensure_output_directory, save_data_to_json
+from utils.metrics import stage_timer
+from utils.shared_utils import load_data, process_in_parallel
+
+
+# Components from which process_data computes in shards on a process pool, and its number of workers (-1: all cores)
+PARALLEL_THRESHOLD = int(os.getenv("LCA_PARALLEL_THRESHOLD", "1000000"))
+PARALLEL_JOBS = int(os.getenv("LCA_PARALLEL_JOBS", "-1"))
+
+# Size (0 disables memoization) and maximum age in days of unused entries of the lca_component_memo table
+MEMO_MAX_ENTRIES = int(os.getenv("LCA_MEMO_MAX_ENTRIES", "5000000"))
+MEMO_MAX_AGE_DAYS = int(os.getenv("LCA_MEMO_MAX_AGE_DAYS", "90"))
+# lca_component_memo columns and the compute_components results they hold
+MEMO_COLUMNS = {
+    "volume": "rounded_volume",
+    "density": "rounded_density",
+    "gwp_absolute": "gwp_absolute",
+    "gwp_relative": "gwp_relative",
+    "penr_absolute": "penr_absolute",
+    "penr_relative": "penr_relative",
+    "ubp_absolute": "ubp_absolute",
+    "ubp_relative": "ubp_relative",
+}
+
+# Reason codes of elements rejected by LCAProcessor.validate_data, in order of precedence
+REJECTION_REASONS = {
+    "missing_id": "Element missing identifier (guid or id)",
+    "no_materials": "Element missing materials",
+    "no_positive_volume": "Element missing volume information",
+}
+
+
+def round_values(values: np.ndarray, decimals: int) -> np.ndarray:
+    """Round like Python's round(): np.round is exact except next to a tie, where round() is used."""
+    rounded = np.round(values, decimals)
+    scaled = values * 10.0 ** decimals
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for index in np.flatnonzero(near_tie):
+        rounded[index] = round(float(values[index]), decimals)
+    return rounded
+
+
+# Error codes of compute_components, reported in order of precedence
+ERROR_INVALID_VOLUME = 1
+ERROR_MISSING_MAPPING = 2
+ERROR_MISSING_KBOB = 3
+ERROR_INVALID_DENSITY = 4
+
+
+def build_reference(kbob_ids: List[Optional[str]], kbob_rows: List[Optional[dict]],
+                    life_expectancies: List[int]) -> Dict[str, np.ndarray]:
+    """Collect the reference data of a run as arrays indexed by material code resp. eBKP code.
+
+    kbob_ids and kbob_rows hold the mapped KBOB ID and KBOB material per
+    material of the element table (None when missing), life_expectancies
+    the years per eBKP code followed by the default for elements without one.
+    """
+    def indicator(key):
+        return np.array([row[key] if row and row[key] is not None else np.nan for row in kbob_rows], dtype=np.float64)
+
+    return {
+        "has_mapping": np.array([kbob_id is not None for kbob_id in kbob_ids], dtype=bool),
+        "has_kbob": np.array([row is not None for row in kbob_rows], dtype=bool),
+        "kbob_density": np.nan_to_num(indicator("density"), nan=0.0),
+        "indicator_co2eq": indicator("indicator_co2eq"),
+        "indicator_penre": indicator("indicator_penre"),
+        "indicator_ubp": indicator("indicator_ubp"),
+        "life_expectancy": np.array(life_expectancies, dtype=np.int64),
+    }
+
+
+def compute_components(reference: Dict[str, np.ndarray], components: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Compute the LCA metrics of a run of components (volume, density, material and ebkp codes).
+
+    A pure function of its arrays so that shards can be computed in worker
+    processes. Returns the failure mask, the error code per component (0 when
+    successful), the effective volume and density and the rounded metrics.
+    """
+    material = components["material"]
+    volume = np.nan_to_num(components["volume"], nan=0.0)
+    # Fall back to the KBOB density when the model does not carry one
+    density = np.nan_to_num(components["density"], nan=0.0)
+    density = np.where(density > 0, density, reference["kbob_density"][material])
+    amortization = reference["life_expectancy"][components["ebkp"]]
+
+    has_mapping = reference["has_mapping"][material]
+    has_kbob = reference["has_kbob"][material]
+    error = np.select(
+        [~(volume > 0), ~has_mapping, ~has_kbob, ~(density > 0)],
+        [ERROR_INVALID_VOLUME, ERROR_MISSING_MAPPING, ERROR_MISSING_KBOB, ERROR_INVALID_DENSITY],
+        default=0,
+    ).astype(np.int8)
+
+    mass = volume * density
+    co2_eq = mass * reference["indicator_co2eq"][material]
+    penre = mass * reference["indicator_penre"][material]
+    ubp = mass * reference["indicator_ubp"][material]
+    return {
+        "failed": error > 0,
+        "error": error,
+        "volume": volume,
+        "density": density,
+        "amortization": amortization,
+        "rounded_volume": round_values(volume, 3),
+        "rounded_density": round_values(density, 3),
+        "gwp_absolute": round_values(co2_eq, 3),
+        "gwp_relative": round_values(co2_eq / amortization, 3),
+        "penr_absolute": round_values(penre, 3),
+        "penr_relative": round_values(penre / amortization, 3),
+        "ubp_absolute": round_values(ubp, 0),
+        "ubp_relative": round_values(ubp / amortization, 0),
+    }
+
+
+def kbob_fingerprint(kbob_id: Optional[str], kbob_row: Optional[dict], kbob_version: str) -> str:
+    """The KBOB inputs of a material: ID, version, indicator values and density of its KBOB material."""
+    values = [kbob_row[key] for key in ("indicator_co2eq", "indicator_penre", "indicator_ubp", "density")] if kbob_row else []
+    return "\x1f".join(str(value) for value in (kbob_id, kbob_version, *values))
+
+
+def component_keys(materials: List[str], kbob_ids: List[Optional[str]], kbob_rows: List[Optional[dict]],
+                   kbob_version: str, components: Dict[str, np.ndarray], amortization: np.ndarray) -> np.ndarray:
+    """Hash the inputs of every component into a uint64 memo key.
+
+    The key covers material name, volume and density as modelled, the
+    mapped KBOB ID and version with the indicator values and density of
+    the KBOB material (which a re-import of a version may change) and the
+    life expectancy, i.e. everything compute_components derives the
+    metrics of a component from.
+    """
+    material_hash = pd.util.hash_array(np.array(materials, dtype=object))
+    kbob_hash = pd.util.hash_array(np.array([kbob_fingerprint(kbob_id, row, kbob_version)
+                                             for kbob_id, row in zip(kbob_ids, kbob_rows)], dtype=object))
+    material = components["material"]
+    return pd.util.hash_pandas_object(pd.DataFrame({
+        "material": material_hash[material],
+        "kbob": kbob_hash[material],
+        "volume": components["volume"],
+        "density": components["density"],
+        "amortization": amortization,
+    }), index=False).to_numpy()
 
 
 class LCAProcessor(BaseProcessor):
-    def __init__(self, input_file_path, material_mappings_file, db, project_id: Optional[str] = None, project_name: Optional[str] = None):
+    result_type = "lca"
+    result_filename = "lca_results"
+
+    def __init__(self, input_file_path, material_mappings_file, db, project_id: Optional[str] = None, project_name: Optional[str] = None,
+                 output_file: Optional[str] = None, minio_config: Optional[Dict[str, Any]] = None,
+                 element_ids: Optional[List[str]] = None):
         self.material_mappings_file = material_mappings_file
-        super().__init__(input_file_path, material_mappings_file)
+        super().__init__(input_file_path, output_file, minio_config)
         self.db = db
         self.project_id = project_id or DEFAULT_PROJECT_ID
         self.project_name = project_name or f"LCA Project {self.project_id}"
+        # Elements to (re)compute, e.g. those changed by a new model revision; None for all of the project
+        self.element_ids = element_ids
         self.processing_start_time = None
+        self.element_table = None
+        self.rejections = None
+        self.rejection_summary = {}
+        self.parallel_threshold = PARALLEL_THRESHOLD
+        self.n_jobs = PARALLEL_JOBS
+        self.memo_max_entries = MEMO_MAX_ENTRIES
+        self.memo_max_age_days = MEMO_MAX_AGE_DAYS
+        self.memo_hits = 0
         self.results = []
 
     def load_data(self):
@@ -28,213 +187,264 @@ class LCAProcessor(BaseProcessor):
         if not active_version:
             raise ValueError("No active KBOB version found in database")
         
-        # Load from the db when file paths are not provided
-        if self.input_file_path is None:
-            elements = self.db.get_ifc_elements(self.project_id)
-            # For each IFC element, fetch associated materials and their volume data
-            for element in elements:
-                materials, material_volumes = self.db.get_ifc_element_materials(element["id"])
-                element["materials"] = materials
-                element["material_volumes"] = material_volumes
-            self.element_data = { "elements": elements }
-        else:
-            self.element_data = load_data(self.input_file_path)
-        
-        # Load material mappings from database
-        self.material_mappings = self.db.get_material_mappings(self.project_id)
+        with stage_timer("lca_load"):
+            # Load from the db when file paths are not provided
+            if self.input_file_path is None:
+                self.element_data = None
+                self.element_table = ElementTable.from_arrow(
+                    self.db.get_ifc_element_components(self.project_id, self.element_ids)
+                )
+            else:
+                self.element_data = load_data(self.input_file_path)
+                self.validate_structure()
+                self.element_table = ElementTable.from_elements(self.element_data["elements"])
+                # The nested elements are not needed once the table is built
+                self.element_data = None
+            
+            # Load material mappings from database
+            self.material_mappings = self.db.get_material_mappings(self.project_id)
         
         # Validate the retrieved data
-        self.validate_data()
+        with stage_timer("lca_validate", rows=len(self.element_table)):
+            self.validate_data()
         self.processing_start_time = time.time()
 
-    def validate_data(self):
-        """Validate input data structure"""
+    def validate_structure(self):
+        """Validate the structure of input data loaded from a file"""
         if not isinstance(self.element_data, dict):
             raise ValueError("Input data must be a dictionary")
         
         if "elements" not in self.element_data:
             raise ValueError("Input data must contain 'elements' key")
         
-        elements = self.element_data["elements"]
-        logging.debug(f"Validating {len(elements)} IFC elements")
-        if not isinstance(elements, list):
+        if not isinstance(self.element_data["elements"], list):
             raise ValueError("Elements must be a list")
         
-        valid_elements = []
-        for i, element in enumerate(elements):
-            try:
-                if not isinstance(element, dict):
-                    raise ValueError(f"Element at index {i} must be a dictionary")
-                
-                # Get element identifier for better error messages
-                element_id = element.get('guid') or element.get('id') or f"at index {i}"
-                
-                if not (element.get('guid') or element.get('id')):
-                    raise ValueError(f"Element {element_id} missing identifier (guid or id)")
-                
-                # Check for materials and their volumes
-                materials = element.get('materials', [])
-                material_volumes = element.get('material_volumes', {})
-                
-                if not materials:
-                    logging.debug(f"Element {element_id} materials field: {element.get('materials')}")
-                    raise ValueError(f"Element {element_id} missing materials")
-                
-                has_volume = False
-                for material_name in materials:
-                    material_data = material_volumes.get(material_name, {})
-                    volume = material_data.get('volume')
-                    logging.debug(f"Element {element_id} - material '{material_name}' has volume: {volume}")
-                    if volume is not None and volume > 0:
-                        has_volume = True
-                        break
-                
-                if not has_volume:
-                    logging.debug(f"Element {element_id} has materials {materials} but missing valid volume information in material_volumes: {material_volumes}")
-                    raise ValueError(f"Element {element_id} missing volume information")
-                
-                valid_elements.append(element)
-                logging.debug(f"Valid element: {element_id} with materials: {materials}")
-            except Exception as e:
-                logging.warning(f"Skipping invalid element: {str(e)}")
-        
-        self.element_data["elements"] = valid_elements
-        logging.debug(f"Total elements processed: {len(elements)}, valid elements: {len(valid_elements)}")
-        if not valid_elements:
+        if not all(isinstance(element, dict) for element in self.element_data["elements"]):
+            raise ValueError("Elements must be dictionaries")
+
+    def validate_data(self):
+        """Drop invalid elements, recording the reason of each rejection.
+
+        All checks are column masks over the element table; the first failing
+        check of an element determines its reason code (REJECTION_REASONS).
+        Rejections are kept in self.rejections, logged to processing_errors in
+        one insert and summarized per reason.
+        """
+        table = self.element_table
+        has_id = table.ids.astype(bool)
+        has_materials = table.component_counts > 0
+        # Positive volumes per element as differences of the running count at the element boundaries
+        positive_volumes = np.concatenate(([0], np.cumsum(table.volume > 0)))
+        has_volume = positive_volumes[table.offsets[1:]] > positive_volumes[table.offsets[:-1]]
+
+        reason_index = np.select(
+            [~has_id, ~has_materials, ~has_volume], np.arange(len(REJECTION_REASONS)), default=-1
+        )
+        valid = reason_index < 0
+        rejected = np.flatnonzero(~valid)
+        reason_codes = np.array(list(REJECTION_REASONS), dtype=object)[reason_index[rejected]]
+        self.rejections = pa.table({
+            "element_id": pa.array(table.ids[rejected], type=pa.string()),
+            "reason": pa.array(reason_codes, type=pa.string()),
+        })
+        counts = np.bincount(reason_index[rejected], minlength=len(REJECTION_REASONS))
+        self.rejection_summary = {reason: int(count) for reason, count in zip(REJECTION_REASONS, counts)}
+
+        if len(rejected):
+            self.db.log_processing_errors(self.project_id, pa.table({
+                "element_id": self.rejections.column("element_id"),
+                "material_name": pa.nulls(len(rejected), type=pa.string()),
+                "error_type": self.rejections.column("reason"),
+                "error_message": pa.array(
+                    np.array(list(REJECTION_REASONS.values()), dtype=object)[reason_index[rejected]], type=pa.string()
+                ),
+            }))
+            logging.warning(
+                "Skipping %d of %d invalid elements: %s", len(rejected), len(table),
+                ", ".join(f"{reason}={count}" for reason, count in self.rejection_summary.items() if count)
+            )
+
+        self.element_table = table.select(valid)
+        if not len(self.element_table):
             raise ValueError("No valid elements found after validation")
 
     def get_life_expectancy(self, ebkp_code: str) -> int:
-        """Get life expectancy for a given eBKP-H code from the database."""
+        """Get life expectancy for a given eBKP-H code (or its closest parent code) from the database."""
         if not ebkp_code:
             return None
-        
-        ebkp_code = str(ebkp_code).strip()
-        result = self.db.conn.execute("""
-            SELECT MIN(years) 
-            FROM life_expectancy 
-            WHERE ebkp_code = ?
-        """, [ebkp_code]).fetchone()
-        
-        return result[0] if result else None
+        return life_expectancy_index(self.db).lookup(ebkp_code)
+
+    def compute(self, reference: Dict[str, np.ndarray], components: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Run compute_components, in shards on a process pool from parallel_threshold components."""
+        num_components = len(components["material"])
+        n_jobs = effective_n_jobs(self.n_jobs)
+        if num_components < self.parallel_threshold or n_jobs < 2:
+            return compute_components(reference, components)
+        # Contiguous shards, merged in order, give the same result as the serial computation
+        bounds = np.linspace(0, num_components, n_jobs + 1).astype(np.int64)
+        shards = [
+            {name: values[start:stop] for name, values in components.items()}
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        logging.info(f"Computing {num_components} components in {len(shards)} shards")
+        shard_results = process_in_parallel(partial(compute_components, reference), shards, n_jobs=n_jobs)
+        return {name: np.concatenate([result[name] for result in shard_results]) for name in shard_results[0]}
+
+    def compute_memoized(self, reference: Dict[str, np.ndarray], components: Dict[str, np.ndarray],
+                         keys: np.ndarray, amortization: np.ndarray) -> Dict[str, np.ndarray]:
+        """Like compute, but take components found in lca_component_memo from there.
+
+        The memo is looked up with one query; only the misses are computed and
+        the successful ones stored for later uploads. Memo errors only cost
+        the reuse, never the run.
+        """
+        num_components = len(keys)
+        try:
+            hits = self.db.get_component_memo(pa.array(keys, type=pa.uint64()))
+        except Exception as e:
+            logging.warning(f"Component memo lookup failed, computing all components: {e}")
+            hits = None
+        if hits is None or hits.num_rows == 0:
+            self.memo_hits = 0
+            computed = self.compute(reference, components)
+            miss = np.ones(num_components, dtype=bool)
+        else:
+            hit_rows = hits.column("row").to_numpy()
+            self.memo_hits = len(hit_rows)
+            miss = np.ones(num_components, dtype=bool)
+            miss[hit_rows] = False
+            computed_misses = self.compute(reference, {name: values[miss] for name, values in components.items()})
+            computed = {name: np.empty(num_components, dtype=values.dtype) for name, values in computed_misses.items()}
+            for name, values in computed_misses.items():
+                computed[name][miss] = values
+            computed["failed"][hit_rows] = False
+            computed["error"][hit_rows] = 0
+            computed["volume"][hit_rows] = np.nan_to_num(components["volume"][hit_rows], nan=0.0)
+            computed["amortization"][hit_rows] = amortization[hit_rows]
+            for column, name in MEMO_COLUMNS.items():
+                computed[name][hit_rows] = hits.column(column).to_numpy()
+            computed["density"][hit_rows] = computed["rounded_density"][hit_rows]
+        logging.info(f"Component memo: {self.memo_hits} of {num_components} components reused")
+
+        # Identical components share a key; store each new one once
+        new_keys, first = np.unique(keys[miss & ~computed["failed"]], return_index=True)
+        if len(new_keys):
+            rows = np.flatnonzero(miss & ~computed["failed"])[first]
+            entries = {"key": pa.array(new_keys, type=pa.uint64())}
+            entries.update({column: pa.array(computed[name][rows]) for column, name in MEMO_COLUMNS.items()})
+            try:
+                self.db.save_component_memo(pa.table(entries))
+                self.db.prune_component_memo(self.memo_max_entries, self.memo_max_age_days)
+            except Exception as e:
+                logging.warning(f"Failed to update the component memo: {e}")
+        return computed
 
     def process_data(self) -> None:
-        """Process the element data and compute LCA metrics."""
+        """Process the element data and compute LCA metrics.
+
+        Works column-wise on the element table: mappings, KBOB materials and
+        life expectancies are looked up once per distinct material or eBKP
+        code and broadcast to the components via their codes.
+        """
         try:
             # Get active KBOB version
             active_version = self.db.get_active_kbob_version()
             if not active_version:
                 raise ValueError("No active KBOB version found in database")
 
-            # Load material mappings
-            material_mappings = {
-                item["ifc_material"]: item["kbob_id"]
-                for item in self.material_mappings
-                if item.get("kbob_id")
+            table = self.element_table
+            element_index = table.element_index
+
+            # Per distinct material: KBOB ID (ifc_material -> kbob_id) and KBOB material
+            kbob_materials = self.db.get_kbob_materials(active_version)
+            kbob_ids = [self.material_mappings.get(name) or None for name in table.materials]
+            kbob_rows = [kbob_materials.get(kbob_id) if kbob_id else None for kbob_id in kbob_ids]
+            # Per distinct eBKP code, falling back to parent codes; the last slot serves elements without one (code -1)
+            lookups = {}
+            life_expectancies = life_expectancy_index(self.db).resolve(table.ebkp_codes, default=60, stats=lookups) + [60]
+            logging.info("Life expectancy lookups of %d eBKP codes: %s", len(table.ebkp_codes),
+                         ", ".join(f"{outcome}={count}" for outcome, count in lookups.items()))
+            reference = build_reference(kbob_ids, kbob_rows, life_expectancies)
+
+            components = {
+                "volume": table.volume,
+                "density": table.density,
+                "material": table.material,
+                "ebkp": table.ebkp[element_index],
             }
+            if self.memo_max_entries > 0:
+                amortization = reference["life_expectancy"][components["ebkp"]]
+                keys = component_keys(table.materials, kbob_ids, kbob_rows, active_version, components, amortization)
+                computed = self.compute_memoized(reference, components, keys, amortization)
+            else:
+                computed = self.compute(reference, components)
+
+            failed = computed["failed"]
+            volume, density = computed["volume"], computed["density"]
+            errors = np.full(table.num_components, None, dtype=object)
+            for index in np.flatnonzero(computed["error"] == ERROR_INVALID_VOLUME):
+                errors[index] = f"Invalid volume: {volume[index]}"
+            for index in np.flatnonzero(computed["error"] == ERROR_MISSING_MAPPING):
+                errors[index] = f"Material mapping not found: {table.materials[table.material[index]]}"
+            for index in np.flatnonzero(computed["error"] == ERROR_MISSING_KBOB):
+                errors[index] = f"KBOB ID not found: {kbob_ids[table.material[index]]}"
+            for index in np.flatnonzero(computed["error"] == ERROR_INVALID_DENSITY):
+                errors[index] = f"Invalid density: {density[index]}"
+
+            guids = pa.array(table.ids[element_index], type=pa.string())
+            materials = pa.DictionaryArray.from_arrays(
+                pa.array(table.material), pa.array(table.materials, type=pa.string())
+            )
+
+            def metric(name):
+                return pa.array(computed[name], mask=failed)
+
+            ebkp_codes = np.array(table.ebkp_codes + [""], dtype=object)
+            result_table = pa.table({
+                "guid": guids,
+                "material": materials,
+                "mat_kbob": pa.array(np.array(kbob_ids, dtype=object)[table.material], type=pa.string(), mask=failed),
+                "kbob_material_name": pa.array(
+                    np.array([row["name"] if row else None for row in kbob_rows], dtype=object)[table.material],
+                    type=pa.string(), mask=failed
+                ),
+                "volume": metric("rounded_volume"),
+                "density": metric("rounded_density"),
+                "amortization": metric("amortization"),
+                "ebkp_h": pa.array(ebkp_codes[components["ebkp"]], type=pa.string(), mask=failed),
+                "gwp_absolute": metric("gwp_absolute"),
+                "gwp_relative": metric("gwp_relative"),
+                "penr_absolute": metric("penr_absolute"),
+                "penr_relative": metric("penr_relative"),
+                "ubp_absolute": metric("ubp_absolute"),
+                "ubp_relative": metric("ubp_relative"),
+                "failed": pa.array(failed),
+                "error": pa.array(errors, type=pa.string()),
+                "shared_guid": pa.array((table.component_counts > 1)[element_index]),
+            })
+
+            failed_rows = pa.array(failed)
+            self.db.log_processing_errors(self.project_id, pa.table({
+                "element_id": guids.filter(failed_rows),
+                "material_name": materials.filter(failed_rows).cast(pa.string()),
+                "error_type": pa.array(["ValueError"] * int(failed.sum()), type=pa.string()),
+                "error_message": pa.array(errors[failed], type=pa.string()),
+            }))
+
+            self.results = ElementResults(result_table, table.offsets)
             
-            results = []
-            total_elements = len(self.element_data["elements"])
-            processed_elements = 0
-            failed_elements = 0
-            
-            for element in self.element_data["elements"]:
-                element_result = {
-                    "guid": element["id"],
-                    "components": []
-                }
-                
-                # Skip elements without materials
-                if not element.get("materials"):
-                    logging.warning(f"Element {element['id']} missing materials, skipping")
-                    failed_elements += 1
-                    continue
-                
-                for material_name in element["materials"]:
-                    try:
-                        # Get material volume data
-                        material_data = element.get("material_volumes", {}).get(material_name, {})
-                        volume = material_data.get("volume", 0)
-                        fraction = material_data.get("fraction", 1.0)
-                        density = material_data.get("density", 0)
-                        
-                        if volume <= 0:
-                            raise ValueError(f"Invalid volume: {volume}")
-                        
-                        if density <= 0:
-                            raise ValueError(f"Invalid density: {density}")
-                        
-                        # Get KBOB ID and material
-                        kbob_id = material_mappings.get(material_name)
-                        if not kbob_id:
-                            raise ValueError(f"Material mapping not found: {material_name}")
-                        
-                        kbob_material = self.db.get_kbob_material(kbob_id, active_version)
-                        if not kbob_material:
-                            raise ValueError(f"KBOB ID not found: {kbob_id}")
-                        
-                        # Calculate impacts
-                        ebkp = element.get("properties", {}).get("ebkp", "")
-                        life_expectancy = self.get_life_expectancy(ebkp) or 60
-                        
-                        co2_eq = volume * density * kbob_material["indicator_co2eq"]
-                        penre = volume * density * kbob_material["indicator_penre"]
-                        ubp = volume * density * kbob_material["indicator_ubp"]
-                        
-                        # Add successful component
-                        element_result["components"].append({
-                            "guid": element["id"],
-                            "material": material_name,
-                            "mat_kbob": kbob_id,
-                            "kbob_material_name": kbob_material["name"],
-                            "volume": round(volume, 3),
-                            "density": round(density, 3),
-                            "amortization": life_expectancy,
-                            "ebkp_h": ebkp,
-                            "gwp_absolute": round(co2_eq, 3),
-                            "gwp_relative": round(co2_eq / life_expectancy, 3),
-                            "penr_absolute": round(penre, 3),
-                            "penr_relative": round(penre / life_expectancy, 3),
-                            "ubp_absolute": round(ubp, 0),
-                            "ubp_relative": round(ubp / life_expectancy, 0),
-                            "failed": False
-                        })
-                    except Exception as e:
-                        # Log processing error
-                        self.db.log_processing_error(
-                            project_id=self.project_id,
-                            error_data={
-                                "element_id": element["id"],
-                                "material_name": material_name,
-                                "error_type": type(e).__name__,
-                                "error_message": str(e)
-                            }
-                        )
-                        
-                        # Add failed component
-                        element_result["components"].append({
-                            "guid": element["id"],
-                            "material": material_name,
-                            "failed": True,
-                            "error": str(e)
-                        })
-                        failed_elements += 1
-                
-                # Only add elements that have at least one component
-                if element_result["components"]:
-                    element_result["shared_guid"] = len(element_result["components"]) > 1
-                    results.append(element_result)
-                processed_elements += 1
-            
-            self.results = results
-            
-            # Update processing history
+            # Update processing history with project-wide totals; processed_elements are the recomputed ones
+            unchanged = {"elements": 0, "failed_components": 0}
+            if self.element_ids is not None:
+                unchanged = self.db.get_stored_result_counts(self.project_id, self.result_type, self.element_ids)
             processing_time = time.time() - self.processing_start_time
             self.db.update_processing_history(
                 project_id=self.project_id,
                 stats={
-                    "total_elements": total_elements,
-                    "processed_elements": processed_elements,
-                    "failed_elements": failed_elements,
+                    "total_elements": len(table) + unchanged["elements"],
+                    "processed_elements": len(table),
+                    "failed_elements": int(failed.sum()) + unchanged["failed_components"],
                     "processing_time": processing_time,
                     "kbob_version": active_version
                 }
@@ -247,14 +457,28 @@ class LCAProcessor(BaseProcessor):
             self.db.update_project_status(self.project_id, "failed")
             raise
 
+    def results_to_table(self) -> pa.Table:
+        """Get the result table directly instead of converting per-element dictionaries"""
+        if isinstance(self.results, ElementResults):
+            return self.results.table
+        return super().results_to_table()
+
     def save_results(self):
         try:
             # Instead of writing to a file, save the processing results directly to the database
-            self.db.save_project_results(self.project_id, self.results)
+            self.db.save_project_results_table(
+                self.project_id, self.results_to_table(), result_type=self.result_type, element_ids=self.element_ids
+            )
             logging.info("Results successfully saved to the database.")
         except Exception as e:
             logging.error("Error saving results to the database", exc_info=True)
 
+        # Export to MinIO / local JSON if configured; results stay in the database on failure
+        try:
+            super().save_results()
+        except Exception as e:
+            logging.error("Error exporting results", exc_info=True)
+
         # Get and log final project info
         project_info = self.db.get_project_info(self.project_id)
         logging.info(f"Project processing completed. Status: {project_info['status']}")
@@ -263,11 +487,13 @@ class LCAProcessor(BaseProcessor):
         if project_info.get('latest_processing'):
             logging.info(f"Processing time: {project_info['latest_processing'].get('processing_time', 0):.2f}s")
 
-    def __del__(self):
-        if hasattr(self, 'db'):
-            self.db.close()
-
     def run(self):
-        self.load_data()
-        self.process_data()
-        self.save_results()
+        """Run the LCA pipeline, timing the load, compute and save phases."""
+        with stage_timer("lca") as stage:
+            self.load_data()
+            with stage_timer("lca_compute", rows=len(self.element_table)):
+                self.process_data()
+            with stage_timer("lca_save"):
+                self.save_results()
+            stage["rows"] = len(self.element_table)
+        return self.results
@@ -0,0 +1,294 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from modules.ebkp_index import EbkpIndex, life_expectancy_index
+from modules.element_table import ElementTable
+from modules.storage.minio_manager import ebkp_group
+
+# KBOB indicator per result metric prefix, and the decimals its totals are rounded to
+INDICATORS = {"gwp": "indicator_co2eq", "penr": "indicator_penre", "ubp": "indicator_ubp"}
+DECIMALS = {"gwp": 3, "penr": 3, "ubp": 0}
+
+# Life expectancy of elements without (a known) eBKP code, as in LCAProcessor
+DEFAULT_LIFE_EXPECTANCY = 60
+
+
+class ProjectQuantities:
+    """Quantities of a project's components summed per eBKP group and material.
+
+    All matrices are groups x materials. Components with a modelled density
+    contribute their mass (modelled_mass), the others their volume
+    (unmodelled_volume), which turns into mass with the KBOB density of
+    whatever KBOB material they are computed with. The *_per_year variants
+    are divided by the amortization period of each component. Components
+    without a positive volume cannot be computed and are only counted.
+
+    Indicator totals for a set of KBOB materials are then a product of these
+    matrices with a materials x indicators matrix, independent of the number
+    of components.
+    """
+
+    def __init__(self, groups: List[str], materials: List[str], volume: np.ndarray, volume_per_year: np.ndarray,
+                 modelled_mass: np.ndarray, modelled_mass_per_year: np.ndarray, unmodelled_volume: np.ndarray,
+                 unmodelled_volume_per_year: np.ndarray, components: np.ndarray, unmodelled_components: np.ndarray,
+                 invalid_components: int):
+        self.groups = groups
+        self.materials = materials
+        self.volume = volume
+        self.volume_per_year = volume_per_year
+        self.modelled_mass = modelled_mass
+        self.modelled_mass_per_year = modelled_mass_per_year
+        self.unmodelled_volume = unmodelled_volume
+        self.unmodelled_volume_per_year = unmodelled_volume_per_year
+        self.components = components
+        self.unmodelled_components = unmodelled_components
+        self.invalid_components = invalid_components
+
+    @classmethod
+    def from_table(cls, table: ElementTable, life_expectancies: EbkpIndex) -> "ProjectQuantities":
+        """Sum the components of an element table; life_expectancies holds the years per eBKP code."""
+        element_index = table.element_index
+        codes = table.ebkp_codes + [None]
+        years = np.array(life_expectancies.resolve(codes, default=DEFAULT_LIFE_EXPECTANCY), dtype=np.float64)
+        code_groups = [ebkp_group(code) for code in codes]
+        groups = sorted(set(code_groups[code] for code in table.ebkp[element_index]))
+        group_of_code = np.array([groups.index(group) if group in groups else -1 for group in code_groups])
+
+        ebkp = table.ebkp[element_index]
+        volume = np.nan_to_num(table.volume, nan=0.0)
+        density = np.nan_to_num(table.density, nan=0.0)
+        valid = volume > 0
+        modelled = valid & (density > 0)
+        unmodelled = valid & ~modelled
+        amortization = years[ebkp]
+
+        num_groups, num_materials = len(groups), len(table.materials)
+        cell = group_of_code[ebkp] * num_materials + table.material
+
+        def matrix(mask: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+            summed = np.bincount(cell[mask], weights=None if weights is None else weights[mask],
+                                 minlength=num_groups * num_materials)
+            return summed.reshape(num_groups, num_materials)
+
+        return cls(
+            groups=groups,
+            materials=list(table.materials),
+            volume=matrix(valid, volume),
+            volume_per_year=matrix(valid, volume / amortization),
+            modelled_mass=matrix(modelled, volume * density),
+            modelled_mass_per_year=matrix(modelled, volume * density / amortization),
+            unmodelled_volume=matrix(unmodelled, volume),
+            unmodelled_volume_per_year=matrix(unmodelled, volume / amortization),
+            components=matrix(valid).astype(np.int64),
+            unmodelled_components=matrix(unmodelled).astype(np.int64),
+            invalid_components=int((~valid).sum()),
+        )
+
+    @classmethod
+    def load(cls, db, project_id: str) -> "ProjectQuantities":
+        """Sum the stored components of a project."""
+        table = ElementTable.from_arrow(db.get_ifc_element_components(project_id))
+        return cls.from_table(table, life_expectancy_index(db))
+
+    def masses(self, kbob_density: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Mass and mass per year of amortization per group and material with the given KBOB densities."""
+        return (self.modelled_mass + self.unmodelled_volume * kbob_density,
+                self.modelled_mass_per_year + self.unmodelled_volume_per_year * kbob_density)
+
+
+def kbob_matrix(materials: List[str], mappings: Dict[str, str],
+                kbob_materials: Dict[str, dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """KBOB indicators (materials x INDICATORS, NaN where unmapped or not in KBOB) and densities (0 when missing)."""
+    rows = [kbob_materials.get(mappings.get(name)) if mappings.get(name) else None for name in materials]
+    indicators = np.array(
+        [[row[column] if row and row[column] is not None else np.nan for column in INDICATORS.values()] for row in rows],
+        dtype=np.float64,
+    ).reshape(len(materials), len(INDICATORS))
+    density = np.array([row["density"] if row and row["density"] else 0.0 for row in rows], dtype=np.float64)
+    return indicators, density
+
+
+def indicator_totals(quantities: ProjectQuantities, indicators: np.ndarray,
+                     density: np.ndarray) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Absolute and per-year indicator totals per group (groups x INDICATORS) and the components left out.
+
+    Left out are components whose material has no KBOB indicators, those
+    without a modelled density whose KBOB material has none either, and
+    those without a positive volume.
+    """
+    computable = ~np.isnan(indicators).any(axis=1)
+    weights = np.where(computable[:, None], indicators, 0.0)
+    mass, mass_per_year = quantities.masses(np.where(computable, density, 0.0))
+    failed = (quantities.components[:, ~computable].sum()
+              + quantities.unmodelled_components[:, computable & ~(density > 0)].sum()
+              + quantities.invalid_components)
+    return mass @ weights, mass_per_year @ weights, int(failed)
+
+
+def metrics(absolute: np.ndarray, per_year: np.ndarray) -> Dict[str, float]:
+    """Result metrics (gwp_absolute, gwp_relative, ...) of one row of indicator totals."""
+    result = {}
+    for index, prefix in enumerate(INDICATORS):
+        result[f"{prefix}_absolute"] = round(float(absolute[index]), DECIMALS[prefix])
+        result[f"{prefix}_relative"] = round(float(per_year[index]), DECIMALS[prefix])
+    return result
+
+
+def compare_kbob_versions(db, project_id: str, versions: List[str]) -> Dict[str, Any]:
+    """Compute a project's indicator totals with each of the given KBOB versions in one pass.
+
+    The project's components are read and summed once (ProjectQuantities);
+    each version only adds a lookup of its KBOB materials and a matrix
+    product. Uses the project's material mappings, which refer to KBOB
+    UUIDs, in every version. Neither the active version nor stored results
+    are touched. Raises ValueError for versions without KBOB materials.
+    """
+    quantities = ProjectQuantities.load(db, project_id)
+    mappings = db.get_material_mappings(project_id)
+    comparison = {}
+    for version in versions:
+        kbob_materials = db.get_kbob_materials(version)
+        if not kbob_materials:
+            raise ValueError(f"No KBOB materials found for version {version}")
+        absolute, per_year, failed = indicator_totals(quantities, *kbob_matrix(quantities.materials, mappings, kbob_materials))
+        comparison[version] = {
+            **metrics(absolute.sum(axis=0), per_year.sum(axis=0)),
+            "failed_components": failed,
+            "by_ebkp_group": {group: metrics(absolute[index], per_year[index])
+                              for index, group in enumerate(quantities.groups)},
+        }
+    return {
+        "project_id": project_id,
+        "active_version": db.get_active_kbob_version(),
+        "versions": comparison,
+    }
+
+
+class SubstitutionScenario:
+    """A project's quantities with the KBOB materials of the active version, for what-if substitutions.
+
+    Built once per project state (see ScenarioCache); apply then only works
+    on the groups x materials matrices of the substituted materials.
+    """
+
+    def __init__(self, quantities: ProjectQuantities, mappings: Dict[str, str], kbob_materials: Dict[str, dict],
+                 kbob_version: str):
+        self.quantities = quantities
+        self.mappings = mappings
+        self.kbob_materials = kbob_materials
+        self.kbob_version = kbob_version
+        self.kbob_ids_by_name = {row["name"]: kbob_id for kbob_id, row in kbob_materials.items()}
+        self.indicators, self.density = kbob_matrix(quantities.materials, mappings, kbob_materials)
+        self.computable = ~np.isnan(self.indicators).any(axis=1)
+        self.mass, self.mass_per_year = quantities.masses(np.where(self.computable, self.density, 0.0))
+        absolute, per_year, _ = indicator_totals(quantities, self.indicators, self.density)
+        self.baseline = metrics(absolute.sum(axis=0), per_year.sum(axis=0))
+
+    @classmethod
+    def load(cls, db, project_id: str) -> "SubstitutionScenario":
+        version = db.get_active_kbob_version()
+        if not version:
+            raise ValueError("No active KBOB version found in database")
+        return cls(ProjectQuantities.load(db, project_id), db.get_material_mappings(project_id),
+                   db.get_kbob_materials(version), version)
+
+    def kbob_id(self, material: str) -> Optional[str]:
+        """KBOB UUID of a KBOB material given by UUID or name, None if unknown."""
+        return material if material in self.kbob_materials else self.kbob_ids_by_name.get(material)
+
+    def apply(self, substitutions: Dict[str, str]) -> Dict[str, Any]:
+        """Indicator deltas per eBKP group of replacing materials by KBOB materials.
+
+        Keys of substitutions select the project's materials by IFC material
+        name or by their mapped KBOB material (UUID or name), values are the
+        replacing KBOB materials (UUID or name) of the active version.
+        Substituted components keep their volume and take the density of the
+        new KBOB material (the modelled mass where it has none). Raises
+        ValueError for unknown replacements; keys matching no material are
+        reported as unmatched.
+        """
+        replacements = {}
+        for key, value in substitutions.items():
+            kbob_id = self.kbob_id(value)
+            if kbob_id is None:
+                raise ValueError(f"KBOB material not found in version {self.kbob_version}: {value}")
+            replacements[key] = kbob_id
+
+        selected, targets, matched = [], [], set()
+        substituted = {}
+        for index, name in enumerate(self.quantities.materials):
+            mapped = self.mappings.get(name)
+            mapped_name = self.kbob_materials[mapped]["name"] if mapped in self.kbob_materials else None
+            # The IFC material name takes precedence over its KBOB material
+            key = next((key for key in (name, mapped, mapped_name) if key is not None and key in replacements), None)
+            if key is None:
+                continue
+            matched.add(key)
+            selected.append(index)
+            targets.append(replacements[key])
+            substituted[name] = {"from": mapped, "to": replacements[key]}
+
+        groups = self.quantities.groups
+        delta_absolute = np.zeros((len(groups), len(INDICATORS)))
+        delta_per_year = np.zeros((len(groups), len(INDICATORS)))
+        if selected:
+            selected = np.array(selected)
+            new_indicators, new_density = kbob_matrix(
+                targets, {kbob_id: kbob_id for kbob_id in targets}, self.kbob_materials
+            )
+            old_weights = np.where(self.computable[selected, None], self.indicators[selected], 0.0)
+            quantities = self.quantities
+            has_density = new_density > 0
+            new_mass = np.where(has_density, quantities.volume[:, selected] * new_density,
+                                quantities.modelled_mass[:, selected])
+            new_mass_per_year = np.where(has_density, quantities.volume_per_year[:, selected] * new_density,
+                                         quantities.modelled_mass_per_year[:, selected])
+            delta_absolute = new_mass @ new_indicators - self.mass[:, selected] @ old_weights
+            delta_per_year = new_mass_per_year @ new_indicators - self.mass_per_year[:, selected] @ old_weights
+
+        return {
+            "kbob_version": self.kbob_version,
+            "substituted": substituted,
+            "unmatched": sorted(set(replacements) - matched),
+            "baseline": self.baseline,
+            "delta": metrics(delta_absolute.sum(axis=0), delta_per_year.sum(axis=0)),
+            "delta_by_ebkp_group": {group: metrics(delta_absolute[index], delta_per_year[index])
+                                    for index, group in enumerate(groups)},
+        }
+
+
+class ScenarioCache:
+    """Substitution scenarios of the most recently used projects, kept in memory.
+
+    A scenario is rebuilt when the project's elements (counters_updated_at of
+    get_project_info) or its reference inputs (mappings, active KBOB materials,
+    life expectancies) have changed since it was built.
+    """
+
+    def __init__(self, max_projects: int = 8):
+        self.max_projects = max_projects
+        self._lock = threading.Lock()
+        self._scenarios: "OrderedDict[str, Tuple[Any, SubstitutionScenario]]" = OrderedDict()
+
+    def get(self, db, project_id: str) -> SubstitutionScenario:
+        info = db.get_project_info(project_id)
+        if info is None:
+            raise ValueError(f"Project not found: {project_id}")
+        hashes = db.get_input_hashes(project_id)
+        token = (info["counters_updated_at"], hashes["material_mappings"], hashes["kbob_materials"],
+                 hashes["life_expectancy"])
+        with self._lock:
+            cached = self._scenarios.get(project_id)
+            if cached is not None and cached[0] == token:
+                self._scenarios.move_to_end(project_id)
+                return cached[1]
+        scenario = SubstitutionScenario.load(db, project_id)
+        with self._lock:
+            self._scenarios[project_id] = (token, scenario)
+            self._scenarios.move_to_end(project_id)
+            while len(self._scenarios) > self.max_projects:
+                self._scenarios.popitem(last=False)
+        return scenario
@@ -0,0 +1,204 @@
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+
+from modules.ebkp_index import EbkpIndex, life_expectancy_index
+from modules.element_table import ElementTable
+from modules.lca_scenarios import DECIMALS, DEFAULT_LIFE_EXPECTANCY, INDICATORS, kbob_matrix
+from modules.storage.minio_manager import ebkp_group
+
+# Default coefficients of variation of the sampled inputs: volume per component,
+# density and indicators (each on its own) per KBOB material
+DEFAULT_UNCERTAINTY = {"volume": 0.05, "density": 0.03, "indicators": 0.15}
+
+# Percentiles reported per element, eBKP group and project
+PERCENTILES = (5, 50, 95)
+
+# Upper bound on the samples of one request
+MAX_SAMPLES = 100_000
+
+# Memory of the samples x components blocks worked on at a time
+MAX_BLOCK_BYTES = 64 * 1024 * 1024
+
+# components x samples float32 arrays alive per block (mass, factors, indicator values, element sums)
+_ARRAYS_PER_BLOCK = 4
+
+
+def lognormal_factors(rng: np.random.Generator, cv: float, shape: Tuple[int, ...]) -> np.ndarray:
+    """Float32 lognormal factors with mean 1 and coefficient of variation cv (all 1 for cv 0)."""
+    if cv <= 0:
+        return np.ones(shape, dtype=np.float32)
+    sigma = np.sqrt(np.log1p(cv * cv))
+    factors = rng.standard_normal(shape, dtype=np.float32)
+    factors *= np.float32(sigma)
+    factors -= np.float32(sigma * sigma / 2)
+    return np.exp(factors, out=factors)
+
+
+def percentile_key(q: float) -> str:
+    return f"p{q:g}"
+
+
+def summarize(samples: np.ndarray, percentiles: Sequence[float], decimals: int) -> Dict[str, float]:
+    """Percentiles and mean of one metric's samples."""
+    summary = {percentile_key(q): round(float(value), decimals)
+               for q, value in zip(percentiles, np.percentile(samples, percentiles))}
+    summary["mean"] = round(float(samples.mean()), decimals)
+    return summary
+
+
+def _blocks(counts: np.ndarray, max_components: int) -> Iterator[Tuple[int, int]]:
+    """Element ranges [start, end) with at most max_components components (or a single element)."""
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(counts):
+        before = ends[start - 1] if start else 0
+        end = max(int(np.searchsorted(ends, before + max_components, side="right")), start + 1)
+        yield start, end
+        start = end
+
+
+def simulate_uncertainty(table: ElementTable, mappings: Dict[str, str], kbob_materials: Dict[str, dict],
+                         life_expectancies: EbkpIndex, samples: int = 1000,
+                         uncertainty: Optional[Dict[str, float]] = None,
+                         percentiles: Sequence[float] = PERCENTILES, seed: Optional[int] = None,
+                         max_block_bytes: int = MAX_BLOCK_BYTES) -> Dict[str, Any]:
+    """Monte Carlo uncertainty of the LCA results of an element table.
+
+    Every sample scales the volume of each component, and the density and
+    each indicator of each KBOB material, by lognormal factors with mean 1
+    and the coefficients of variation in uncertainty (DEFAULT_UNCERTAINTY
+    for those not given). Material factors are shared by all components of
+    a KBOB material, as an error in its KBOB data affects all of them.
+    Components the LCAProcessor fails on contribute nothing.
+
+    Elements are worked on in blocks of components x samples float32 arrays
+    of about max_block_bytes, ordered by eBKP group; per block only the
+    element percentiles and the samples of the group sums are kept, so
+    memory beyond the blocks grows with the number of elements and groups,
+    not with samples x components. Returns the percentiles and means per
+    project and eBKP group, and the element percentiles as an Arrow table
+    (element_id, ebkp_group, <metric>_p<q>).
+    """
+    if not 0 < samples <= MAX_SAMPLES:
+        raise ValueError(f"samples must be between 1 and {MAX_SAMPLES}")
+    spread = {**DEFAULT_UNCERTAINTY, **(uncertainty or {})}
+    unknown = set(spread) - set(DEFAULT_UNCERTAINTY)
+    if unknown:
+        raise ValueError(f"Unknown uncertainty inputs: {', '.join(sorted(unknown))}")
+    if any(not 0 <= float(cv) <= 10 for cv in spread.values()):
+        raise ValueError("Coefficients of variation must be between 0 and 10")
+    percentiles = [float(q) for q in percentiles]
+    if not percentiles or any(not 0 <= q <= 100 for q in percentiles):
+        raise ValueError("Percentiles must be between 0 and 100")
+    rng = np.random.default_rng(seed)
+
+    # Reference data per material code, factors per KBOB material
+    indicators, kbob_density = kbob_matrix(table.materials, mappings, kbob_materials)
+    kbob_codes: Dict[str, int] = {}
+    material_kbob = np.array([kbob_codes.setdefault(mappings[name], len(kbob_codes))
+                              if mappings.get(name) in kbob_materials else 0 for name in table.materials],
+                             dtype=np.int64)
+    num_kbob = max(len(kbob_codes), 1)
+    density_factors = lognormal_factors(rng, spread["density"], (num_kbob, samples))
+    indicator_factors = [lognormal_factors(rng, spread["indicators"], (num_kbob, samples)) for _ in INDICATORS]
+
+    # Component masses as in compute_components; failing components get none
+    material = table.material
+    volume = np.nan_to_num(table.volume, nan=0.0)
+    density = np.nan_to_num(table.density, nan=0.0)
+    density = np.where(density > 0, density, kbob_density[material])
+    valid = (volume > 0) & (density > 0) & ~np.isnan(indicators).any(axis=1)[material]
+    mass = np.where(valid, volume * density, 0.0).astype(np.float32)
+    weights = np.nan_to_num(indicators, nan=0.0).astype(np.float32)
+
+    # Per element: group and amortization, with the default for elements without a (known) code
+    codes = table.ebkp_codes + [None]
+    years = np.array(life_expectancies.resolve(codes, default=DEFAULT_LIFE_EXPECTANCY), dtype=np.float64)
+    code_groups = [ebkp_group(code) for code in codes]
+    groups = sorted(set(code_groups[code] for code in table.ebkp))
+    group_of_code = np.array([groups.index(group) if group in groups else -1 for group in code_groups], dtype=np.int64)
+    element_group = group_of_code[table.ebkp]
+    amortization = years[table.ebkp]
+
+    # Elements ordered by group, with their components contiguous in that order
+    order = np.argsort(element_group, kind="stable")
+    counts = table.component_counts[order]
+    offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    component_order = np.repeat(table.offsets[:-1][order] - offsets[:-1], counts) + np.arange(offsets[-1])
+
+    metric_names = [f"{prefix}_{kind}" for prefix in INDICATORS for kind in ("absolute", "relative")]
+    group_samples = {name: np.zeros((len(groups), samples)) for name in metric_names}
+    element_percentiles = {name: np.zeros((len(percentiles), len(order))) for name in metric_names}
+
+    max_components = max(1, max_block_bytes // (samples * 4 * _ARRAYS_PER_BLOCK))
+    for start, end in _blocks(counts, max_components):
+        components = component_order[offsets[start]:offsets[end]]
+        block_counts = counts[start:end]
+        nonempty = block_counts > 0
+        starts = (offsets[start:end] - offsets[start])[nonempty]
+        elements = order[start:end]
+        block_years = amortization[elements]
+        block_groups = element_group[elements]
+        runs = np.flatnonzero(np.r_[True, block_groups[1:] != block_groups[:-1]])
+
+        kbob = material_kbob[material[components]]
+        block_mass = lognormal_factors(rng, spread["volume"], (len(components), samples))
+        block_mass *= mass[components, None]
+        block_mass *= density_factors[kbob]
+        for index, prefix in enumerate(INDICATORS):
+            values = indicator_factors[index][kbob]
+            values *= weights[material[components], index, None]
+            values *= block_mass
+            sums = np.zeros((len(elements), samples), dtype=np.float32)
+            if starts.size:
+                sums[nonempty] = np.add.reduceat(values, starts, axis=0)
+            del values
+            absolute = element_percentiles[f"{prefix}_absolute"]
+            absolute[:, start:end] = np.percentile(sums, percentiles, axis=1)
+            # Amortization is fixed per element, so its percentiles scale with it
+            element_percentiles[f"{prefix}_relative"][:, start:end] = absolute[:, start:end] / block_years
+            group_samples[f"{prefix}_absolute"][block_groups[runs]] += np.add.reduceat(sums, runs, axis=0)
+            sums /= block_years.astype(np.float32)[:, None]
+            group_samples[f"{prefix}_relative"][block_groups[runs]] += np.add.reduceat(sums, runs, axis=0)
+        del block_mass
+
+    def decimals(name: str) -> int:
+        return DECIMALS[name.split("_")[0]]
+
+    columns = {
+        "element_id": pa.array(table.ids[order].tolist(), type=pa.string()),
+        "ebkp_group": pa.array([groups[group] for group in element_group[order]], type=pa.string()),
+    }
+    for name in metric_names:
+        for row, q in enumerate(percentiles):
+            columns[f"{name}_{percentile_key(q)}"] = pa.array(np.round(element_percentiles[name][row], decimals(name)))
+
+    return {
+        "samples": samples,
+        "seed": seed,
+        "uncertainty": spread,
+        "percentiles": percentiles,
+        "failed_components": int((~valid).sum()),
+        "project": {name: summarize(group_samples[name].sum(axis=0), percentiles, decimals(name))
+                    for name in metric_names},
+        "by_ebkp_group": {group: {name: summarize(group_samples[name][index], percentiles, decimals(name))
+                                  for name in metric_names}
+                          for index, group in enumerate(groups)},
+        "elements": pa.table(columns),
+    }
+
+
+def project_uncertainty(db, project_id: str, **options) -> Dict[str, Any]:
+    """Monte Carlo uncertainty (simulate_uncertainty) of a project's stored components with the active KBOB version."""
+    version = db.get_active_kbob_version()
+    if not version:
+        raise ValueError("No active KBOB version found in database")
+    table = ElementTable.from_arrow(db.get_ifc_element_components(project_id))
+    result = simulate_uncertainty(table, db.get_material_mappings(project_id), db.get_kbob_materials(version),
+                                  life_expectancy_index(db), **options)
+    result["project_id"] = project_id
+    result["kbob_version"] = version
+    return result
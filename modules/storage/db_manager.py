@@ -1,20 +1,376 @@
 import duckdb
 import pandas as pd
+import pyarrow as pa
 from typing import Optional, List, Dict, Any
+import json
+import uuid
+import hashlib
 import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import Future
 from pathlib import Path
 from datetime import date, datetime
 
+from modules.storage.shards import shard_pool
+from modules.storage.writer import _submitting, database_writer, writes
+from utils.metrics import timed_db_call
+from utils.profiling import current_profile_path
+from utils.tracing import current_trace_id, traced
+
 # Hardcoded project ID for demo purposes
 DEFAULT_PROJECT_ID = "juch-areal"
 
+# Component keys stored by save_project_results, as named in the processor results
+RESULT_COLUMNS = (
+    "guid", "material", "mat_kbob", "kbob_version", "volume", "density",
+    "gwp_absolute", "gwp_relative", "penr_absolute", "penr_relative",
+    "ubp_absolute", "ubp_relative", "amortization", "ebkp_h", "failed", "error",
+)
+
+# Stored attributes of an IFC element (ifc_elements columns) and of its materials (ifc_element_materials columns)
+ELEMENT_COLUMNS = (
+    "ifc_class", "object_type", "load_bearing", "is_external", "ebkp",
+    "volume_net", "volume_gross", "area_net", "area_gross", "length", "width", "height",
+)
+MATERIAL_COLUMNS = ("material_name", "fraction", "volume", "width", "density")
+
+# Namespace of the element IDs derived from project and IFC GlobalId
+ELEMENT_ID_NAMESPACE = uuid.UUID("6f0c5a52-3f4e-5c5d-9a57-2b0d4c1e8f31")
+
+# Queries hashing the content of the reference tables: the KBOB materials of the active version
+# (NULL without one) and the tables looked up by eBKP code
+REFERENCE_HASHES = {
+    "kbob_materials": """
+        WITH active AS (
+            SELECT version FROM kbob_versions WHERE is_active = true ORDER BY release_date DESC LIMIT 1
+        )
+        SELECT (SELECT version FROM active) || ':' || md5(COALESCE(string_agg(
+            uuid || '|' || indicator_co2eq || '|' || indicator_penre || '|' || indicator_ubp || '|' || COALESCE(CAST(density AS VARCHAR), ''),
+            ';' ORDER BY uuid), ''))
+        FROM kbob_materials WHERE version = (SELECT version FROM active)
+    """,
+    "life_expectancy": """
+        SELECT md5(COALESCE(string_agg(ebkp_code || '=' || years, ';' ORDER BY ebkp_code, years), ''))
+        FROM life_expectancy
+    """,
+    "cost_reference": """
+        SELECT md5(COALESCE(string_agg(ebkp_code || '|' || unit || '|' || cost_per_unit || '|' || version, ';'
+                                       ORDER BY ebkp_code, version), ''))
+        FROM cost_reference
+    """,
+}
+
+
+def stable_element_id(project_id: str, global_id: str) -> str:
+    """ID of an IFC element that is the same for every revision of the model uploaded to a project."""
+    return str(uuid.uuid5(ELEMENT_ID_NAMESPACE, f"{project_id}/{global_id}"))
+
+
+def element_row(element: Dict[str, Any]) -> Dict[str, Any]:
+    """Values of the ELEMENT_COLUMNS of an extraction API element."""
+    properties = element.get('properties') or {}
+    quantities = element.get('quantities') or {}
+    volume_data = quantities.get('volume') or {}
+    area_data = quantities.get('area') or {}
+    dimensions = quantities.get('dimensions') or {}
+    return {
+        "ifc_class": element.get('ifc_class', 'Unknown'),
+        "object_type": element.get('object_type'),
+        "load_bearing": element.get('load_bearing') if element.get('load_bearing') is not None else properties.get('loadBearing'),
+        "is_external": element.get('is_external') if element.get('is_external') is not None else properties.get('isExternal'),
+        "ebkp": properties.get('ebkp') or properties.get('reference'),
+        "volume_net": volume_data.get('net'),
+        "volume_gross": volume_data.get('gross'),
+        "area_net": area_data.get('net'),
+        "area_gross": area_data.get('gross'),
+        "length": dimensions.get('length'),
+        "width": dimensions.get('width'),
+        "height": dimensions.get('height'),
+    }
+
+
+def material_rows(element: Dict[str, Any]) -> List[tuple]:
+    """Values of the MATERIAL_COLUMNS for each material of an extraction API element."""
+    return [
+        (material_name, data.get('fraction'), data.get('volume'), data.get('width'), data.get('density', 0))
+        for material_name, data in (element.get('material_volumes') or {}).items()
+    ]
+
+
+def content_hash(row: Dict[str, Any], materials: List[tuple]) -> str:
+    """Hash of everything stored about an element, to detect changed elements between revisions."""
+    return hashlib.sha256(json.dumps([row, sorted(materials, key=lambda m: m[0])], default=str).encode("utf-8")).hexdigest()
+
+
+
+def arrow_table(result) -> pa.Table:
+    """Result of a query as an Arrow table.
+
+    Uses arrow(), which returns a table in older DuckDB versions and a
+    record batch reader in newer ones, where fetch_arrow_table() is deprecated.
+    """
+    table = result.arrow()
+    return table.read_all() if isinstance(table, pa.RecordBatchReader) else table
+
+
+# Reference data, projects and material mappings; the catalog database in sharded mode
+CATALOG_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS kbob_materials (
+        uuid TEXT NOT NULL,
+        name TEXT NOT NULL,
+        indicator_co2eq REAL NOT NULL,
+        indicator_penre REAL NOT NULL,
+        indicator_ubp REAL NOT NULL,
+        density REAL,
+        version TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (uuid, version)
+    );
+
+    CREATE TABLE IF NOT EXISTS kbob_versions (
+        version TEXT PRIMARY KEY,
+        is_active BOOLEAN DEFAULT false,
+        release_date DATE NOT NULL,
+        description TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS life_expectancy (
+        ebkp_code TEXT NOT NULL,
+        description TEXT NOT NULL,
+        years INTEGER NOT NULL,
+        model_based BOOLEAN DEFAULT true,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (ebkp_code, description)
+    );
+
+    CREATE TABLE IF NOT EXISTS cost_reference (
+        ebkp_code TEXT NOT NULL,
+        description TEXT NOT NULL,
+        unit TEXT NOT NULL,
+        cost_per_unit REAL NOT NULL,
+        version TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (ebkp_code, version)
+    );
+
+    CREATE TABLE IF NOT EXISTS projects (
+        project_id VARCHAR PRIMARY KEY,
+        name VARCHAR NOT NULL,
+        life_expectancy INTEGER DEFAULT 60,
+        kbob_version VARCHAR NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP,
+        status VARCHAR CHECK(status IN ('active', 'processing', 'completed', 'failed'))
+    );
+
+    CREATE TABLE IF NOT EXISTS material_mappings (
+        project_id VARCHAR NOT NULL,
+        ifc_material VARCHAR NOT NULL,
+        kbob_id VARCHAR,
+        kbob_version VARCHAR NOT NULL,
+        type VARCHAR,
+        is_modelled BOOLEAN DEFAULT true,
+        ebkp VARCHAR,
+        quantity DOUBLE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(project_id, ifc_material, kbob_id, kbob_version)
+    );
+
+    -- Rounded LCA metrics of successfully computed components across projects and uploads,
+    -- keyed by a hash of their inputs (modules.lca_processor.component_keys)
+    CREATE TABLE IF NOT EXISTS lca_component_memo (
+        key UBIGINT PRIMARY KEY,
+        volume DOUBLE,
+        density DOUBLE,
+        gwp_absolute DOUBLE,
+        gwp_relative DOUBLE,
+        penr_absolute DOUBLE,
+        penr_relative DOUBLE,
+        ubp_absolute DOUBLE,
+        ubp_relative DOUBLE,
+        last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Indexes for better query performance
+    CREATE INDEX IF NOT EXISTS idx_kbob_name ON kbob_materials(name);
+    CREATE INDEX IF NOT EXISTS idx_kbob_version ON kbob_materials(version);
+    CREATE INDEX IF NOT EXISTS idx_material_mappings ON material_mappings(ifc_material, kbob_version);
+"""
+
+# Element and processing data of projects; one database file per project in sharded mode
+PROJECT_SCHEMA = """
+    -- Sequences for auto-incrementing IDs
+    CREATE SEQUENCE IF NOT EXISTS material_id_seq;
+    CREATE SEQUENCE IF NOT EXISTS processing_history_id_seq;
+    CREATE SEQUENCE IF NOT EXISTS processing_error_id_seq;
+    CREATE SEQUENCE IF NOT EXISTS processing_result_id_seq;
+
+    CREATE TABLE IF NOT EXISTS ifc_elements (
+        id VARCHAR PRIMARY KEY,
+        ifc_class VARCHAR NOT NULL,
+        object_type VARCHAR,
+        load_bearing BOOLEAN,
+        is_external BOOLEAN,
+        ebkp VARCHAR,
+        -- Quantities
+        volume_net DOUBLE,
+        volume_gross DOUBLE,
+        area_net DOUBLE,
+        area_gross DOUBLE,
+        length DOUBLE,
+        width DOUBLE,
+        height DOUBLE,
+        -- Metadata
+        project_id VARCHAR NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS ifc_element_materials (
+        id BIGINT PRIMARY KEY DEFAULT nextval('material_id_seq'),
+        element_id VARCHAR,
+        material_name VARCHAR NOT NULL,
+        fraction DOUBLE,
+        volume DOUBLE,
+        width DOUBLE,
+        density DOUBLE,
+        UNIQUE(element_id, material_name),
+        FOREIGN KEY(element_id) REFERENCES ifc_elements(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS processing_results (
+        id BIGINT PRIMARY KEY DEFAULT nextval('processing_result_id_seq'),
+        element_id VARCHAR,
+        material_name VARCHAR NOT NULL,
+        kbob_uuid VARCHAR NOT NULL,
+        kbob_version VARCHAR NOT NULL,
+        volume DOUBLE,
+        density DOUBLE,
+        gwp_absolute DOUBLE,
+        gwp_relative DOUBLE,
+        penr_absolute DOUBLE,
+        penr_relative DOUBLE,
+        ubp_absolute DOUBLE,
+        ubp_relative DOUBLE,
+        amortization INTEGER,
+        ebkp_h VARCHAR,
+        failed BOOLEAN DEFAULT false,
+        error TEXT,
+        project_id VARCHAR NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY(element_id) REFERENCES ifc_elements(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS processing_errors (
+        id BIGINT PRIMARY KEY DEFAULT nextval('processing_error_id_seq'),
+        project_id VARCHAR NOT NULL,
+        element_id VARCHAR,
+        material_name VARCHAR,
+        error_type VARCHAR,
+        error_message TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS processing_history (
+        id BIGINT PRIMARY KEY DEFAULT nextval('processing_history_id_seq'),
+        project_id VARCHAR NOT NULL,
+        total_elements INTEGER,
+        processed_elements INTEGER,
+        failed_elements INTEGER,
+        processing_time DOUBLE,
+        kbob_version VARCHAR NOT NULL,
+        trace_id VARCHAR,
+        profile_path VARCHAR,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Error counts per type of runs beyond the retention window (compact_processing_logs)
+    CREATE TABLE IF NOT EXISTS processing_error_summary (
+        project_id VARCHAR NOT NULL,
+        error_type VARCHAR NOT NULL,
+        error_count BIGINT NOT NULL,
+        first_seen TIMESTAMP,
+        last_seen TIMESTAMP,
+        PRIMARY KEY (project_id, error_type)
+    );
+
+    -- Totals and last run of each project, kept up to date by the writers so status lookups are by primary key
+    CREATE TABLE IF NOT EXISTS project_stats (
+        project_id VARCHAR PRIMARY KEY,
+        element_count BIGINT NOT NULL DEFAULT 0,
+        material_count BIGINT NOT NULL DEFAULT 0,
+        -- Retained and rolled up errors
+        error_count BIGINT NOT NULL DEFAULT 0,
+        last_history_id BIGINT,
+        last_total_elements INTEGER,
+        last_processed_elements INTEGER,
+        last_failed_elements INTEGER,
+        last_processing_time DOUBLE,
+        last_kbob_version VARCHAR,
+        last_trace_id VARCHAR,
+        last_profile_path VARCHAR,
+        last_run_at TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Input fingerprint of the last successful run of each pipeline stage (utils.pipeline)
+    CREATE TABLE IF NOT EXISTS stage_fingerprints (
+        project_id VARCHAR NOT NULL,
+        stage VARCHAR NOT NULL,
+        fingerprint VARCHAR NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (project_id, stage)
+    );
+
+    -- Columns added after the initial schema
+    ALTER TABLE processing_history ADD COLUMN IF NOT EXISTS trace_id VARCHAR;
+    ALTER TABLE processing_history ADD COLUMN IF NOT EXISTS profile_path VARCHAR;
+    ALTER TABLE ifc_elements ADD COLUMN IF NOT EXISTS global_id VARCHAR;
+    ALTER TABLE ifc_elements ADD COLUMN IF NOT EXISTS content_hash VARCHAR;
+    -- Processor that produced the row (BaseProcessor.result_type); NULL for rows saved before
+    ALTER TABLE processing_results ADD COLUMN IF NOT EXISTS result_type VARCHAR;
+
+    -- Indexes for better query performance
+    CREATE INDEX IF NOT EXISTS idx_ifc_elements_project ON ifc_elements(project_id);
+    CREATE INDEX IF NOT EXISTS idx_element_materials ON ifc_element_materials(element_id);
+    CREATE INDEX IF NOT EXISTS idx_processing_results_project ON processing_results(project_id);
+    CREATE INDEX IF NOT EXISTS idx_processing_errors_project ON processing_errors(project_id);
+    CREATE INDEX IF NOT EXISTS idx_processing_history_project ON processing_history(project_id);
+"""
+
+
 class DatabaseManager:
-    def __init__(self, db_path: str = "nhmzh_data.duckdb"):
-        """Initialize database connection and tables"""
+    def __init__(self, db_path: str = "nhmzh_data.duckdb", shard_dir: Optional[str] = None, max_open_shards: int = 16,
+                 write_queue: bool = False):
+        """Initialize database connection and tables.
+
+        With a shard_dir the database at db_path is a catalog holding reference
+        data and projects, and the element and processing data of each project
+        lives in its own file in shard_dir (see project).
+
+        With write_queue all mutating calls, from any manager of the database
+        opened with it and their forks, are run one at a time by a single
+        writer thread (see modules.storage.writer and submit_write).
+        """
         self.db_path = db_path
+        self.shard_dir = shard_dir
         self._conn = None
+        # Serializes updates of project rows across forks (see fork)
+        self._project_lock = threading.Lock()
+        # Whether a transaction opened by transaction() is running on the connection
+        self._in_transaction = False
+        # Project and alias of the shard used as default database of the connection (project sessions only)
+        self._shard_project = None
+        self._shard = None
+        self._schemas = (CATALOG_SCHEMA,) if shard_dir else (CATALOG_SCHEMA, PROJECT_SCHEMA)
         self._init_connection()
+        self._shards = shard_pool(db_path, shard_dir, max_open_shards, PROJECT_SCHEMA) if shard_dir else None
+        self._catalog = self._conn.execute("SELECT current_database()").fetchone()[0]
         self._init_db()
+        self._writer = database_writer(
+            db_path, lambda: DatabaseManager(db_path, shard_dir, max_open_shards)
+        ) if write_queue else None
 
     def _init_connection(self):
         """Initialize database connection"""
@@ -28,183 +384,130 @@ class DatabaseManager:
             self._init_connection()
         return self._conn
 
+    def fork(self) -> "DatabaseManager":
+        """Get a manager with its own connection to the same database.
+
+        A DuckDB connection must not be used by several threads at once, so
+        concurrent pipeline stages each work on a fork. Closing a fork leaves
+        the connection of this manager open. Forks of a project session work
+        on the same project shard.
+        """
+        forked = DatabaseManager.__new__(DatabaseManager)
+        forked.db_path = self.db_path
+        forked.shard_dir = self.shard_dir
+        forked._project_lock = self._project_lock
+        forked._shards = self._shards
+        forked._catalog = self._catalog
+        forked._schemas = self._schemas
+        forked._writer = self._writer
+        forked._in_transaction = False
+        forked._shard_project = None
+        forked._shard = None
+        forked._conn = self.conn.cursor()
+        if self._shard_project is not None:
+            forked._use_shard(self._shard_project)
+        return forked
+
+    def project(self, project_id: str) -> "DatabaseManager":
+        """Get the manager for the data of a project.
+
+        Without sharding this is the manager itself. In sharded mode it is a
+        session on its own connection whose default database is the shard of
+        the project, attached on demand, with the catalog next in the search
+        path: project tables resolve to the shard and reference tables to the
+        catalog. Sessions must be closed to let the shard be detached again.
+        """
+        if self._shards is None:
+            return self
+        session = self.fork()
+        session._use_shard(project_id)
+        return session
+
+    @contextmanager
+    def project_session(self, project_id: str):
+        """Context manager around project(), closing the session afterwards."""
+        session = self.project(project_id)
+        try:
+            yield session
+        finally:
+            if session is not self:
+                session.close()
+
+    def submit_write(self, method: str, *args, **kwargs) -> Future:
+        """Call the mutating method named method without waiting for it; returns its future.
+
+        With a write queue the call is queued like any other write, otherwise
+        it runs right away and the future is already done.
+        """
+        if not getattr(getattr(type(self), method, None), "is_write", False):
+            raise ValueError(f"{method} is not a write method")
+        if self._writer is not None and not self._writer.is_writer_thread():
+            token = _submitting.set(True)
+            try:
+                return getattr(self, method)(*args, **kwargs)
+            finally:
+                _submitting.reset(token)
+        future = Future()
+        try:
+            future.set_result(getattr(self, method)(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    @contextmanager
+    def transaction(self):
+        """Run the block in a transaction, or as part of the one already opened by transaction().
+
+        Lets writes that keep several tables consistent (e.g. project_stats)
+        run on their own or inside a batch of queued writes.
+        """
+        if self._in_transaction:
+            yield
+            return
+        self.conn.execute("BEGIN TRANSACTION")
+        self._in_transaction = True
+        try:
+            yield
+        except Exception:
+            try:
+                self.conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            raise
+        else:
+            self.conn.execute("COMMIT")
+        finally:
+            self._in_transaction = False
+
+    def _use_shard(self, project_id: str) -> None:
+        alias = self._shards.acquire(project_id)
+        self._shard_project, self._shard = project_id, alias
+        self._schemas = (PROJECT_SCHEMA,)
+        self._conn.execute(f"USE {alias}")
+        self._conn.execute(f"SET search_path = '{alias}.main,{self._catalog}.main'")
+
     def close(self):
         """Close database connection"""
         if self._conn is not None:
             self._conn.close()
             self._conn = None
-
-    def __del__(self):
-        """Ensure connection is closed on deletion"""
-        self.close()
+        if getattr(self, "_shard", None) is not None:
+            self._shards.release(self._shard)
+            self._shard_project = self._shard = None
 
     def _init_db(self):
         """Initialize database tables if they don't exist"""
         try:
             conn = self.conn
-            conn.execute("""
-                -- Create sequences for auto-incrementing IDs
-                CREATE SEQUENCE IF NOT EXISTS material_id_seq;
-                CREATE SEQUENCE IF NOT EXISTS processing_history_id_seq;
-                CREATE SEQUENCE IF NOT EXISTS processing_error_id_seq;
-                CREATE SEQUENCE IF NOT EXISTS processing_result_id_seq;
-
-                -- Reference Data Tables
-                CREATE TABLE IF NOT EXISTS kbob_materials (
-                    uuid TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    indicator_co2eq REAL NOT NULL,
-                    indicator_penre REAL NOT NULL,
-                    indicator_ubp REAL NOT NULL,
-                    density REAL,
-                    version TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (uuid, version)
-                );
-
-                CREATE TABLE IF NOT EXISTS kbob_versions (
-                    version TEXT PRIMARY KEY,
-                    is_active BOOLEAN DEFAULT false,
-                    release_date DATE NOT NULL,
-                    description TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-
-                CREATE TABLE IF NOT EXISTS life_expectancy (
-                    ebkp_code TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    years INTEGER NOT NULL,
-                    model_based BOOLEAN DEFAULT true,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (ebkp_code, description)
-                );
-
-                CREATE TABLE IF NOT EXISTS cost_reference (
-                    ebkp_code TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    unit TEXT NOT NULL,
-                    cost_per_unit REAL NOT NULL,
-                    version TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (ebkp_code, version)
-                );
-
-                -- Project Data Tables
-                CREATE TABLE IF NOT EXISTS projects (
-                    project_id VARCHAR PRIMARY KEY,
-                    name VARCHAR NOT NULL,
-                    life_expectancy INTEGER DEFAULT 60,
-                    kbob_version VARCHAR NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP,
-                    status VARCHAR CHECK(status IN ('active', 'processing', 'completed', 'failed'))
-                );
-
-                -- IFC Data Tables
-                CREATE TABLE IF NOT EXISTS ifc_elements (
-                    id VARCHAR PRIMARY KEY,
-                    ifc_class VARCHAR NOT NULL,
-                    object_type VARCHAR,
-                    load_bearing BOOLEAN,
-                    is_external BOOLEAN,
-                    ebkp VARCHAR,
-                    -- Quantities
-                    volume_net DOUBLE,
-                    volume_gross DOUBLE,
-                    area_net DOUBLE,
-                    area_gross DOUBLE,
-                    length DOUBLE,
-                    width DOUBLE,
-                    height DOUBLE,
-                    -- Metadata
-                    project_id VARCHAR NOT NULL,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-
-                CREATE TABLE IF NOT EXISTS ifc_element_materials (
-                    id BIGINT PRIMARY KEY DEFAULT nextval('material_id_seq'),
-                    element_id VARCHAR,
-                    material_name VARCHAR NOT NULL,
-                    fraction DOUBLE,
-                    volume DOUBLE,
-                    width DOUBLE,
-                    density DOUBLE,
-                    UNIQUE(element_id, material_name),
-                    FOREIGN KEY(element_id) REFERENCES ifc_elements(id)
-                );
-
-                CREATE TABLE IF NOT EXISTS material_mappings (
-                    project_id VARCHAR NOT NULL,
-                    ifc_material VARCHAR NOT NULL,
-                    kbob_id VARCHAR,
-                    kbob_version VARCHAR NOT NULL,
-                    type VARCHAR,
-                    is_modelled BOOLEAN DEFAULT true,
-                    ebkp VARCHAR,
-                    quantity DOUBLE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(project_id, ifc_material, kbob_id, kbob_version)
-                );
-
-                -- Processing Tables
-                CREATE TABLE IF NOT EXISTS processing_results (
-                    id BIGINT PRIMARY KEY DEFAULT nextval('processing_result_id_seq'),
-                    element_id VARCHAR,
-                    material_name VARCHAR NOT NULL,
-                    kbob_uuid VARCHAR NOT NULL,
-                    kbob_version VARCHAR NOT NULL,
-                    volume DOUBLE,
-                    density DOUBLE,
-                    gwp_absolute DOUBLE,
-                    gwp_relative DOUBLE,
-                    penr_absolute DOUBLE,
-                    penr_relative DOUBLE,
-                    ubp_absolute DOUBLE,
-                    ubp_relative DOUBLE,
-                    amortization INTEGER,
-                    ebkp_h VARCHAR,
-                    failed BOOLEAN DEFAULT false,
-                    error TEXT,
-                    project_id VARCHAR NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY(element_id) REFERENCES ifc_elements(id)
-                );
-
-                CREATE TABLE IF NOT EXISTS processing_errors (
-                    id BIGINT PRIMARY KEY DEFAULT nextval('processing_error_id_seq'),
-                    project_id VARCHAR NOT NULL,
-                    element_id VARCHAR,
-                    material_name VARCHAR,
-                    error_type VARCHAR,
-                    error_message TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-
-                CREATE TABLE IF NOT EXISTS processing_history (
-                    id BIGINT PRIMARY KEY DEFAULT nextval('processing_history_id_seq'),
-                    project_id VARCHAR NOT NULL,
-                    total_elements INTEGER,
-                    processed_elements INTEGER,
-                    failed_elements INTEGER,
-                    processing_time DOUBLE,
-                    kbob_version VARCHAR NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-
-                -- Create indexes for better query performance
-                CREATE INDEX IF NOT EXISTS idx_kbob_name ON kbob_materials(name);
-                CREATE INDEX IF NOT EXISTS idx_kbob_version ON kbob_materials(version);
-                CREATE INDEX IF NOT EXISTS idx_ifc_elements_project ON ifc_elements(project_id);
-                CREATE INDEX IF NOT EXISTS idx_element_materials ON ifc_element_materials(element_id);
-                CREATE INDEX IF NOT EXISTS idx_material_mappings ON material_mappings(ifc_material, kbob_version);
-                CREATE INDEX IF NOT EXISTS idx_processing_results_project ON processing_results(project_id);
-                CREATE INDEX IF NOT EXISTS idx_processing_errors_project ON processing_errors(project_id);
-                CREATE INDEX IF NOT EXISTS idx_processing_history_project ON processing_history(project_id);
-            """)
+            for schema in self._schemas:
+                conn.execute(schema)
         except Exception as e:
             logging.error(f"Failed to initialize database: {str(e)}")
             raise
 
+    @traced("db.import_kbob_data")
+    @timed_db_call
+    @writes()
     def import_kbob_data(self, csv_path: str, version: str, description: Optional[str] = None, use_transaction: bool = True) -> None:
         """Import KBOB data from CSV file"""
         try:
@@ -265,6 +568,7 @@ class DatabaseManager:
             logging.error(f"Failed to import KBOB data: {str(e)}")
             raise
 
+    @timed_db_call
     def get_kbob_material(self, uuid: str, version: Optional[str] = None) -> Optional[dict]:
         """Get KBOB material by UUID and optionally version"""
         try:
@@ -300,6 +604,30 @@ class DatabaseManager:
             logging.error(f"Failed to get KBOB material: {str(e)}")
             raise
 
+    @timed_db_call
+    def get_kbob_materials(self, version: str) -> Dict[str, dict]:
+        """Get all KBOB materials of a version, keyed by UUID"""
+        try:
+            result = self.conn.execute("""
+                SELECT 
+                    uuid, name, indicator_co2eq, indicator_penre, 
+                    indicator_ubp, density, version, created_at
+                FROM kbob_materials 
+                WHERE version = ?
+            """, [version])
+            columns = [desc[0] for desc in result.description]
+            return {row[0]: dict(zip(columns, row)) for row in result.fetchall()}
+        except Exception as e:
+            logging.error(f"Failed to get KBOB materials: {str(e)}")
+            raise
+
+    @timed_db_call
+    def get_life_expectancies(self) -> Dict[str, int]:
+        """Life expectancy in years per eBKP code (the shortest where a code has several entries)."""
+        rows = self.conn.execute("SELECT ebkp_code, MIN(years) FROM life_expectancy GROUP BY ebkp_code").fetchall()
+        return dict(rows)
+
+    @timed_db_call
     def get_active_kbob_version(self) -> Optional[str]:
         """Get the currently active KBOB version"""
         try:
@@ -315,6 +643,9 @@ class DatabaseManager:
             logging.error(f"Failed to get active KBOB version: {str(e)}")
             raise
 
+    @traced("db.set_active_kbob_version")
+    @timed_db_call
+    @writes()
     def set_active_kbob_version(self, version: str, use_transaction: bool = True) -> None:
         """Set the active KBOB version"""
         try:
@@ -347,6 +678,9 @@ class DatabaseManager:
                     pass  # Ignore rollback errors
             raise
 
+    @traced("db.init_reference_data")
+    @timed_db_call
+    @writes()
     def init_reference_data(self, kbob_path: str, cost_path: str):
         """Initialize reference data tables from source files"""
         try:
@@ -374,6 +708,9 @@ class DatabaseManager:
             logging.error(f"Failed to load reference data: {str(e)}")
             raise
 
+    @traced("db.init_life_expectancy_data")
+    @timed_db_call
+    @writes()
     def init_life_expectancy_data(self, data: List[Dict[str, Any]], use_transaction: bool = True):
         """Initialize life expectancy data in the database"""
         try:
@@ -403,6 +740,21 @@ class DatabaseManager:
                     pass  # Ignore rollback errors
             raise
 
+    @contextmanager
+    def _element_filter(self, element_ids: Optional[List[str]]):
+        """SQL condition (with a {column} placeholder) restricting element IDs to element_ids; None means all."""
+        if element_ids is None:
+            yield "true"
+            return
+        self.conn.register("element_id_filter", pa.table({"id": pa.array(element_ids, type=pa.string())}))
+        try:
+            yield "{column} IN (SELECT id FROM element_id_filter)"
+        finally:
+            self.conn.unregister("element_id_filter")
+
+    @traced("db.store_ifc_elements")
+    @timed_db_call
+    @writes()
     def store_ifc_elements(self, elements: List[Dict[str, Any]], project_id: str) -> None:
         conn = self.conn
         # First transaction: insert/update IFC elements without using ON CONFLICT clause
@@ -413,75 +765,21 @@ class DatabaseManager:
                 element_id = element.get('id') or element.get('guid')
                 if not element_id:
                     continue
-                quantities = element.get('quantities', {})
-                volume_data = quantities.get('volume', {})
-                volume_net = volume_data.get('net')
-                volume_gross = volume_data.get('gross')
-                dimensions = quantities.get('dimensions', {})
-                length = dimensions.get('length')
-                width = dimensions.get('width')
-                height = dimensions.get('height')
-                area_data = quantities.get('area', {})
-                area_net = area_data.get('net')
-                area_gross = area_data.get('gross')
-                load_bearing = element.get('load_bearing') if element.get('load_bearing') is not None else element.get('properties', {}).get('loadBearing')
-                is_external = element.get('is_external') if element.get('is_external') is not None else element.get('properties', {}).get('isExternal')
-                ebkp = element.get('properties', {}).get('ebkp') or element.get('properties', {}).get('reference')
+                row = element_row(element)
                 
                 # Check if the element already exists
                 existing = conn.execute("SELECT 1 FROM ifc_elements WHERE id = ?", [element_id]).fetchone()
                 if existing:
-                    conn.execute("""UPDATE ifc_elements SET
-                        ifc_class = ?,
-                        object_type = ?,
-                        load_bearing = ?,
-                        is_external = ?,
-                        ebkp = ?,
-                        volume_net = ?,
-                        volume_gross = ?,
-                        area_net = ?,
-                        area_gross = ?,
-                        length = ?,
-                        width = ?,
-                        height = ?,
+                    conn.execute(f"""UPDATE ifc_elements SET
+                        {", ".join(f"{column} = ?" for column in ELEMENT_COLUMNS)},
                         timestamp = now()
                         WHERE id = ?
-                    """, [
-                        element.get('ifc_class', 'Unknown'),
-                        element.get('object_type'),
-                        load_bearing,
-                        is_external,
-                        ebkp,
-                        volume_net,
-                        volume_gross,
-                        area_net,
-                        area_gross,
-                        length,
-                        width,
-                        height,
-                        element_id
-                    ])
+                    """, [*row.values(), element_id])
                 else:
-                    conn.execute("""INSERT INTO ifc_elements (
-                        id, ifc_class, object_type, load_bearing, is_external, ebkp,
-                        volume_net, volume_gross, area_net, area_gross, length, width, height, project_id, timestamp
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, now())
-                    """, [
-                        element_id,
-                        element.get('ifc_class', 'Unknown'),
-                        element.get('object_type'),
-                        load_bearing,
-                        is_external,
-                        ebkp,
-                        volume_net,
-                        volume_gross,
-                        area_net,
-                        area_gross,
-                        length,
-                        width,
-                        height,
-                        project_id
-                    ])
+                    conn.execute(f"""INSERT INTO ifc_elements (
+                        id, {", ".join(ELEMENT_COLUMNS)}, project_id, timestamp
+                    ) VALUES (?, {", ".join("?" for _ in ELEMENT_COLUMNS)}, ?, now())
+                    """, [element_id, *row.values(), project_id])
             conn.execute("COMMIT")
         except Exception as e:
             try:
@@ -497,7 +795,7 @@ class DatabaseManager:
                 element_id = element.get('id') or element.get('guid')
                 if not element_id:
                     continue
-                for material_name, material_data in element.get('material_volumes', {}).items():
+                for material in material_rows(element):
                     conn.execute("""INSERT INTO ifc_element_materials (
                         element_id, material_name, fraction, volume, width, density
                     ) VALUES (?, ?, ?, ?, ?, ?)
@@ -506,14 +804,8 @@ class DatabaseManager:
                         volume = EXCLUDED.volume,
                         width = EXCLUDED.width,
                         density = EXCLUDED.density
-                    """, [
-                        element_id,
-                        material_name,
-                        material_data.get('fraction'),
-                        material_data.get('volume'),
-                        material_data.get('width'),
-                        material_data.get('density', 0)
-                    ])
+                    """, [element_id, *material])
+            self.refresh_project_stats(project_id)
             conn.execute("COMMIT")
         except Exception as e:
             try:
@@ -522,167 +814,478 @@ class DatabaseManager:
                 pass
             raise
 
+    @traced("db.sync_ifc_elements")
+    @timed_db_call
+    @writes()
+    def sync_ifc_elements(self, elements: List[Dict[str, Any]], project_id: str) -> Dict[str, List[str]]:
+        """Make the stored elements of a project match a new model revision, writing only the difference.
+
+        Elements are matched by ID (stable_element_id) and compared by
+        content_hash. Removed and changed elements are deleted together with
+        their materials and processing results, added and changed ones are
+        inserted in bulk, unchanged ones are left alone. Returns the IDs of
+        the added, changed and removed elements.
+        """
+        new_rows, new_materials, hashes = [], [], {}
+        for element in elements:
+            element_id = element.get('id') or element.get('guid')
+            if not element_id or element_id in hashes:
+                continue
+            row = element_row(element)
+            materials = material_rows(element)
+            hashes[element_id] = content_hash(row, materials)
+            new_rows.append({"id": element_id, "global_id": element.get('global_id'), **row,
+                             "content_hash": hashes[element_id]})
+            new_materials.extend((element_id, *material) for material in materials)
+
+        conn = self.conn
+        stored = dict(conn.execute(
+            "SELECT id, content_hash FROM ifc_elements WHERE project_id = ?", [project_id]
+        ).fetchall())
+        diff = {
+            "added": [element_id for element_id in hashes if element_id not in stored],
+            "changed": [element_id for element_id, value in hashes.items()
+                        if element_id in stored and stored[element_id] != value],
+            "removed": [element_id for element_id in stored if element_id not in hashes],
+        }
+        written = set(diff["added"]) | set(diff["changed"])
+        rows = [row for row in new_rows if row["id"] in written]
+        materials = [material for material in new_materials if material[0] in written]
+
+        try:
+            conn.register("element_delta_ids", pa.table({"id": pa.array(diff["changed"] + diff["removed"], type=pa.string())}))
+            # DuckDB checks foreign keys against committed data, so the rows referencing the elements are
+            # deleted first. Clearing the hashes of changed elements keeps them marked as changed should
+            # the second transaction fail.
+            conn.execute("BEGIN TRANSACTION")
+            conn.execute("DELETE FROM processing_results WHERE element_id IN (SELECT id FROM element_delta_ids)")
+            deleted_materials = conn.execute(
+                "DELETE FROM ifc_element_materials WHERE element_id IN (SELECT id FROM element_delta_ids)"
+            ).fetchone()[0]
+            conn.execute("UPDATE ifc_elements SET content_hash = NULL WHERE id IN (SELECT id FROM element_delta_ids)")
+            self._update_project_stats(project_id, materials=-deleted_materials)
+            conn.execute("COMMIT")
+
+            conn.execute("BEGIN TRANSACTION")
+            deleted_elements = conn.execute(
+                "DELETE FROM ifc_elements WHERE id IN (SELECT id FROM element_delta_ids)"
+            ).fetchone()[0]
+            if rows:
+                conn.register("element_delta_rows", pa.Table.from_pylist(rows))
+                columns = ", ".join(("id", "global_id", *ELEMENT_COLUMNS, "content_hash"))
+                conn.execute(f"""
+                    INSERT INTO ifc_elements ({columns}, project_id, timestamp)
+                    SELECT {columns}, $project_id, now() FROM element_delta_rows
+                """, {"project_id": project_id})
+            if materials:
+                conn.register("element_delta_materials", pa.Table.from_pylist(
+                    [dict(zip(("element_id", *MATERIAL_COLUMNS), material)) for material in materials]
+                ))
+                conn.execute(f"""
+                    INSERT INTO ifc_element_materials (element_id, {", ".join(MATERIAL_COLUMNS)})
+                    SELECT element_id, {", ".join(MATERIAL_COLUMNS)} FROM element_delta_materials
+                """)
+            self._update_project_stats(project_id, elements=len(rows) - deleted_elements, materials=len(materials))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            for name in ("element_delta_ids", "element_delta_rows", "element_delta_materials"):
+                conn.unregister(name)
+        logging.info(
+            f"Synced elements of project {project_id}: {len(diff['added'])} added, {len(diff['changed'])} changed, "
+            f"{len(diff['removed'])} removed, {len(hashes) - len(written)} unchanged"
+        )
+        return diff
+
+    @traced("db.delete_ifc_element")
+    @timed_db_call
+    @writes()
     def delete_ifc_element(self, element_id: str) -> None:
         """Delete an IFC element and its related records"""
         try:
             conn = self.conn
+            # DuckDB checks foreign keys against committed data: the element goes in a second transaction
             conn.execute("BEGIN TRANSACTION")
+            project = conn.execute("SELECT project_id FROM ifc_elements WHERE id = ?", [element_id]).fetchone()
 
             # Delete related records first
             conn.execute("DELETE FROM processing_results WHERE element_id = ?", [element_id])
-            conn.execute("DELETE FROM ifc_element_materials WHERE element_id = ?", [element_id])
+            materials = conn.execute("DELETE FROM ifc_element_materials WHERE element_id = ?", [element_id]).fetchone()[0]
+            if project:
+                self._update_project_stats(project[0], materials=-materials)
+            conn.execute("COMMIT")
             
             # Then delete the element itself
-            conn.execute("DELETE FROM ifc_elements WHERE id = ?", [element_id])
-
+            conn.execute("BEGIN TRANSACTION")
+            elements = conn.execute("DELETE FROM ifc_elements WHERE id = ?", [element_id]).fetchone()[0]
+            if project:
+                self._update_project_stats(project[0], elements=-elements)
             conn.execute("COMMIT")
         except Exception as e:
             conn.execute("ROLLBACK")
             logging.error(f"Failed to delete IFC element: {str(e)}")
             raise
 
+    @traced("db.delete_project_elements")
+    @timed_db_call
+    @writes()
     def delete_project_elements(self, project_id: str) -> None:
         """Delete all IFC elements and related records for a project"""
         try:
             conn = self.conn
+            # DuckDB checks foreign keys against committed data: the elements go in a second transaction
             conn.execute("BEGIN TRANSACTION")
 
-            # Get all element IDs for the project
-            element_ids = conn.execute("""
-                SELECT id FROM ifc_elements WHERE project_id = ?
-            """, [project_id]).fetchall()
-
-            # Delete related records for each element
-            for (element_id,) in element_ids:
-                conn.execute("DELETE FROM processing_results WHERE element_id = ?", [element_id])
-                conn.execute("DELETE FROM ifc_element_materials WHERE element_id = ?", [element_id])
+            # Delete related records of the project's elements
+            conn.execute("""
+                DELETE FROM processing_results
+                WHERE element_id IN (SELECT id FROM ifc_elements WHERE project_id = ?)
+            """, [project_id])
+            conn.execute("""
+                DELETE FROM ifc_element_materials
+                WHERE element_id IN (SELECT id FROM ifc_elements WHERE project_id = ?)
+            """, [project_id])
+            self.refresh_project_stats(project_id)
+            conn.execute("COMMIT")
 
             # Delete all elements for the project
+            conn.execute("BEGIN TRANSACTION")
             conn.execute("DELETE FROM ifc_elements WHERE project_id = ?", [project_id])
-
+            # Stages must rerun once the elements are gone
+            conn.execute("DELETE FROM stage_fingerprints WHERE project_id = ?", [project_id])
+            self.refresh_project_stats(project_id)
             conn.execute("COMMIT")
         except Exception as e:
             conn.execute("ROLLBACK")
             logging.error(f"Failed to delete project elements: {str(e)}")
             raise
 
+    @traced("db.init_project")
+    @timed_db_call
+    @writes()
     def init_project(self, project_id: str, name: str, kbob_version: str, life_expectancy: int = 60) -> None:
         """Initialize a new project in the database or update if it exists."""
-        try:
-            self.conn.execute(
-                """
-                INSERT INTO projects (project_id, name, life_expectancy, kbob_version, status)
-                VALUES (?, ?, ?, ?, 'active')
-                ON CONFLICT(project_id) DO UPDATE SET
-                    name = EXCLUDED.name,
-                    life_expectancy = EXCLUDED.life_expectancy,
-                    kbob_version = EXCLUDED.kbob_version,
-                    updated_at = now(),
-                    status = 'active'
-                """,
-                [project_id, name, life_expectancy, kbob_version]
-            )
-            self.conn.commit()
-            logging.info(f"Upserted project {project_id} successfully")
-        except Exception as e:
-            logging.error(f"Failed to initialize project: {e}")
-            raise
+        with self._project_lock:
+            try:
+                self.conn.execute(
+                    """
+                    INSERT INTO projects (project_id, name, life_expectancy, kbob_version, status)
+                    VALUES (?, ?, ?, ?, 'active')
+                    ON CONFLICT(project_id) DO UPDATE SET
+                        name = EXCLUDED.name,
+                        life_expectancy = EXCLUDED.life_expectancy,
+                        kbob_version = EXCLUDED.kbob_version,
+                        updated_at = now(),
+                        status = 'active'
+                    """,
+                    [project_id, name, life_expectancy, kbob_version]
+                )
+                self.conn.commit()
+                logging.info(f"Upserted project {project_id} successfully")
+            except Exception as e:
+                logging.error(f"Failed to initialize project: {e}")
+                raise
 
+    @traced("db.log_processing_error")
+    @timed_db_call
+    @writes("project")
     def log_processing_error(self, project_id: str, error_data: Dict[str, Any]) -> None:
         """Log a processing error to the database."""
         try:
-            self.conn.execute("""
-                INSERT INTO processing_errors (
-                    project_id, element_id, material_name, 
-                    error_type, error_message
-                ) VALUES (?, ?, ?, ?, ?)
-            """, [
-                project_id,
-                error_data.get("element_id"),
-                error_data.get("material_name"),
-                error_data.get("error_type"),
-                error_data.get("error_message")
-            ])
+            with self.transaction():
+                self.conn.execute("""
+                    INSERT INTO processing_errors (
+                        project_id, element_id, material_name, 
+                        error_type, error_message
+                    ) VALUES (?, ?, ?, ?, ?)
+                """, [
+                    project_id,
+                    error_data.get("element_id"),
+                    error_data.get("material_name"),
+                    error_data.get("error_type"),
+                    error_data.get("error_message")
+                ])
+                self._update_project_stats(project_id, errors=1)
         except Exception as e:
             logging.error(f"Failed to log processing error: {e}")
             raise
 
+    @traced("db.log_processing_errors")
+    @timed_db_call
+    @writes("project")
+    def log_processing_errors(self, project_id: str, errors: pa.Table) -> None:
+        """Log many processing errors at once.
+
+        errors holds the columns element_id, material_name, error_type and
+        error_message, one row per error.
+        """
+        if errors.num_rows == 0:
+            return
+        try:
+            self.conn.register("processing_errors_batch", errors)
+            with self.transaction():
+                self.conn.execute("""
+                    INSERT INTO processing_errors (
+                        project_id, element_id, material_name, 
+                        error_type, error_message
+                    )
+                    SELECT ?, element_id, material_name, error_type, error_message
+                    FROM processing_errors_batch
+                """, [project_id])
+                self._update_project_stats(project_id, errors=errors.num_rows)
+        except Exception as e:
+            logging.error(f"Failed to log processing errors: {e}")
+            raise
+        finally:
+            self.conn.unregister("processing_errors_batch")
+
+    @traced("db.update_processing_history")
+    @timed_db_call
+    @writes("project")
     def update_processing_history(self, project_id: str, stats: Dict[str, Any]) -> None:
         """Update processing history with statistics."""
         try:
-            self.conn.execute("""
-                INSERT INTO processing_history (
-                    project_id, total_elements, processed_elements,
-                    failed_elements, processing_time, kbob_version
-                ) VALUES (?, ?, ?, ?, ?, ?)
-            """, [
-                project_id,
-                stats.get("total_elements", 0),
-                stats.get("processed_elements", 0),
-                stats.get("failed_elements", 0),
-                stats.get("processing_time", 0.0),
-                stats.get("kbob_version")
-            ])
+            with self.transaction():
+                history_id = self.conn.execute("""
+                    INSERT INTO processing_history (
+                        project_id, total_elements, processed_elements,
+                        failed_elements, processing_time, kbob_version, trace_id, profile_path
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    RETURNING id
+                """, [
+                    project_id,
+                    stats.get("total_elements", 0),
+                    stats.get("processed_elements", 0),
+                    stats.get("failed_elements", 0),
+                    stats.get("processing_time", 0.0),
+                    stats.get("kbob_version"),
+                    stats.get("trace_id") or current_trace_id(),
+                    stats.get("profile_path") or current_profile_path()
+                ]).fetchone()[0]
+                self._update_project_stats(project_id, last_history_id=history_id)
         except Exception as e:
             logging.error(f"Failed to update processing history: {e}")
             raise
 
+    @traced("db.update_project_status")
+    @timed_db_call
+    @writes("catalog")
     def update_project_status(self, project_id: str, status: str) -> None:
         """Update project status."""
         valid_statuses = ['active', 'processing', 'completed', 'failed']
         if status not in valid_statuses:
             raise ValueError(f"Invalid status. Must be one of: {valid_statuses}")
 
+        with self._project_lock:
+            try:
+                self.conn.execute("""
+                    UPDATE projects 
+                    SET status = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE project_id = ?
+                """, [status, project_id])
+            except Exception as e:
+                logging.error(f"Failed to update project status: {e}")
+                raise
+
+    @timed_db_call
+    def get_project_ids(self) -> List[str]:
+        """IDs of all projects."""
+        return [row[0] for row in self.conn.execute("SELECT project_id FROM projects ORDER BY project_id").fetchall()]
+
+    @traced("db.compact_processing_logs")
+    @timed_db_call
+    @writes()
+    def compact_processing_logs(self, project_id: str, keep_runs: int) -> Dict[str, int]:
+        """Keep the processing history of the last keep_runs runs of a project and roll older errors up.
+
+        Errors logged up to the end of the newest run beyond the window are
+        added to processing_error_summary as counts per error type and
+        deleted, together with the history rows of those runs. Returns the
+        numbers of rolled up errors and deleted history rows.
+        """
+        conn = self.conn
+        cutoff = conn.execute("""
+            SELECT created_at FROM processing_history
+            WHERE project_id = ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT 1 OFFSET ?
+        """, [project_id, keep_runs]).fetchone()
+        if cutoff is None:
+            return {"errors_rolled_up": 0, "history_deleted": 0}
         try:
-            self.conn.execute("""
-                UPDATE projects 
-                SET status = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE project_id = ?
-            """, [status, project_id])
+            conn.execute("BEGIN TRANSACTION")
+            conn.execute("""
+                INSERT INTO processing_error_summary (project_id, error_type, error_count, first_seen, last_seen)
+                SELECT project_id, COALESCE(error_type, 'unknown'), COUNT(*), MIN(created_at), MAX(created_at)
+                FROM processing_errors
+                WHERE project_id = $project_id AND created_at <= $cutoff
+                GROUP BY project_id, COALESCE(error_type, 'unknown')
+                ON CONFLICT (project_id, error_type) DO UPDATE SET
+                    error_count = error_count + EXCLUDED.error_count,
+                    first_seen = least(first_seen, EXCLUDED.first_seen),
+                    last_seen = greatest(last_seen, EXCLUDED.last_seen)
+            """, {"project_id": project_id, "cutoff": cutoff[0]})
+            errors = conn.execute(
+                "DELETE FROM processing_errors WHERE project_id = ? AND created_at <= ?", [project_id, cutoff[0]]
+            ).fetchone()[0]
+            history = conn.execute(
+                "DELETE FROM processing_history WHERE project_id = ? AND created_at <= ?", [project_id, cutoff[0]]
+            ).fetchone()[0]
+            conn.execute("COMMIT")
         except Exception as e:
-            logging.error(f"Failed to update project status: {e}")
+            conn.execute("ROLLBACK")
+            logging.error(f"Failed to compact processing logs: {e}")
             raise
+        return {"errors_rolled_up": errors, "history_deleted": history}
+
+    @timed_db_call
+    def get_error_summary(self, project_id: str) -> Dict[str, int]:
+        """Errors of a project per error type, retained and rolled up."""
+        rows = self.conn.execute("""
+            SELECT error_type, SUM(error_count) FROM (
+                SELECT COALESCE(error_type, 'unknown') AS error_type, COUNT(*) AS error_count
+                FROM processing_errors WHERE project_id = $project_id GROUP BY 1
+                UNION ALL
+                SELECT error_type, error_count FROM processing_error_summary WHERE project_id = $project_id
+            ) GROUP BY error_type ORDER BY error_type
+        """, {"project_id": project_id}).fetchall()
+        return {error_type: int(count) for error_type, count in rows}
+
+    @traced("db.checkpoint")
+    @timed_db_call
+    @writes()
+    def checkpoint(self) -> Dict[str, Any]:
+        """Checkpoint the default database of the connection (a project shard in a session).
 
+        Writes the WAL into the database file and frees the blocks of deleted
+        rows for reuse. Returns the used bytes before and after and the
+        difference (reclaimed_bytes); skipped while other write transactions
+        are open.
+        """
+        def used_bytes() -> int:
+            return self.conn.execute("""
+                SELECT used_blocks * block_size FROM pragma_database_size()
+                WHERE database_name = current_database()
+            """).fetchone()[0]
+
+        database = self.conn.execute("SELECT current_database()").fetchone()[0]
+        before = used_bytes()
+        try:
+            self.conn.execute("CHECKPOINT")
+        except duckdb.Error as e:
+            logging.info(f"Skipped checkpoint of {database}: {e}")
+            return {"database": database, "used_bytes_before": before, "used_bytes_after": before,
+                    "reclaimed_bytes": 0, "skipped": True}
+        after = used_bytes()
+        return {"database": database, "used_bytes_before": before, "used_bytes_after": after,
+                "reclaimed_bytes": max(before - after, 0), "skipped": False}
+
+    @traced("db.refresh_project_stats")
+    @timed_db_call
+    @writes("project")
+    def refresh_project_stats(self, project_id: str) -> None:
+        """Recount the project_stats row of a project from its elements, errors and history."""
+        self.conn.execute("""
+            INSERT OR REPLACE INTO project_stats (
+                project_id, element_count, material_count, error_count,
+                last_history_id, last_total_elements, last_processed_elements, last_failed_elements,
+                last_processing_time, last_kbob_version, last_trace_id, last_profile_path, last_run_at, updated_at
+            )
+            SELECT
+                $project_id,
+                (SELECT COUNT(*) FROM ifc_elements WHERE project_id = $project_id),
+                (SELECT COUNT(*) FROM ifc_element_materials m JOIN ifc_elements e ON e.id = m.element_id
+                 WHERE e.project_id = $project_id),
+                (SELECT COUNT(*) FROM processing_errors WHERE project_id = $project_id)
+                    + (SELECT COALESCE(SUM(error_count), 0) FROM processing_error_summary WHERE project_id = $project_id),
+                h.id, h.total_elements, h.processed_elements, h.failed_elements,
+                h.processing_time, h.kbob_version, h.trace_id, h.profile_path, h.created_at, now()
+            FROM (SELECT 1) LEFT JOIN (
+                SELECT * FROM processing_history WHERE project_id = $project_id
+                ORDER BY created_at DESC, id DESC LIMIT 1
+            ) h ON true
+        """, {"project_id": project_id})
+
+    def _update_project_stats(self, project_id: str, elements: int = 0, materials: int = 0, errors: int = 0,
+                              last_history_id: Optional[int] = None) -> None:
+        """Apply changes to the counters of a project within the caller's transaction.
+
+        A project without a project_stats row yet (e.g. data from before the
+        table existed) is counted in full instead, including the changes of
+        the transaction.
+        """
+        if self.conn.execute("SELECT 1 FROM project_stats WHERE project_id = ?", [project_id]).fetchone() is None:
+            self.refresh_project_stats(project_id)
+            return
+        self.conn.execute("""
+            UPDATE project_stats SET
+                element_count = element_count + ?,
+                material_count = material_count + ?,
+                error_count = error_count + ?,
+                updated_at = now()
+            WHERE project_id = ?
+        """, [elements, materials, errors, project_id])
+        if last_history_id is not None:
+            self.conn.execute("""
+                UPDATE project_stats SET
+                    last_history_id = h.id,
+                    last_total_elements = h.total_elements,
+                    last_processed_elements = h.processed_elements,
+                    last_failed_elements = h.failed_elements,
+                    last_processing_time = h.processing_time,
+                    last_kbob_version = h.kbob_version,
+                    last_trace_id = h.trace_id,
+                    last_profile_path = h.profile_path,
+                    last_run_at = h.created_at
+                FROM processing_history h
+                WHERE h.id = ? AND project_stats.project_id = ?
+            """, [last_history_id, project_id])
+
+    @timed_db_call
     def get_project_info(self, project_id: str) -> Optional[Dict[str, Any]]:
-        """Get project information including processing history."""
+        """Get project information including its totals and latest run.
+
+        A primary key lookup of the project and its project_stats row; the
+        counters are only computed here for projects that do not have them yet.
+        """
         try:
-            # First get the project details
-            project = self.conn.execute("""
-                SELECT 
-                    p.project_id,
-                    p.name,
-                    p.life_expectancy,
-                    p.kbob_version,
-                    p.created_at,
-                    p.updated_at,
-                    p.status,
-                    COUNT(DISTINCT e.id) as total_elements,
-                    COUNT(DISTINCT pe.id) as total_errors
+            query = """
+                SELECT
+                    p.project_id, p.name, p.life_expectancy, p.kbob_version,
+                    p.created_at, p.updated_at, p.status,
+                    s.project_id IS NOT NULL AS has_stats,
+                    s.element_count, s.material_count, s.error_count,
+                    s.last_history_id, s.last_total_elements, s.last_processed_elements, s.last_failed_elements,
+                    s.last_processing_time, s.last_kbob_version, s.last_trace_id, s.last_profile_path, s.last_run_at,
+                    s.updated_at
                 FROM projects p
-                LEFT JOIN ifc_elements e ON p.project_id = e.project_id
-                LEFT JOIN processing_errors pe ON p.project_id = pe.project_id
+                LEFT JOIN project_stats s ON s.project_id = p.project_id
                 WHERE p.project_id = ?
-                GROUP BY 
-                    p.project_id, p.name, p.life_expectancy, p.kbob_version,
-                    p.created_at, p.updated_at, p.status
-            """, [project_id]).fetchone()
-
+            """
+            project = self.conn.execute(query, [project_id]).fetchone()
             if not project:
                 return None
+            if not project[7]:
+                self.refresh_project_stats(project_id)
+                project = self.conn.execute(query, [project_id]).fetchone()
 
-            # Get latest processing history separately
-            history = self.conn.execute("""
-                SELECT * FROM processing_history
-                WHERE project_id = ?
-                ORDER BY created_at DESC
-                LIMIT 1
-            """, [project_id]).fetchone()
-
-            # Get column names for history
-            history_columns = None
-            if history:
-                history_columns = [desc[0] for desc in self.conn.description]
-                history = dict(zip(history_columns, history))
+            # Latest run in the columns of processing_history
+            history = None
+            if project[11] is not None:
+                history = {
+                    "id": project[11],
+                    "project_id": project[0],
+                    "total_elements": project[12],
+                    "processed_elements": project[13],
+                    "failed_elements": project[14],
+                    "processing_time": project[15],
+                    "kbob_version": project[16],
+                    "trace_id": project[17],
+                    "profile_path": project[18],
+                    "created_at": project[19],
+                }
 
             return {
                 "project_id": project[0],
@@ -692,32 +1295,38 @@ class DatabaseManager:
                 "created_at": project[4],
                 "updated_at": project[5],
                 "status": project[6],
-                "total_elements": project[7],
-                "total_errors": project[8],
+                "total_elements": project[8],
+                "total_materials": project[9],
+                "total_errors": project[10],
+                # Changes whenever elements, errors or runs of the project are written
+                "counters_updated_at": project[20],
                 "latest_processing": history
             }
         except Exception as e:
             logging.error(f"Failed to get project info: {e}")
             raise
 
-    def get_ifc_elements(self, project_id: str) -> List[Dict[str, Any]]:
+    @timed_db_call
+    def get_ifc_elements(self, project_id: str, element_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """
-        Fetch IFC elements for the given project from the database.
+        Fetch IFC elements for the given project from the database, optionally only those in element_ids.
         
         Returns a list of dictionaries where each dictionary corresponds to a row in the ifc_elements table.
         """
         try:
-            cursor = self.conn.execute(
-                "SELECT * FROM ifc_elements WHERE project_id = ?",
-                [project_id]
-            )
-            columns = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
+            with self._element_filter(element_ids) as condition:
+                cursor = self.conn.execute(
+                    f"SELECT * FROM ifc_elements WHERE project_id = ? AND {condition.format(column='id')}",
+                    [project_id]
+                )
+                columns = [desc[0] for desc in cursor.description]
+                rows = cursor.fetchall()
             return [dict(zip(columns, row)) for row in rows]
         except Exception as e:
             logging.error(f"Error fetching IFC elements for project {project_id}: {e}")
             raise
 
+    @timed_db_call
     def get_cost_data(self, project_id: str) -> List[Dict[str, Any]]:
         """
         Fetch cost data (from the cost_reference table) to be used in cost processing.
@@ -747,6 +1356,7 @@ class DatabaseManager:
             logging.error(f"Error fetching cost data for project {project_id}: {e}")
             raise
 
+    @timed_db_call
     def get_material_mappings(self, project_id: Optional[str] = None) -> dict:
         """Retrieve material mappings for the given project (or globally if not project-specific) from the database."""
         project_id = project_id or DEFAULT_PROJECT_ID
@@ -766,84 +1376,288 @@ class DatabaseManager:
             logging.error("Error retrieving material mappings", exc_info=True)
             return {}
 
+    @timed_db_call
+    def get_ifc_element_components(self, project_id: str, element_ids: Optional[List[str]] = None) -> pa.Table:
+        """Fetch the materials of all IFC elements of a project (or those in element_ids) in one query.
+
+        Returns an Arrow table with one row per element material (element_id,
+        ebkp, material_name, volume, fraction, density), grouped by element in
+        storage order. Elements without materials appear once with a null
+        material_name.
+        """
+        try:
+            with self._element_filter(element_ids) as condition:
+                return arrow_table(self.conn.execute(f"""
+                    SELECT 
+                        e.id AS element_id,
+                        e.ebkp,
+                        m.material_name,
+                        m.volume,
+                        m.fraction,
+                        m.density
+                    FROM ifc_elements e
+                    LEFT JOIN ifc_element_materials m ON m.element_id = e.id
+                    WHERE e.project_id = ? AND {condition.format(column='e.id')}
+                    ORDER BY e.rowid, m.id
+                """, [project_id]))
+        except Exception as e:
+            logging.error(f"Error fetching element materials for project {project_id}: {e}")
+            raise
+
+    @timed_db_call
     def get_ifc_element_materials(self, element_id: str) -> (List[str], Dict[str, Dict[str, float]]):
         """Retrieve materials and their volume information for a given IFC element from the database.
 
-        Returns a tuple where the first element is a list of material names and the second element is a dictionary mapping each material to a dictionary with volume information.
+        Returns a tuple where the first element is a list of material names and the second element is a dictionary mapping each material to a dictionary with volume, fraction and density.
         """
         try:
-            cursor = self.conn.execute("SELECT material_name, volume FROM ifc_element_materials WHERE element_id = ?", [element_id])
+            cursor = self.conn.execute(
+                "SELECT material_name, volume, fraction, density FROM ifc_element_materials WHERE element_id = ?",
+                [element_id]
+            )
             rows = cursor.fetchall()
             materials = []
             material_volumes = {}
             for row in rows:
-                material, volume = row[0], row[1]
+                material, volume, fraction, density = row
                 materials.append(material)
-                material_volumes[material] = {"volume": volume}
+                material_volumes[material] = {"volume": volume, "fraction": fraction, "density": density}
             return materials, material_volumes
         except Exception as e:
             logging.error(f"Error fetching materials for element {element_id}: {e}")
             return [], {}
 
-    def save_project_results(self, project_id: str, results: List[Dict[str, Any]]) -> None:
-        """Save processing results to the processing_results table."""
+    @traced("db.save_project_results")
+    @timed_db_call
+    def save_project_results(self, project_id: str, results: List[Dict[str, Any]], result_type: Optional[str] = None,
+                             element_ids: Optional[List[str]] = None) -> None:
+        """Save processing results to the processing_results table (see save_project_results_table)."""
+        columns = {name: [] for name in RESULT_COLUMNS}
+        for result in results:
+            for component in result.get("components", []):
+                columns["guid"].append(result.get("guid"))
+                for name in RESULT_COLUMNS[1:]:
+                    columns[name].append(component.get(name))
+        self.save_project_results_table(project_id, pa.table(columns), result_type, element_ids)
+
+    @traced("db.save_project_results_table")
+    @timed_db_call
+    @writes()
+    def save_project_results_table(self, project_id: str, results: pa.Table, result_type: Optional[str] = None,
+                                   element_ids: Optional[List[str]] = None) -> None:
+        """Save result rows (one per component, as in BaseProcessor.results_to_table) with a single INSERT.
+
+        Missing columns are stored as NULL. Components without a KBOB UUID
+        (failed and cost components) get an empty one, the KBOB version
+        defaults to the active version.
+
+        With a result_type the rows replace the project's previous rows of
+        that type (and rows saved without a type), in the same transaction;
+        only those of element_ids when given, for runs over part of the
+        elements.
+        """
+        if results.num_rows == 0 and result_type is None:
+            return
+        present = set(results.column_names)
+
+        def column(name: str, sql_type: str) -> str:
+            return f"CAST({name if name in present else 'NULL'} AS {sql_type})"
+
+        conn = self.conn
         try:
-            conn = self.conn
             conn.execute("BEGIN TRANSACTION")
-            for result in results:
-                element_id = result.get("guid")
-                components = result.get("components", [])
-                for component in components:
-                    material_name = component.get("material")
-                    # For successful components, use the provided 'mat_kbob'; otherwise, None
-                    kbob_uuid = component.get("mat_kbob") if not component.get("failed") else ""
-                    # Use active KBOB version if not provided in the result
-                    kbob_version = component.get("kbob_version") if component.get("kbob_version") is not None else self.get_active_kbob_version()
-                    volume = component.get("volume")
-                    density = component.get("density")
-                    gwp_absolute = component.get("gwp_absolute")
-                    gwp_relative = component.get("gwp_relative")
-                    penr_absolute = component.get("penr_absolute")
-                    penr_relative = component.get("penr_relative")
-                    ubp_absolute = component.get("ubp_absolute")
-                    ubp_relative = component.get("ubp_relative")
-                    amortization = component.get("amortization")
-                    ebkp_h = component.get("ebkp_h")
-                    failed = component.get("failed", True)
-                    error_msg = component.get("error") if failed else None
-
-                    conn.execute("""INSERT INTO processing_results (
-                        element_id, material_name, kbob_uuid, kbob_version, volume, density,
-                        gwp_absolute, gwp_relative, penr_absolute, penr_relative,
-                        ubp_absolute, ubp_relative, amortization, ebkp_h, failed, error, project_id
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, [
-                        element_id,
-                        material_name,
-                        kbob_uuid,
-                        kbob_version,
-                        volume,
-                        density,
-                        gwp_absolute,
-                        gwp_relative,
-                        penr_absolute,
-                        penr_relative,
-                        ubp_absolute,
-                        ubp_relative,
-                        amortization,
-                        ebkp_h,
-                        failed,
-                        error_msg,
-                        project_id
-                    ])
+            conn.register("processing_results_batch", results)
+            if result_type is not None:
+                with self._element_filter(element_ids) as condition:
+                    conn.execute(f"""
+                        DELETE FROM processing_results
+                        WHERE project_id = ? AND (result_type = ? OR result_type IS NULL)
+                          AND {condition.format(column='element_id')}
+                    """, [project_id, result_type])
+            conn.execute(f"""
+                INSERT INTO processing_results (
+                    element_id, material_name, kbob_uuid, kbob_version, volume, density,
+                    gwp_absolute, gwp_relative, penr_absolute, penr_relative,
+                    ubp_absolute, ubp_relative, amortization, ebkp_h, failed, error, project_id, result_type
+                )
+                SELECT
+                    {column("guid", "VARCHAR")},
+                    {column("material", "VARCHAR")},
+                    COALESCE({column("mat_kbob", "VARCHAR")}, ''),
+                    COALESCE({column("kbob_version", "VARCHAR")}, $active_version),
+                    {column("volume", "DOUBLE")},
+                    {column("density", "DOUBLE")},
+                    {column("gwp_absolute", "DOUBLE")},
+                    {column("gwp_relative", "DOUBLE")},
+                    {column("penr_absolute", "DOUBLE")},
+                    {column("penr_relative", "DOUBLE")},
+                    {column("ubp_absolute", "DOUBLE")},
+                    {column("ubp_relative", "DOUBLE")},
+                    {column("amortization", "INTEGER")},
+                    {column("ebkp_h", "VARCHAR")},
+                    COALESCE({column("failed", "BOOLEAN")}, true),
+                    CASE WHEN COALESCE({column("failed", "BOOLEAN")}, true) THEN {column("error", "VARCHAR")} END,
+                    $project_id,
+                    $result_type
+                FROM processing_results_batch
+            """, {"active_version": self.get_active_kbob_version(), "project_id": project_id, "result_type": result_type})
             conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.unregister("processing_results_batch")
+
+    @timed_db_call
+    def get_stored_result_counts(self, project_id: str, result_type: str,
+                                 exclude_element_ids: Optional[List[str]] = None) -> Dict[str, int]:
+        """Numbers of elements and of failed components with stored results of result_type.
+
+        Elements in exclude_element_ids are not counted, e.g. the ones a run
+        over part of the elements is about to replace.
+        """
+        with self._element_filter(exclude_element_ids) as condition:
+            excluded = condition.format(column="element_id") if exclude_element_ids is not None else "false"
+            elements, failed = self.conn.execute(f"""
+                SELECT COUNT(DISTINCT element_id), COUNT(*) FILTER (WHERE failed)
+                FROM processing_results
+                WHERE project_id = ? AND result_type = ? AND NOT ({excluded})
+            """, [project_id, result_type]).fetchone()
+        return {"elements": elements, "failed_components": failed}
+
+    @timed_db_call
+    def get_stage_fingerprint(self, project_id: str, stage: str) -> Optional[str]:
+        """Get the input fingerprint of the last successful run of a pipeline stage."""
+        result = self.conn.execute("""
+            SELECT fingerprint FROM stage_fingerprints
+            WHERE project_id = ? AND stage = ?
+        """, [project_id, stage]).fetchone()
+        return result[0] if result else None
+
+    @traced("db.save_stage_fingerprint")
+    @timed_db_call
+    @writes("project")
+    def save_stage_fingerprint(self, project_id: str, stage: str, fingerprint: str) -> None:
+        """Record the input fingerprint of a successful run of a pipeline stage."""
+        try:
+            self.conn.execute("""
+                INSERT INTO stage_fingerprints (project_id, stage, fingerprint)
+                VALUES (?, ?, ?)
+                ON CONFLICT (project_id, stage) DO UPDATE SET
+                    fingerprint = EXCLUDED.fingerprint,
+                    created_at = now()
+            """, [project_id, stage, fingerprint])
         except Exception as e:
-            try:
-                conn.execute("ROLLBACK")
-            except Exception:
-                pass
+            logging.error(f"Failed to save stage fingerprint: {e}")
             raise
 
+    @traced("db.get_component_memo")
+    @timed_db_call
+    def get_component_memo(self, keys: pa.Array) -> pa.Table:
+        """Look up memoized component metrics in bulk and mark the hits as used.
+
+        Returns one row per key found, with its position in keys (row) and
+        the stored columns of lca_component_memo. The hits are marked without
+        waiting for the write.
+        """
+        try:
+            self.conn.register("component_memo_keys", pa.table({"key": keys, "row": pa.array(range(len(keys)), type=pa.int64())}))
+            hits = arrow_table(self.conn.execute("""
+                SELECT b.row, m.volume, m.density, m.gwp_absolute, m.gwp_relative,
+                       m.penr_absolute, m.penr_relative, m.ubp_absolute, m.ubp_relative
+                FROM component_memo_keys b
+                JOIN lca_component_memo m ON m.key = b.key
+            """))
+        finally:
+            self.conn.unregister("component_memo_keys")
+        if hits.num_rows:
+            self.submit_write("touch_component_memo", keys.take(hits.column("row")))
+        return hits
+
+    @traced("db.touch_component_memo")
+    @timed_db_call
+    @writes("catalog")
+    def touch_component_memo(self, keys: pa.Array) -> None:
+        """Mark memo entries as used now (best effort)."""
+        try:
+            self.conn.register("component_memo_used", pa.table({"key": keys}))
+            self.conn.execute("""
+                UPDATE lca_component_memo SET last_used_at = now()
+                WHERE key IN (SELECT key FROM component_memo_used)
+            """)
+        except duckdb.TransactionException as e:
+            # Another job touched the same entries; their timestamps are fresh anyway
+            logging.debug(f"Skipped refreshing memo timestamps: {e}")
+        finally:
+            self.conn.unregister("component_memo_used")
+
+    @traced("db.save_component_memo")
+    @timed_db_call
+    @writes("catalog")
+    def save_component_memo(self, entries: pa.Table) -> None:
+        """Store memo entries (key plus the lca_component_memo metric columns), keeping existing keys."""
+        if entries.num_rows == 0:
+            return
+        try:
+            self.conn.register("component_memo_batch", entries)
+            self.conn.execute("""
+                INSERT INTO lca_component_memo (
+                    key, volume, density, gwp_absolute, gwp_relative,
+                    penr_absolute, penr_relative, ubp_absolute, ubp_relative
+                )
+                SELECT key, volume, density, gwp_absolute, gwp_relative,
+                       penr_absolute, penr_relative, ubp_absolute, ubp_relative
+                FROM component_memo_batch
+                ON CONFLICT (key) DO NOTHING
+            """)
+        finally:
+            self.conn.unregister("component_memo_batch")
+
+    @traced("db.prune_component_memo")
+    @timed_db_call
+    @writes("catalog")
+    def prune_component_memo(self, max_entries: int, max_age_days: int) -> int:
+        """Evict memo entries unused for max_age_days, then the least recently used beyond max_entries.
+
+        Returns the number of entries left.
+        """
+        self.conn.execute(
+            "DELETE FROM lca_component_memo WHERE last_used_at < now() - to_days(CAST(? AS INTEGER))",
+            [max_age_days]
+        )
+        self.conn.execute("""
+            DELETE FROM lca_component_memo WHERE key IN (
+                SELECT key FROM lca_component_memo ORDER BY last_used_at DESC OFFSET ?
+            )
+        """, [max_entries])
+        return self.conn.execute("SELECT COUNT(*) FROM lca_component_memo").fetchone()[0]
+
+    @timed_db_call
+    def get_input_hashes(self, project_id: str) -> Dict[str, Optional[str]]:
+        """Hash the reference data and mappings the LCA and cost stages depend on.
+
+        Returns the hashes of the project's material mappings, the life
+        expectancy and cost reference tables, and the materials of the
+        active KBOB version (which a re-import under the same version may
+        change; None without an active version).
+        """
+        result = self.conn.execute(f"""
+            SELECT
+                (SELECT md5(COALESCE(string_agg(ifc_material || '=' || COALESCE(kbob_id, ''), ';'
+                                                ORDER BY ifc_material, kbob_id), ''))
+                 FROM material_mappings WHERE project_id = ?),
+                ({REFERENCE_HASHES['kbob_materials']}),
+                ({REFERENCE_HASHES['life_expectancy']}),
+                ({REFERENCE_HASHES['cost_reference']})
+        """, [project_id]).fetchone()
+        return dict(zip(("material_mappings", "kbob_materials", "life_expectancy", "cost_reference"), result))
+
+    @timed_db_call
+    def get_reference_hash(self, table: str) -> str:
+        """Hash of the content of a reference table ("kbob_materials", "life_expectancy" or "cost_reference")."""
+        return self.conn.execute(REFERENCE_HASHES[table]).fetchone()[0]
+
+    @timed_db_call
     def get_ifc_results(self, project_id: Optional[str] = None) -> Dict[str, Any]:
         """Get IFC results for a project, including elements and material mappings"""
         project_id = project_id or DEFAULT_PROJECT_ID
@@ -915,6 +1729,9 @@ class DatabaseManager:
                 'materialMappings': {}
             }
 
+    @traced("db.update_material_mappings")
+    @timed_db_call
+    @writes()
     def update_material_mappings(self, project_id: Optional[str] = None, material_mappings: Dict[str, str] = None) -> None:
         """Update material mappings for a project"""
         if material_mappings is None:
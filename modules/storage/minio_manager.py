@@ -1,23 +1,83 @@
 from minio import Minio
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Any, Union
 import os
 from dotenv import load_dotenv
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+from pyarrow import fs as pafs
 import io
+import json
 import logging
+import re
 from pydantic import BaseModel, Field
 from datetime import datetime
 
 # Load environment variables
 load_dotenv()
 
+# Columns used to order rows before writing, so that row-group statistics
+# are narrow and predicates on eBKP codes or GUIDs can skip whole row groups.
+PARQUET_SORT_COLUMNS = ["ebkp_h", "guid"]
+DEFAULT_ROW_GROUP_SIZE = 50_000
+
+# Partition key for hive-partitioned exports, derived from the eBKP-H code (e.g. "C2.1" -> "C")
+EBKP_GROUP_COLUMN = "ebkp_group"
+UNKNOWN_EBKP_GROUP = "unknown"
+
+# Timestamp suffix of uploaded objects, <filename>_<datetime.isoformat()>.parquet
+UPLOAD_TIMESTAMP_PATTERN = r"_\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?\.parquet"
+
+
+def is_upload_of(object_name: str, filename: str) -> bool:
+    """Whether an object is an upload of filename, not of another filename starting with it."""
+    name = object_name.rsplit("/", 1)[-1]
+    return re.fullmatch(re.escape(filename) + UPLOAD_TIMESTAMP_PATTERN, name) is not None
+
+
+class ParquetWriterProfile(BaseModel):
+    """Settings for serializing and uploading result DataFrames as Parquet."""
+    compression: str = "zstd"
+    compression_level: Optional[int] = 3
+    # Low-cardinality text columns that benefit from dictionary encoding
+    dictionary_columns: List[str] = Field(default_factory=lambda: [
+        "ebkp_h", "material", "mat_kbob", "kbob_material_name", "unit"
+    ])
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE
+    sort_columns: List[str] = Field(default_factory=lambda: list(PARQUET_SORT_COLUMNS))
+    # Write {data_type}/project_id=.../ebkp_group=.../ objects instead of one flat object
+    partition_by_ebkp_group: bool = False
+    # Buffers larger than this are uploaded as parallel multipart uploads
+    multipart_threshold: int = 64 * 1024 * 1024
+    part_size: int = 16 * 1024 * 1024  # MinIO requires at least 5 MiB per part
+    num_parallel_uploads: int = 4
+
+    @classmethod
+    def from_env(cls) -> "ParquetWriterProfile":
+        """Create a profile, enabling partitioned exports via MINIO_PARTITIONED_EXPORT."""
+        return cls(
+            partition_by_ebkp_group=os.getenv('MINIO_PARTITIONED_EXPORT', 'false').lower() == 'true'
+        )
+
+
+def ebkp_group(ebkp_code: Any) -> str:
+    """Get the top-level eBKP-H group (the leading letter) of a code."""
+    if not isinstance(ebkp_code, str):
+        return UNKNOWN_EBKP_GROUP
+    code = ebkp_code.strip().upper()
+    return code[0] if code and code[0].isalpha() else UNKNOWN_EBKP_GROUP
+
+
 class MinioManager:
-    def __init__(self, config: Optional[Dict] = None):
+    def __init__(self, config: Optional[Dict] = None, writer_profile: Optional[ParquetWriterProfile] = None):
         """Initialize MinIO client with configuration.
-        
+
         Args:
-            config (Dict, optional): Configuration dictionary. If not provided, 
+            config (Dict, optional): Configuration dictionary. If not provided,
                                    will use environment variables.
+            writer_profile (ParquetWriterProfile, optional): Parquet writer settings.
+                                   Defaults to ParquetWriterProfile.from_env().
         """
         if config is None:
             config = {
@@ -33,8 +93,11 @@ class MinioManager:
             secret_key=config['secret_key'],
             secure=False  # Set to True for production with SSL
         )
-        
+
+        self.config = config
         self.bucket = config['bucket']
+        self.writer_profile = writer_profile or ParquetWriterProfile.from_env()
+        self._filesystem = None
         self._ensure_bucket_exists()
 
     def _ensure_bucket_exists(self) -> None:
@@ -47,131 +110,308 @@ class MinioManager:
             logging.error(f"Error ensuring bucket exists: {e}")
             raise
 
+    def _get_filesystem(self) -> pafs.FileSystem:
+        """Get an S3-compatible pyarrow filesystem pointing at the MinIO server.
+
+        Reads through this filesystem issue ranged GET requests, so only the
+        Parquet footer and the row groups/columns that are needed get transferred.
+        """
+        if self._filesystem is None:
+            self._filesystem = pafs.S3FileSystem(
+                access_key=self.config['access_key'],
+                secret_key=self.config['secret_key'],
+                endpoint_override=self.config['endpoint'],
+                scheme='http'  # Matches secure=False on the MinIO client
+            )
+        return self._filesystem
+
     def _get_object_path(self, project_id: str, filename: str, data_type: str) -> str:
         """Generate the object path in MinIO."""
         timestamp = datetime.now().isoformat()
         return f"{data_type}/{project_id}/{filename}_{timestamp}.parquet"
 
+    def _get_latest_object_path(self, project_id: str, filename: str, data_type: str) -> str:
+        """Get the path of the most recent object for a project/filename combination."""
+        prefix = f"{data_type}/{project_id}/{filename}_"
+        objects = [obj for obj in self.client.list_objects(self.bucket, prefix=prefix)
+                   if is_upload_of(obj.object_name, filename)]
+        latest_object = sorted(objects, key=lambda obj: obj.last_modified)[-1]
+        return latest_object.object_name
+
+    def _get_partition_prefix(self, project_id: str, data_type: str) -> str:
+        """Get the hive-partitioned dataset prefix of a project."""
+        return f"{data_type}/project_id={project_id}/"
+
+    def _to_parquet_buffer(self, table: pa.Table) -> io.BytesIO:
+        """Serialize an Arrow table to Parquet using the writer profile."""
+        profile = self.writer_profile
+        sort_columns = [col for col in profile.sort_columns if col in table.column_names]
+        if sort_columns:
+            table = table.sort_by([(col, "ascending") for col in sort_columns])
+
+        parquet_buffer = io.BytesIO()
+        pq.write_table(
+            table,
+            parquet_buffer,
+            row_group_size=profile.row_group_size,
+            compression=profile.compression,
+            compression_level=profile.compression_level,
+            use_dictionary=[col for col in profile.dictionary_columns if col in table.column_names],
+            write_statistics=True
+        )
+        parquet_buffer.seek(0)
+        return parquet_buffer
+
+    def _put_buffer(self, object_path: str, parquet_buffer: io.BytesIO) -> None:
+        """Upload a buffer, switching to a parallel multipart upload for large buffers."""
+        profile = self.writer_profile
+        length = parquet_buffer.getbuffer().nbytes
+        if length > profile.multipart_threshold:
+            self.client.put_object(
+                self.bucket,
+                object_path,
+                parquet_buffer,
+                length=length,
+                content_type='application/octet-stream',
+                part_size=profile.part_size,
+                num_parallel_uploads=profile.num_parallel_uploads
+            )
+        else:
+            self.client.put_object(
+                self.bucket,
+                object_path,
+                parquet_buffer,
+                length=length,
+                content_type='application/octet-stream'
+            )
+
+    def _store_data(self, project_id: str, filename: str, data: Union[pd.DataFrame, pa.Table], data_type: str) -> str:
+        """Store a DataFrame or Arrow table as parquet file(s) in MinIO under the given data type.
+
+        Returns the object path, or the dataset prefix for partitioned exports.
+        """
+        table = data if isinstance(data, pa.Table) else pa.Table.from_pandas(data, preserve_index=False)
+
+        if self.writer_profile.partition_by_ebkp_group:
+            return self._store_partitioned_data(project_id, filename, table, data_type)
+
+        object_path = self._get_object_path(project_id, filename, data_type)
+
+        # Convert to parquet format in memory
+        parquet_buffer = self._to_parquet_buffer(table)
+
+        # Upload to MinIO
+        self._put_buffer(object_path, parquet_buffer)
+        return object_path
+
+    def _store_partitioned_data(self, project_id: str, filename: str, table: pa.Table, data_type: str) -> str:
+        """Store a table as one object per eBKP-H group in a hive-partitioned layout.
+
+        Objects are written to {data_type}/project_id={project_id}/ebkp_group={group}/{filename}_{timestamp}.parquet,
+        with the same timestamp for all groups of one upload.
+        """
+        prefix = self._get_partition_prefix(project_id, data_type)
+        timestamp = datetime.now().isoformat()
+
+        if "ebkp_h" in table.column_names:
+            groups = table.column("ebkp_h").to_pandas().map(ebkp_group)
+        else:
+            groups = pd.Series(UNKNOWN_EBKP_GROUP, index=range(table.num_rows))
+
+        for group in sorted(groups.unique()):
+            group_table = table.filter(pa.array((groups == group).to_numpy()))
+            object_path = f"{prefix}{EBKP_GROUP_COLUMN}={group}/{filename}_{timestamp}.parquet"
+            self._put_buffer(object_path, self._to_parquet_buffer(group_table))
+
+        return prefix
+
+    def store_results(self, project_id: str, filename: str, table: pa.Table, data_type: str) -> str:
+        """Store an Arrow table of processing results as parquet in MinIO.
+
+        Args:
+            project_id: Project identifier
+            filename: Name of the file
+            table: Arrow table with one row per result component
+            data_type: Top-level prefix, e.g. "lca" or "cost"
+
+        Returns:
+            str: Object path (or dataset prefix for partitioned exports) in MinIO
+        """
+        try:
+            object_path = self._store_data(project_id, filename, table, data_type)
+            logging.info(f"Stored {data_type} results: {object_path}")
+            return object_path
+
+        except Exception as e:
+            logging.error(f"Error storing {data_type} results: {e}")
+            raise
+
     def store_lca_data(self, project_id: str, filename: str, data: pd.DataFrame) -> str:
         """Store LCA data as parquet file in MinIO.
-        
+
         Args:
             project_id: Project identifier
             filename: Name of the file
             data: DataFrame containing LCA data
-            
+
         Returns:
             str: Object path in MinIO
         """
-        object_path = self._get_object_path(project_id, filename, "lca")
-        
         try:
-            # Convert DataFrame to parquet format in memory
-            parquet_buffer = io.BytesIO()
-            data.to_parquet(parquet_buffer)
-            parquet_buffer.seek(0)
-            
-            # Upload to MinIO
-            self.client.put_object(
-                self.bucket,
-                object_path,
-                parquet_buffer,
-                length=parquet_buffer.getbuffer().nbytes,
-                content_type='application/octet-stream'
-            )
-            
+            object_path = self._store_data(project_id, filename, data, "lca")
             logging.info(f"Stored LCA data: {object_path}")
             return object_path
-            
+
         except Exception as e:
             logging.error(f"Error storing LCA data: {e}")
             raise
 
     def store_cost_data(self, project_id: str, filename: str, data: pd.DataFrame) -> str:
         """Store cost data as parquet file in MinIO.
-        
+
         Args:
             project_id: Project identifier
             filename: Name of the file
             data: DataFrame containing cost data
-            
+
+        Returns:
+            str: Object path in MinIO
+        """
+        try:
+            object_path = self._store_data(project_id, filename, data, "cost")
+            logging.info(f"Stored cost data: {object_path}")
+            return object_path
+
+        except Exception as e:
+            logging.error(f"Error storing cost data: {e}")
+            raise
+
+    def store_profile(self, object_path: str, profile: Dict[str, Any]) -> str:
+        """Store a job profile (see utils.profiling.JobProfiler) as JSON in MinIO.
+
+        Args:
+            object_path: Object path, e.g. from utils.profiling.profile_object_path
+            profile: Profile summary including folded stacks
+
         Returns:
             str: Object path in MinIO
         """
-        object_path = self._get_object_path(project_id, filename, "cost")
-        
         try:
-            # Convert DataFrame to parquet format in memory
-            parquet_buffer = io.BytesIO()
-            data.to_parquet(parquet_buffer)
-            parquet_buffer.seek(0)
-            
-            # Upload to MinIO
+            buffer = io.BytesIO(json.dumps(profile).encode('utf-8'))
             self.client.put_object(
                 self.bucket,
                 object_path,
-                parquet_buffer,
-                length=parquet_buffer.getbuffer().nbytes,
-                content_type='application/octet-stream'
+                buffer,
+                length=buffer.getbuffer().nbytes,
+                content_type='application/json'
             )
-            
-            logging.info(f"Stored cost data: {object_path}")
+            logging.info(f"Stored job profile: {object_path}")
             return object_path
-            
+
         except Exception as e:
-            logging.error(f"Error storing cost data: {e}")
+            logging.error(f"Error storing job profile: {e}")
             raise
 
-    def get_lca_data(self, project_id: str, filename: str) -> pd.DataFrame:
+    def read_parquet(self, object_path: str, columns: Optional[List[str]] = None,
+                     filters: Optional[List[Any]] = None) -> pd.DataFrame:
+        """Read a Parquet object from MinIO using ranged reads.
+
+        Args:
+            object_path: Object path inside the bucket
+            columns: Optional list of columns to read
+            filters: Optional pyarrow/DNF filters, e.g. [("ebkp_h", "=", "C2.1")].
+                     Row groups whose statistics exclude the predicate are skipped.
+
+        Returns:
+            pd.DataFrame: Retrieved data
+        """
+        table = pq.read_table(
+            f"{self.bucket}/{object_path}",
+            columns=columns,
+            filters=filters,
+            filesystem=self._get_filesystem()
+        )
+        return table.to_pandas()
+
+    def _get_data(self, project_id: str, filename: str, data_type: str,
+                  columns: Optional[List[str]] = None,
+                  filters: Optional[List[Any]] = None) -> pd.DataFrame:
+        """Retrieve the latest object of a data type, projected and filtered if requested."""
+        if self.writer_profile.partition_by_ebkp_group:
+            return self._get_partitioned_data(project_id, filename, data_type, columns, filters)
+
+        object_path = self._get_latest_object_path(project_id, filename, data_type)
+
+        if columns is not None or filters is not None:
+            return self.read_parquet(object_path, columns=columns, filters=filters)
+
+        # Full reads download the whole object in a single request
+        data = self.client.get_object(self.bucket, object_path)
+        return pd.read_parquet(io.BytesIO(data.read()))
+
+    def _get_partitioned_data(self, project_id: str, filename: str, data_type: str,
+                              columns: Optional[List[str]] = None,
+                              filters: Optional[List[Any]] = None) -> pd.DataFrame:
+        """Retrieve the latest partitioned upload; filters on ebkp_group skip whole objects."""
+        prefix = self._get_partition_prefix(project_id, data_type)
+        objects = [
+            obj for obj in self.client.list_objects(self.bucket, prefix=prefix, recursive=True)
+            if is_upload_of(obj.object_name, filename)
+        ]
+        latest_name = max(objects, key=lambda obj: obj.last_modified).object_name.rsplit("/", 1)[-1]
+        paths = [
+            f"{self.bucket}/{obj.object_name}" for obj in objects
+            if obj.object_name.endswith(f"/{latest_name}")
+        ]
+
+        dataset = pads.dataset(
+            paths,
+            format="parquet",
+            filesystem=self._get_filesystem(),
+            partitioning="hive",
+            partition_base_dir=f"{self.bucket}/{prefix}"
+        )
+        expression = pq.filters_to_expression(filters) if filters else None
+        return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+    def get_lca_data(self, project_id: str, filename: str,
+                     columns: Optional[List[str]] = None,
+                     filters: Optional[List[Any]] = None) -> pd.DataFrame:
         """Retrieve LCA data from MinIO.
-        
+
         Args:
             project_id: Project identifier
             filename: Name of the file
-            
+            columns: Optional list of columns to read
+            filters: Optional row filters, e.g. [("ebkp_h", "=", "C2.1")]
+
         Returns:
             pd.DataFrame: Retrieved LCA data
         """
         try:
-            # Get the latest file for the project/filename combination
-            prefix = f"lca/{project_id}/{filename}"
-            objects = self.client.list_objects(self.bucket, prefix=prefix)
-            latest_object = sorted(objects, key=lambda obj: obj.last_modified)[-1]
-            
-            # Get the object data
-            data = self.client.get_object(self.bucket, latest_object.object_name)
-            
-            # Read parquet data into DataFrame
-            df = pd.read_parquet(io.BytesIO(data.read()))
-            return df
-            
+            return self._get_data(project_id, filename, "lca", columns, filters)
+
         except Exception as e:
             logging.error(f"Error retrieving LCA data: {e}")
             raise
 
-    def get_cost_data(self, project_id: str, filename: str) -> pd.DataFrame:
+    def get_cost_data(self, project_id: str, filename: str,
+                      columns: Optional[List[str]] = None,
+                      filters: Optional[List[Any]] = None) -> pd.DataFrame:
         """Retrieve cost data from MinIO.
-        
+
         Args:
             project_id: Project identifier
             filename: Name of the file
-            
+            columns: Optional list of columns to read
+            filters: Optional row filters, e.g. [("ebkp_h", "=", "C2.1")]
+
         Returns:
             pd.DataFrame: Retrieved cost data
         """
         try:
-            # Get the latest file for the project/filename combination
-            prefix = f"cost/{project_id}/{filename}"
-            objects = self.client.list_objects(self.bucket, prefix=prefix)
-            latest_object = sorted(objects, key=lambda obj: obj.last_modified)[-1]
-            
-            # Get the object data
-            data = self.client.get_object(self.bucket, latest_object.object_name)
-            
-            # Read parquet data into DataFrame
-            df = pd.read_parquet(io.BytesIO(data.read()))
-            return df
-            
+            return self._get_data(project_id, filename, "cost", columns, filters)
+
         except Exception as e:
             logging.error(f"Error retrieving cost data: {e}")
-            raise 
\ No newline at end of file
+            raise
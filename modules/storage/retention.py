@@ -0,0 +1,73 @@
+import time
+import logging
+from typing import Any, Callable, Dict, Optional
+
+
+def run_retention(db, keep_runs: int) -> Dict[str, Any]:
+    """Compact the processing logs of all projects to their last keep_runs runs, then checkpoint.
+
+    Every project database (its shard in sharded mode) is checkpointed after
+    its compaction, and the main database last. Returns the compaction
+    stats per project, the checkpoint reports and the reclaimed bytes in total.
+    """
+    start = time.perf_counter()
+    projects, checkpoints = {}, []
+    for project_id in db.get_project_ids():
+        with db.project_session(project_id) as session:
+            projects[project_id] = session.compact_processing_logs(project_id, keep_runs)
+            if session is not db:
+                checkpoints.append(session.checkpoint())
+    checkpoints.append(db.checkpoint())
+    report = {
+        "projects": projects,
+        "checkpoints": checkpoints,
+        "errors_rolled_up": sum(stats["errors_rolled_up"] for stats in projects.values()),
+        "history_deleted": sum(stats["history_deleted"] for stats in projects.values()),
+        "reclaimed_bytes": sum(checkpoint["reclaimed_bytes"] for checkpoint in checkpoints),
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+    logging.info(
+        f"Retention: rolled up {report['errors_rolled_up']} errors, deleted {report['history_deleted']} "
+        f"history rows of {len(projects)} projects, reclaimed {report['reclaimed_bytes']} bytes"
+    )
+    return report
+
+
+class IdleMaintenance:
+    """Runs retention (run_retention) once the service has been idle for a while.
+
+    The service reports activity (a job or request starting and ending) and
+    calls run_if_idle when it has nothing to do; retention then runs if there
+    was no activity for idle_seconds and the last run is at least
+    interval_seconds ago. keep_runs <= 0 disables it.
+    """
+
+    def __init__(self, db, keep_runs: int, idle_seconds: float = 300.0, interval_seconds: float = 3600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.db = db
+        self.keep_runs = keep_runs
+        self.idle_seconds = idle_seconds
+        self.interval_seconds = interval_seconds
+        self.clock = clock
+        self.last_activity = clock()
+        self.last_run: Optional[float] = None
+        # Report of the latest run
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    def activity(self) -> None:
+        self.last_activity = self.clock()
+
+    def run_if_idle(self) -> Optional[Dict[str, Any]]:
+        """Run retention if due; returns its report, or None if it did not run."""
+        now = self.clock()
+        if self.keep_runs <= 0 or now - self.last_activity < self.idle_seconds:
+            return None
+        if self.last_run is not None and now - self.last_run < self.interval_seconds:
+            return None
+        self.last_run = now
+        try:
+            self.last_report = run_retention(self.db, self.keep_runs)
+        except Exception:
+            logging.exception("Retention run failed")
+            return None
+        return self.last_report
@@ -0,0 +1,96 @@
+import os
+import re
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+import duckdb
+
+# Pools by catalog file: DuckDB shares one database instance per file within a process, and so do
+# its attached shards
+_pools: Dict[str, "ShardPool"] = {}
+_pools_lock = threading.Lock()
+
+
+def shard_alias(project_id: str) -> str:
+    """Name under which the database file of a project is attached."""
+    return "shard_" + hashlib.sha1(project_id.encode("utf-8")).hexdigest()[:16]
+
+
+def shard_path(shard_dir: str, project_id: str) -> str:
+    """Database file of a project: its readable ID plus a hash, as IDs may collide once sanitized."""
+    readable = re.sub(r"[^A-Za-z0-9_-]", "_", project_id)[:64]
+    return os.path.join(shard_dir, f"{readable}-{shard_alias(project_id)[6:14]}.duckdb")
+
+
+class ShardPool:
+    """Project database files attached to a catalog database, with an LRU of open handles.
+
+    Shards are attached on first use and get the project tables (schema).
+    Once more than max_open are attached, the least recently used shards
+    without open sessions are detached; a shard in use is never detached, so
+    the pool may exceed max_open while more projects are active at once.
+    """
+
+    def __init__(self, catalog_path: str, shard_dir: str, max_open: int, schema: str):
+        # ATTACH and DETACH apply to the whole database instance; a connection of its own keeps
+        # them off connections used by other threads
+        self._admin = duckdb.connect(catalog_path)
+        self._catalog = self._admin.execute("SELECT current_database()").fetchone()[0]
+        self.shard_dir = shard_dir
+        self.schema = schema
+        self.max_open = max_open
+        self._lock = threading.Lock()
+        # alias -> number of open sessions, least recently used first
+        self._open: "OrderedDict[str, int]" = OrderedDict()
+        os.makedirs(shard_dir, exist_ok=True)
+
+    def acquire(self, project_id: str) -> str:
+        """Attach the shard of a project if needed and register a session on it; returns its alias."""
+        alias = shard_alias(project_id)
+        with self._lock:
+            if alias not in self._open:
+                self._admin.execute(f"ATTACH IF NOT EXISTS '{shard_path(self.shard_dir, project_id)}' AS {alias}")
+                # Create or migrate the project tables once per attach
+                self._admin.execute(f"USE {alias}")
+                try:
+                    self._admin.execute(self.schema)
+                finally:
+                    self._admin.execute(f"USE {self._catalog}")
+                self._open[alias] = 0
+            self._open[alias] += 1
+            self._open.move_to_end(alias)
+            self._evict()
+        return alias
+
+    def release(self, alias: str) -> None:
+        """End a session on a shard; it stays attached until evicted."""
+        with self._lock:
+            if self._open.get(alias):
+                self._open[alias] -= 1
+            self._evict()
+
+    def _evict(self) -> None:
+        idle = [alias for alias, sessions in self._open.items() if sessions == 0]
+        while len(self._open) > self.max_open and idle:
+            alias = idle.pop(0)
+            self._admin.execute(f"DETACH {alias}")
+            del self._open[alias]
+            logging.debug(f"Detached project shard {alias}")
+
+    @property
+    def attached(self) -> Dict[str, int]:
+        """Open sessions per attached shard, least recently used first."""
+        with self._lock:
+            return dict(self._open)
+
+
+def shard_pool(catalog_path: str, shard_dir: str, max_open: int, schema: str) -> ShardPool:
+    """The pool of the catalog database at catalog_path, shared by all managers opening it."""
+    key = os.path.realpath(catalog_path)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ShardPool(catalog_path, shard_dir, max_open, schema)
+        return _pools[key]
@@ -0,0 +1,171 @@
+import os
+import queue
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import nullcontext
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+# Name of the writer threads
+WRITER_THREAD_PREFIX = "db-writer"
+
+# Queued coalescible writes committed together in one transaction at most
+MAX_BATCH = 64
+
+# Writers by database file: one writer per DuckDB database instance serializes all its writes
+_writers: Dict[str, "DatabaseWriter"] = {}
+_writers_lock = threading.Lock()
+
+# Set by DatabaseManager.submit_write to get the future of a write instead of waiting for it
+_submitting = contextvars.ContextVar("db_write_submitting", default=False)
+
+_STOP = object()
+
+
+def writes(coalesce: Optional[str] = None):
+    """Decorator marking a DatabaseManager method as mutating.
+
+    When the manager has a write queue, calls from other threads run on the
+    writer thread and the caller waits for the result. coalesce names the
+    database the method writes to ("catalog" or "project") if it opens no
+    transaction other than through DatabaseManager.transaction(); queued
+    calls writing the same database may then be committed together in one
+    transaction.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            writer = getattr(self, "_writer", None)
+            if writer is None or writer.is_writer_thread():
+                return func(self, *args, **kwargs)
+            target = self._shard_project if coalesce != "catalog" else None
+            future = writer.submit(func, target, coalesce, args, kwargs)
+            return future if _submitting.get() else future.result()
+        wrapper.is_write = True
+        return wrapper
+    return decorator
+
+
+class _Write:
+    def __init__(self, func: Callable, target: Optional[str], coalesce: Optional[str], args, kwargs):
+        self.func = func
+        self.target = target
+        self.coalesce = coalesce
+        self.args = args
+        self.kwargs = kwargs
+        # Run in the caller's context, for its trace and profile IDs
+        self.context = contextvars.copy_context()
+        self.future = Future()
+
+    def run(self, db) -> Any:
+        return self.context.run(self.func, db, *self.args, **self.kwargs)
+
+
+class DatabaseWriter:
+    """Runs the writes to a database one at a time on a thread and connection of its own.
+
+    Writes are queued from any thread and executed in order; callers get a
+    future. Coalescible writes already waiting in the queue are committed
+    together in one transaction (up to max_batch); should the transaction
+    fail, they are retried one by one so a failing write does not take the
+    others down. Reads stay on the callers' connections and only ever see
+    committed data, so they never wait for a write.
+    """
+
+    def __init__(self, db, max_batch: int = MAX_BATCH):
+        self.db = db
+        self.max_batch = max_batch
+        self._queue: "queue.Queue" = queue.Queue()
+        # Number of transactions and of writes they held, for monitoring
+        self.transactions = 0
+        self.writes = 0
+        self._thread = threading.Thread(target=self._run, name=WRITER_THREAD_PREFIX, daemon=True)
+        self._thread.start()
+
+    def is_writer_thread(self) -> bool:
+        return threading.get_ident() == self._thread.ident
+
+    @property
+    def pending(self) -> int:
+        """Number of writes waiting in the queue."""
+        return self._queue.qsize()
+
+    def submit(self, func: Callable, target: Optional[str], coalesce: Optional[str], args, kwargs) -> Future:
+        """Queue func(manager, *args, **kwargs) for the project target (None for the catalog or unsharded database)."""
+        write = _Write(func, target, coalesce, args, kwargs)
+        self._queue.put(write)
+        return write.future
+
+    def stop(self) -> None:
+        """Run the writes queued so far and end the writer thread."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self) -> None:
+        pending = None
+        while True:
+            write = pending if pending is not None else self._queue.get()
+            pending = None
+            if write is _STOP:
+                return
+            batch = [write]
+            while write.coalesce and len(batch) < self.max_batch:
+                try:
+                    following = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if following is not _STOP and following.coalesce == write.coalesce and following.target == write.target:
+                    batch.append(following)
+                else:
+                    pending = following
+                    break
+            batch = [write for write in batch if write.future.set_running_or_notify_cancel()]
+            if batch:
+                try:
+                    self._execute(batch)
+                except Exception:
+                    logging.exception("Database writer failed to run a batch")
+                    for write in batch:
+                        if not write.future.done():
+                            write.future.set_exception(RuntimeError("Database writer failed"))
+
+    def _execute(self, batch: List[_Write]) -> None:
+        target = batch[0].target
+        with self.db.project_session(target) if target is not None else nullcontext(self.db) as db:
+            if len(batch) > 1 and self._run_together(db, batch):
+                return
+            for write in batch:
+                self.transactions += 1
+                self.writes += 1
+                try:
+                    write.future.set_result(write.run(db))
+                except Exception as e:
+                    write.future.set_exception(e)
+
+    def _run_together(self, db, batch: List[_Write]) -> bool:
+        """Run a batch in one transaction; returns False, rolled back, if any write failed."""
+        try:
+            with db.transaction():
+                results = [write.run(db) for write in batch]
+        except Exception as e:
+            logging.debug(f"Batch of {len(batch)} writes failed, retrying one by one: {e}")
+            return False
+        self.transactions += 1
+        self.writes += len(batch)
+        for write, result in zip(batch, results):
+            write.future.set_result(result)
+        return True
+
+
+def database_writer(db_path: str, open_manager: Callable[[], Any]) -> DatabaseWriter:
+    """The writer of the database at db_path, shared by all managers opening it.
+
+    open_manager is called once to open the writer's own manager.
+    """
+    key = os.path.realpath(db_path)
+    with _writers_lock:
+        if key not in _writers:
+            _writers[key] = DatabaseWriter(open_manager())
+        return _writers[key]
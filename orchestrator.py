@@ -1,16 +1,28 @@
 import json
 import logging
 import os
+import threading
 import time
-from confluent_kafka import Consumer, Producer
-from typing import Optional, Dict, Any
-from flask import Flask, jsonify, request
+from contextlib import closing
+from confluent_kafka import Consumer, Producer, TopicPartition
+from typing import Optional, Dict, Any, List
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 
 from modules.ifc_processing_service import IFCExtractBuildingElementsService
 from modules.cost_processor import CostProcessor
 from modules.lca_processor import LCAProcessor
+from modules.lca_scenarios import ScenarioCache, compare_kbob_versions
+from modules.lca_uncertainty import project_uncertainty
 from modules.storage.db_manager import DatabaseManager, DEFAULT_PROJECT_ID
+from modules.storage.minio_manager import MinioManager
+from modules.storage.retention import IdleMaintenance
+from utils.metrics import KAFKA_CONSUMER_LAG, metrics_payload, stage_timer
+from utils.pipeline import SUCCEEDED, FingerprintStore, PipelineError, Stage, fingerprint, run_stages
+from utils.profiling import JobProfiler, profile_object_path, profile_requested
+from utils.shared_utils import save_data_to_json
+from utils.tracing import extract_context, init_tracing, inject_headers, tracer
+from opentelemetry.trace import SpanKind
 
 # Configure logging
 logging.basicConfig(
@@ -33,29 +45,71 @@ CORS(app, resources={
 })
 
 class Orchestrator:
-    def __init__(self):
+    def __init__(self, consumer: Optional[Any] = None, producer: Optional[Any] = None,
+                 db: Optional[DatabaseManager] = None, minio_client: Optional[Any] = None,
+                 ifc_api_endpoint: Optional[str] = None):
+        """Set up Kafka, the database and the service configuration from the environment.
+
+        Stand-ins for the Kafka consumer/producer, the database, the MinIO client and the
+        extraction API endpoint can be passed in, e.g. by the load test harness
+        (scripts/load_test.py).
+        """
+        # Tracing exporter is selected via TRACES_EXPORTER (console/file/none)
+        init_tracing()
+
         # Kafka configuration
         self.kafka_broker = os.getenv('KAFKA_BROKER', 'broker:29092')
         self.input_topic = os.getenv('KAFKA_INPUT_TOPIC', 'ifc-files')
         self.output_topic = os.getenv('KAFKA_OUTPUT_TOPIC', 'ifc_processed')
         self.group_id = os.getenv('KAFKA_GROUP_ID', 'ifc_processor_group')
+        # High watermarks per (topic, partition) with the time they were fetched, for the consumer lag gauge
+        self.watermark_refresh_seconds = float(os.getenv('KAFKA_WATERMARK_REFRESH_SECONDS', '30'))
+        self._watermarks = {}
         
         # Service configuration
-        self.ifc_api_endpoint = os.getenv('IFC_API_ENDPOINT', 
+        self.ifc_api_endpoint = ifc_api_endpoint or os.getenv('IFC_API_ENDPOINT', 
             'https://openbim-service-production.up.railway.app/api/ifc/extract-building-elements')
         self.db_path = os.getenv('DB_PATH', '/app/data/nhmzh_data.duckdb')
         
+        # On-demand job profiling: x-profile header, API flag or a share of all jobs
+        self.profile_sample_rate = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+        self.profile_interval = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.01'))
+        self.profile_output_dir = os.getenv('PROFILE_OUTPUT_DIR', '/app/data/output')
+        self._minio_manager = None
+        # Stage results of the latest process_ifc run
+        self.stage_results = {}
+        
         # Initialize database
-        self.db = DatabaseManager(self.db_path)
+        self.db = db or DatabaseManager(
+            self.db_path,
+            shard_dir=os.getenv('DB_SHARD_DIR') or None,
+            max_open_shards=int(os.getenv('DB_MAX_OPEN_SHARDS', '16')),
+            # Writes from the Kafka thread and the Flask handlers go through one writer thread
+            write_queue=os.getenv('DB_WRITE_QUEUE', 'true').lower() == 'true'
+        )
+        
+        # Retention of processing logs and checkpoints while no jobs come in (RETENTION_KEEP_RUNS=0 disables it)
+        self.maintenance = IdleMaintenance(
+            self.db,
+            keep_runs=int(os.getenv('RETENTION_KEEP_RUNS', '20')),
+            idle_seconds=float(os.getenv('MAINTENANCE_IDLE_SECONDS', '300')),
+            interval_seconds=float(os.getenv('MAINTENANCE_INTERVAL_SECONDS', '3600'))
+        )
+        
+        # Quantities of recently queried projects for what-if material substitutions
+        self.scenarios = ScenarioCache(max_projects=int(os.getenv('SCENARIO_CACHE_PROJECTS', '8')))
+        
+        # MinIO client for fetching IFC files (created by the extraction service if not given)
+        self.minio_client = minio_client
         
         # Initialize Kafka consumer and producer
-        self.consumer = Consumer({
+        self.consumer = consumer or Consumer({
             'bootstrap.servers': self.kafka_broker,
             'group.id': self.group_id,
             'auto.offset.reset': 'earliest'
         })
         
-        self.producer = Producer({
+        self.producer = producer or Producer({
             'bootstrap.servers': self.kafka_broker
         })
         
@@ -64,44 +118,99 @@ class Orchestrator:
         logging.info(f"Subscribed to topic: {self.input_topic}")
 
     def process_ifc(self, ifc_url: str, project_name: Optional[str] = None) -> str:
-        """Process an IFC file and run LCA and Cost calculations."""
+        """Process an IFC file and run LCA and Cost calculations.
+
+        The steps run as a DAG (utils.pipeline): extraction first, then LCA and
+        cost concurrently, each on its own connection to the project data
+        (DatabaseManager.project). A failing LCA or cost stage does not stop
+        the other; PipelineError is raised once all stages have finished.
+        """
         try:
-            # Step 1: Extract IFC data
-            ifc_service = IFCExtractBuildingElementsService(
-                ifc_url=ifc_url,
-                api_endpoint=self.ifc_api_endpoint,
-                db=self.db,
-                project_name=project_name,
-                project_id=DEFAULT_PROJECT_ID
-            )
-            ifc_service.run()
-            
-            # Step 2: Run LCA Processing
-            lca_processor = LCAProcessor(
-                input_file_path=None,  # Data loaded from DB
-                material_mappings_file=None,  # Mappings in DB
-                db=self.db,
-                project_id=DEFAULT_PROJECT_ID
-            )
-            lca_processor.run()
-            
-            # Step 3: Run Cost Processing
-            cost_processor = CostProcessor(
-                input_file_path=None,  # Data loaded from DB
-                data_file_path=None,  # Cost data in DB
-                output_file=None,  # Results stored in DB
-                db=self.db,
-                project_id=DEFAULT_PROJECT_ID
-            )
-            cost_processor.run()
-            
-            # Prepare results JSON combining IFC extraction, LCA and Cost results
-            results_json = {
-                'ifcData': getattr(ifc_service, 'result', {}),
-                'lcaResults': getattr(lca_processor, 'results', {}),
-                'costResults': getattr(cost_processor, 'results', {}),
-                'materialMappings': getattr(lca_processor, 'material_mappings', {})
-            }
+            with stage_timer("process_ifc"), self.db.project_session(DEFAULT_PROJECT_ID) as db:
+                ifc_service = IFCExtractBuildingElementsService(
+                    ifc_url=ifc_url,
+                    api_endpoint=self.ifc_api_endpoint,
+                    db=db,
+                    project_name=project_name,
+                    project_id=DEFAULT_PROJECT_ID,
+                    minio_client=self.minio_client
+                )
+                fetched = {}
+                # Elements to recompute per stage (None: all), decided when the stage is due
+                changed = {}
+                previous_extraction = db.get_stage_fingerprint(DEFAULT_PROJECT_ID, "extract")
+
+                def extract_fingerprint():
+                    # The IFC file is fetched once, for the fingerprint, and reused by the extraction
+                    with stage_timer("minio_fetch"):
+                        fetched["ifc_data"] = ifc_service.fetch_ifc()
+                    return ifc_service.content_fingerprint(fetched["ifc_data"])
+
+                def extract():
+                    ifc_service.run(ifc_data=fetched.get("ifc_data"))
+                    return ifc_service
+
+                def stage_fingerprint(stage):
+                    def compute():
+                        changed[stage] = self.changed_elements(
+                            DEFAULT_PROJECT_ID, stage, previous_extraction, ifc_service.diff
+                        )
+                        return self.input_fingerprint(DEFAULT_PROJECT_ID, stage)
+                    return compute
+
+                def lca():
+                    if changed.get("lca") == []:
+                        logging.info("No elements changed since the last LCA run")
+                        return None
+                    with closing(db.fork()) as lca_db:
+                        lca_processor = LCAProcessor(
+                            input_file_path=None,  # Data loaded from DB
+                            material_mappings_file=None,  # Mappings in DB
+                            db=lca_db,
+                            project_id=DEFAULT_PROJECT_ID,
+                            element_ids=changed.get("lca")
+                        )
+                        lca_processor.run()
+                    return lca_processor
+
+                def cost():
+                    if changed.get("cost") == []:
+                        logging.info("No elements changed since the last cost run")
+                        return None
+                    with closing(db.fork()) as cost_db:
+                        cost_processor = CostProcessor(
+                            input_file_path=None,  # Data loaded from DB
+                            data_file_path=None,  # Cost data in DB
+                            output_file=None,  # Results stored in DB
+                            db=cost_db,
+                            project_id=DEFAULT_PROJECT_ID,
+                            element_ids=changed.get("cost")
+                        )
+                        cost_processor.run()
+                    return cost_processor
+
+                results = run_stages([
+                    Stage("extract", extract, fingerprint=extract_fingerprint),
+                    Stage("lca", lca, depends_on=["extract"], fingerprint=stage_fingerprint("lca")),
+                    Stage("cost", cost, depends_on=["extract"], fingerprint=stage_fingerprint("cost")),
+                ], fingerprints=FingerprintStore(db, DEFAULT_PROJECT_ID))
+                self.stage_results = results
+                logging.info("Pipeline stages: " + ", ".join(
+                    f"{name}={result.status} ({result.wall_seconds:.2f}s)" for name, result in results.items()
+                ))
+
+                # LCA and cost finish in any order, so the project status is settled once both are done
+                failed = any(not result.ok for result in results.values())
+                cost_status = None
+                if results["cost"].value is not None:
+                    cost_status = results["cost"].value.project_status
+                elif results["cost"].ok:
+                    # Cached or nothing to recompute: the stored cost results decide, as they would in a run
+                    stored = db.get_stored_result_counts(DEFAULT_PROJECT_ID, CostProcessor.result_type)
+                    cost_status = "failed" if stored["failed_components"] else "completed"
+                db.update_project_status(DEFAULT_PROJECT_ID, "failed" if failed else cost_status or "completed")
+                if failed:
+                    raise PipelineError(results)
             
             return DEFAULT_PROJECT_ID
             
@@ -109,8 +218,118 @@ class Orchestrator:
             logging.exception("Error processing IFC file")
             raise
 
+    def input_fingerprint(self, project_id: str, stage: str, extraction: Optional[str] = None) -> Optional[str]:
+        """Fingerprint of the inputs of the lca or cost stage.
+
+        Combines the fingerprint of the last extraction (IFC content hash), or
+        of the given one, with the reference data the stage reads: mappings,
+        KBOB materials of the active version and life expectancies for LCA,
+        the cost reference for cost. None (never cached) while no extraction
+        has been recorded.
+        """
+        with self.db.project_session(project_id) as db:
+            extraction = extraction or db.get_stage_fingerprint(project_id, "extract")
+            if extraction is None:
+                return None
+            hashes = db.get_input_hashes(project_id)
+        if stage == "lca":
+            return fingerprint(extraction, hashes["material_mappings"], hashes["kbob_materials"], hashes["life_expectancy"])
+        return fingerprint(extraction, hashes["cost_reference"])
+
+    def changed_elements(self, project_id: str, stage: str, previous_extraction: Optional[str],
+                         diff: Optional[Dict[str, List[str]]]) -> Optional[List[str]]:
+        """Elements the lca or cost stage has to recompute after a new model revision was stored.
+
+        Only the added and changed elements of the diff, provided the last
+        successful run of the stage was on the previous revision with the
+        current reference data. None when the stage has to run on all
+        elements.
+        """
+        if diff is None or previous_extraction is None:
+            return None
+        previous_inputs = self.input_fingerprint(project_id, stage, extraction=previous_extraction)
+        with self.db.project_session(project_id) as db:
+            if db.get_stage_fingerprint(project_id, stage) != previous_inputs:
+                return None
+        return diff["added"] + diff["changed"]
+
+    def get_minio_manager(self) -> Optional[MinioManager]:
+        """Get the MinIO manager for job profiles, or None when MinIO is not configured."""
+        if self._minio_manager is None and os.getenv('MINIO_ENDPOINT'):
+            try:
+                self._minio_manager = MinioManager()
+            except Exception as e:
+                logging.error(f"MinIO unavailable for job profiles: {e}")
+        return self._minio_manager
+
+    def run_job(self, project_id: str, job, *args, profile: bool = False, **kwargs):
+        """Run a job, under the sampling profiler if requested.
+
+        Unprofiled jobs are called directly. Profiles are stored in MinIO under
+        profiles/{project_id}/ (or below PROFILE_OUTPUT_DIR without MinIO) and
+        the path is recorded in processing_history.profile_path.
+        """
+        if not profile:
+            return job(*args, **kwargs)
+
+        object_path = profile_object_path(project_id)
+        minio_manager = self.get_minio_manager()
+        profile_path = object_path if minio_manager else os.path.join(self.profile_output_dir, object_path)
+        profiler = JobProfiler(profile_path, interval=self.profile_interval)
+        logging.info(f"Profiling job for project {project_id}: {profile_path}")
+        try:
+            with profiler:
+                return job(*args, **kwargs)
+        finally:
+            self.store_profile(profiler, minio_manager, object_path)
+
+    def store_profile(self, profiler: JobProfiler, minio_manager: Optional[MinioManager], object_path: str) -> None:
+        """Upload a job profile to MinIO, falling back to a local file."""
+        profile = profiler.to_dict()
+        if minio_manager:
+            try:
+                minio_manager.store_profile(object_path, profile)
+                return
+            except Exception:
+                logging.exception("Failed to upload job profile, writing it locally")
+        local_path = os.path.join(self.profile_output_dir, object_path)
+        save_data_to_json(profile, local_path)
+        logging.info(f"Job profile written to {local_path}")
+
+    def update_consumer_lag(self, message: Any) -> None:
+        """Update the consumer lag gauge for the partition of a message.
+
+        The lag is the cached high watermark minus the consumer position, both
+        known locally; the watermark is fetched from the broker at most every
+        watermark_refresh_seconds per partition, so messages are not held up
+        by a broker round trip each.
+        """
+        try:
+            key = (message.topic(), message.partition())
+            partition = TopicPartition(*key)
+            high, fetched_at = self._watermarks.get(key, (None, None))
+            now = time.monotonic()
+            if fetched_at is None or now - fetched_at >= self.watermark_refresh_seconds:
+                _, high = self.consumer.get_watermark_offsets(partition, timeout=1.0)
+                self._watermarks[key] = (high, now)
+            position = self.consumer.position([partition])[0].offset
+            if position < 0:
+                # No position yet (OFFSET_INVALID): the message is the last one consumed
+                position = message.offset() + 1
+            # A watermark older than the position only means the cache is stale
+            lag = max(high - position, 0)
+            KAFKA_CONSUMER_LAG.labels(topic=key[0], partition=str(key[1])).set(lag)
+        except Exception as e:
+            logging.debug(f"Could not update consumer lag: {e}")
+
     def handle_message(self, message: Any) -> None:
-        """Handle incoming Kafka message."""
+        """Handle incoming Kafka message, continuing the trace carried in its headers."""
+        context = extract_context(message.headers())
+        with tracer.start_as_current_span("handle_message", context=context, kind=SpanKind.CONSUMER):
+            self._handle_message(message)
+
+    def _handle_message(self, message: Any) -> None:
+        """Process the IFC file referenced by a Kafka message and publish the outcome."""
         try:
             raw_value = message.value()
             if not raw_value:
@@ -123,8 +342,9 @@ class Orchestrator:
                 logging.error("Message value is empty after decoding and stripping.")
                 return
 
-            # Process the IFC file with the URL directly
-            project_id = self.process_ifc(ifc_url)
+            # Process the IFC file with the URL directly, profiled on request (x-profile header) or by sampling
+            profile = profile_requested(message.headers(), self.profile_sample_rate)
+            project_id = self.run_job(DEFAULT_PROJECT_ID, self.process_ifc, ifc_url, profile=profile)
 
             # Send success response
             response = {
@@ -135,7 +355,8 @@ class Orchestrator:
 
             self.producer.produce(
                 self.output_topic,
-                value=json.dumps(response).encode('utf-8')
+                value=json.dumps(response).encode('utf-8'),
+                headers=inject_headers()
             )
             self.producer.flush()
 
@@ -152,13 +373,17 @@ class Orchestrator:
                 msg = self.consumer.poll(1.0)
                 
                 if msg is None:
+                    self.maintenance.run_if_idle()
                     continue
                     
                 if msg.error():
                     logging.error(f"Consumer error: {msg.error()}")
                     continue
                     
+                self.update_consumer_lag(msg)
+                self.maintenance.activity()
                 self.handle_message(msg)
+                self.maintenance.activity()
                 
         except KeyboardInterrupt:
             logging.info("Shutting down...")
@@ -166,22 +391,41 @@ class Orchestrator:
             self.consumer.close()
             self.db.close()
 
-# Create orchestrator instance
-orchestrator = Orchestrator()
+# Orchestrator instance serving the API routes: created on startup, or on first use when the app is served from an import
+orchestrator: Optional[Orchestrator] = None
+_orchestrator_lock = threading.Lock()
+
+
+def get_orchestrator() -> Orchestrator:
+    """Get the orchestrator serving the API routes, creating it from the environment on first use."""
+    global orchestrator
+    if orchestrator is None:
+        with _orchestrator_lock:
+            if orchestrator is None:
+                orchestrator = Orchestrator()
+    return orchestrator
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose pipeline metrics in the Prometheus text format."""
+    payload, content_type = metrics_payload()
+    return Response(payload, mimetype=content_type)
 
 @app.route('/api/ifc-results/<project_id>', methods=['GET'])
 def get_ifc_results(project_id):
     """Get IFC results including materials and mappings for a project."""
+    orchestrator = get_orchestrator()
     try:
         logging.info(f"Received request for IFC results for project: {project_id}")
         logging.info(f"Database path: {orchestrator.db.db_path}")
         logging.info(f"Database connection status: {orchestrator.db.conn is not None}")
         
-        # Check if project exists
-        project_info = orchestrator.db.get_project_info(project_id)
-        logging.info(f"Project info: {json.dumps(project_info, indent=2) if project_info else 'Not found'}")
-        
-        results = orchestrator.db.get_ifc_results(project_id)
+        with orchestrator.db.project_session(project_id) as db:
+            # Check if project exists
+            project_info = db.get_project_info(project_id)
+            logging.info(f"Project info: {json.dumps(project_info, indent=2) if project_info else 'Not found'}")
+            
+            results = db.get_ifc_results(project_id)
         logging.info(f"Retrieved results from database: {json.dumps(results, indent=2)}")
         
         if not results.get('ifcData', {}).get('materials'):
@@ -198,9 +442,84 @@ def get_ifc_results(project_id):
         logging.info(f"Returning default response: {json.dumps(default_response, indent=2)}")
         return jsonify(default_response)
 
+@app.route('/api/kbob-comparison/<project_id>', methods=['GET'])
+def get_kbob_comparison(project_id):
+    """Compare a project's LCA totals across KBOB versions (?versions=2022,2024) without storing anything."""
+    orchestrator = get_orchestrator()
+    versions = [version.strip() for version in request.args.get('versions', '').split(',') if version.strip()]
+    if not versions:
+        return jsonify({'error': 'At least one KBOB version is required'}), 400
+    try:
+        with orchestrator.db.project_session(project_id) as db:
+            return jsonify(compare_kbob_versions(db, project_id, versions))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        error_msg = f"Error comparing KBOB versions: {str(e)}"
+        logging.error(error_msg, exc_info=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/api/material-substitution', methods=['POST'])
+def material_substitution():
+    """LCA deltas per eBKP group of substituting materials, e.g. {"projectId": ..., "substitutions": {"Beton C30/37": "<KBOB UUID>"}}.
+
+    Nothing is stored; the project's quantities are kept in memory between requests.
+    """
+    orchestrator = get_orchestrator()
+    data = request.json or {}
+    project_id = data.get('projectId')
+    substitutions = data.get('substitutions')
+    if not project_id or not isinstance(substitutions, dict):
+        return jsonify({'error': 'Project ID and substitutions are required'}), 400
+    try:
+        start = time.perf_counter()
+        with orchestrator.db.project_session(project_id) as db:
+            scenario = orchestrator.scenarios.get(db, project_id)
+        result = scenario.apply(substitutions)
+        result['projectId'] = project_id
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        error_msg = f"Error computing material substitution: {str(e)}"
+        logging.error(error_msg, exc_info=True)
+        return jsonify({'error': error_msg}), 500
+
+@app.route('/api/lca-uncertainty', methods=['POST'])
+def lca_uncertainty():
+    """Monte Carlo percentiles of a project's LCA results per eBKP group and project, e.g. {"projectId": ..., "samples": 10000}.
+
+    Optional: seed, percentiles, uncertainty (coefficients of variation of volume,
+    density and indicators) and elements (true to include the percentiles per element).
+    Nothing is stored.
+    """
+    orchestrator = get_orchestrator()
+    data = request.json or {}
+    project_id = data.get('projectId')
+    if not project_id:
+        return jsonify({'error': 'Project ID is required'}), 400
+    options = {key: data[key] for key in ('samples', 'seed', 'percentiles', 'uncertainty') if data.get(key) is not None}
+    try:
+        start = time.perf_counter()
+        with orchestrator.db.project_session(project_id) as db:
+            result = project_uncertainty(db, project_id, **options)
+        elements = result.pop('elements')
+        if data.get('elements'):
+            result['elements'] = elements.to_pylist()
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return jsonify(result)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        error_msg = f"Error computing LCA uncertainty: {str(e)}"
+        logging.error(error_msg, exc_info=True)
+        return jsonify({'error': error_msg}), 500
+
 @app.route('/api/update-material-mappings', methods=['POST'])
 def update_material_mappings():
     """Update material mappings for a project."""
+    orchestrator = get_orchestrator()
     try:
         data = request.json
         logging.info(f"Received material mappings update request: {json.dumps(data, indent=2)}")
@@ -211,22 +530,35 @@ def update_material_mappings():
         if not project_id:
             return jsonify({'error': 'Project ID is required'}), 400
             
+        orchestrator.maintenance.activity()
         orchestrator.db.update_material_mappings(
             project_id=project_id,
             material_mappings=material_mappings
         )
         
-        # Trigger LCA recalculation with new mappings
-        lca_processor = LCAProcessor(
-            input_file_path=None,  # Data loaded from DB
-            material_mappings_file=None,  # Mappings in DB
-            db=orchestrator.db,
-            project_id=project_id
-        )
-        lca_processor.run()
+        # Trigger LCA recalculation with new mappings, profiled if the request sets "profile": true.
+        # Saving unchanged mappings does not rerun LCA (stage fingerprint).
+        # On a connection of its own: without sharding the session is the shared manager
+        with orchestrator.db.project_session(project_id) as session, closing(session.fork()) as project_db:
+            lca_processor = LCAProcessor(
+                input_file_path=None,  # Data loaded from DB
+                material_mappings_file=None,  # Mappings in DB
+                db=project_db,
+                project_id=project_id
+            )
+            results = orchestrator.run_job(
+                project_id,
+                run_stages,
+                [Stage("lca", lca_processor.run, fingerprint=lambda: orchestrator.input_fingerprint(project_id, "lca"))],
+                fingerprints=FingerprintStore(project_db, project_id),
+                profile=bool(data.get('profile'))
+            )
+        if not results["lca"].ok:
+            raise PipelineError(results)
         
         response = {
-            'message': 'Material mappings updated and LCA recalculated successfully',
+            'message': 'Material mappings updated and LCA recalculated successfully'
+                       if results["lca"].status == SUCCEEDED else 'Material mappings unchanged, LCA results are up to date',
             'projectId': project_id
         }
         logging.info("Material mappings updated successfully")
@@ -240,6 +572,8 @@ def update_material_mappings():
 if __name__ == '__main__':
     from threading import Thread
 
+    orchestrator = Orchestrator()
+
     # Start orchestrator consumer loop in a separate thread.
     consumer_thread = Thread(target=orchestrator.run, daemon=True)
     consumer_thread.start()
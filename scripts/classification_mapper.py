@@ -2,39 +2,22 @@ import ifcopenshell
 import ifcopenshell.guid
 import os
 import ifcopenshell.api
+import logging
 import re
 import sys
+from pathlib import Path
 
-# Function to normalize EBKP codes to a standard format
-def normalize_ebkp_code(code):
-    # Remove spaces first
-    code = code.replace(" ", "")
-    
-    # Extract the letter and numbers
-    match = re.match(r'([A-Z])(\d+)(?:\.(\d+))?(?:\.(\d+))?', code)
-    if match:
-        letter, main, sub1, sub2 = match.groups()
-        
-        # Remove leading zeros
-        if main:
-            main = str(int(main))
-        if sub1:
-            sub1 = str(int(sub1))
-        if sub2:
-            sub2 = str(int(sub2))
-            
-        # Reconstruct the code without leading zeros
-        if sub1 and sub2:
-            return f"{letter}{main}.{sub1}.{sub2}"
-        elif sub1:
-            return f"{letter}{main}.{sub1}"
-        else:
-            return f"{letter}{main}"
-    return code
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from modules.ebkp_index import EbkpIndex, normalize_ebkp_code
+from scripts.ifc_properties import property_values
+
+logger = logging.getLogger(__name__)
 
 def process_ifc_file(ifc_file_path):
     """Process an IFC file to add EBKP classifications"""
-    print(f"Processing file: {os.path.basename(ifc_file_path)}")
+    logger.info(f"Processing file: {os.path.basename(ifc_file_path)}")
     
     # Open the IFC file
     ifc_file = ifcopenshell.open(ifc_file_path)
@@ -65,143 +48,62 @@ def process_ifc_file(ifc_file_path):
                 normalized_code = normalize_ebkp_code(raw_code)
                 ebkp_descriptions[normalized_code] = description
     
-    print(f"Loaded {len(ebkp_descriptions)} EBKP codes with descriptions")
-    # Debug: Print some examples of loaded codes to verify format
-    if ebkp_descriptions:
-        print("Examples of loaded EBKP codes:")
-        sample = list(ebkp_descriptions.items())[:5]
-        for code, desc in sample:
-            print(f"  {code} -> {desc}")
-    else:
-        print("WARNING: No EBKP codes were loaded from the MD file")
-    
-    # Show a specific example for matching debugging
-    test_codes = ["E3.1", "E03.01", "E3", "E 3.1", "E 03.01"]
-    print("\nFormat normalization test:")
-    for test in test_codes:
-        normalized = normalize_ebkp_code(test)
-        matches = normalized in ebkp_descriptions
-        desc = ebkp_descriptions.get(normalized, "No match")
-        print(f"  {test} -> normalized: {normalized} -> matches: {matches} -> {desc}")
+    logger.info(f"Loaded {len(ebkp_descriptions)} EBKP codes with descriptions")
+    if not ebkp_descriptions:
+        logger.warning("No EBKP codes were loaded from the MD file")
+    elif logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Examples of loaded EBKP codes:")
+        for code, desc in list(ebkp_descriptions.items())[:5]:
+            logger.debug(f"  {code} -> {desc}")
     
     # Add the classification system to the project
     classification = ifcopenshell.api.run("classification.add_classification", 
         ifc_file, classification="EBKP"
     )
-    print(f"Added classification system: {classification.Name}")
+    logger.info(f"Added classification system: {classification.Name}")
     
-    # First, gather all available EBKP values for debugging
-    found_ebkp_values = []
-    for element in ifc_file.by_type("IfcElement"):
-        if hasattr(element, "IsDefinedBy"):
-            for rel in element.IsDefinedBy:
-                if rel.is_a("IfcRelDefinesByProperties"):
-                    pset = rel.RelatingPropertyDefinition
-                    if pset.is_a("IfcPropertySet") and hasattr(pset, "HasProperties"):
-                        for prop in pset.HasProperties:
-                            if prop.Name.lower() == "ebkp":
-                                if hasattr(prop, "NominalValue") and prop.NominalValue:
-                                    found_ebkp_values.append(prop.NominalValue.wrappedValue)
-    
-    if found_ebkp_values:
-        print(f"Found {len(found_ebkp_values)} elements with EBKP values")
-        print("Examples of EBKP values from the IFC file:")
-        unique_values = list(set(found_ebkp_values))
-        for val in unique_values[:10]:  # Show up to 10 unique values
+    # EBKP value per element, from one pass over the property relationships
+    found_values = property_values(ifc_file, "ebkp")
+    elements_processed = len(ifc_file.by_type("IfcElement"))
+    if not found_values:
+        logger.warning("No elements with EBKP property found in the IFC file")
+    elif logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Examples of EBKP values from the IFC file:")
+        for val in sorted(set(found_values.values()))[:10]:
             normalized = normalize_ebkp_code(val)
-            print(f"  {val} -> normalized: {normalized} -> in dictionary: {normalized in ebkp_descriptions}")
-    else:
-        print("WARNING: No elements with EBKP property found in the IFC file")
+            logger.debug(f"  {val} -> normalized: {normalized} -> in dictionary: {normalized in ebkp_descriptions}")
     
-    # Iterate over all IfcElement instances in the file
-    elements_processed = 0
-    elements_with_ebkp = 0
-    elements_with_match = 0
+    # Descriptions of the normalized codes, falling back to parent codes; the code itself if there is none
+    elements = list(found_values)
+    codes = [found_values[element] for element in elements]
+    lookups = {}
+    descriptions = EbkpIndex(ebkp_descriptions.items(), name="ebkp_descriptions").resolve(codes, stats=lookups)
     
-    for element in ifc_file.by_type("IfcElement"):
-        found_value = None
-        # Check for property sets linked via IfcRelDefinesByProperties
-        if hasattr(element, "IsDefinedBy"):
-            for rel in element.IsDefinedBy:
-                if rel.is_a("IfcRelDefinesByProperties"):
-                    pset = rel.RelatingPropertyDefinition
-                    # Ensure the property definition is a property set
-                    if pset.is_a("IfcPropertySet") and hasattr(pset, "HasProperties"):
-                        for prop in pset.HasProperties:
-                            # Look for property named "ebkp" (case-insensitive)
-                            if prop.Name.lower() == "ebkp":
-                                # Extract the value if available; otherwise use empty string
-                                if hasattr(prop, "NominalValue") and prop.NominalValue:
-                                    found_value = prop.NominalValue.wrappedValue
-                                else:
-                                    found_value = ""
-                                break
-                if found_value is not None:
-                    break
-        
-        elements_processed += 1
-        
-        # If the property "ebkp" was found, create a classification reference
-        if found_value is not None and found_value.strip():
-            elements_with_ebkp += 1
-            
-            # Get description from the mapping if available, otherwise use the code itself
-            original_code = found_value
-            
-            # Normalize the code format
-            normalized_code = normalize_ebkp_code(original_code)
-            
-            # Try exact match first with normalized code
-            description = ebkp_descriptions.get(normalized_code)
-            
-            # Debug: If exact match failed, try parent codes
-            if description is None:
-                print(f"DEBUG: No exact match for {original_code} (normalized: {normalized_code})")
-                
-                # Try parent codes by removing parts after the last decimal
-                code_parts = normalized_code.split(".")
-                if len(code_parts) > 1:
-                    parent_code = ".".join(code_parts[:-1])
-                    print(f"DEBUG: Trying parent code: {parent_code}")
-                    description = ebkp_descriptions.get(parent_code)
-                    if description:
-                        print(f"DEBUG: Found match with parent code: {parent_code} -> {description}")
-                
-                # If still no match, try just the main code (letter + first number)
-                if description is None and len(code_parts[0]) >= 2:
-                    main_code = code_parts[0][0] + re.match(r'([A-Z])(\d+)', code_parts[0]).group(2)
-                    print(f"DEBUG: Trying main code: {main_code}")
-                    description = ebkp_descriptions.get(main_code)
-                    if description:
-                        print(f"DEBUG: Found match with main code: {main_code} -> {description}")
-            
-                # If still not found, use the original code as description
-                if description is None:
-                    print(f"DEBUG: No match found for {original_code} after all attempts")
-                    description = original_code
-            else:
-                elements_with_match += 1
-                print(f"DEBUG: Found exact match for {original_code} -> {description}")
-            
-            # Add classification reference and assign it to the product in one step
-            reference = ifcopenshell.api.run("classification.add_reference",
-                ifc_file,
-                products=[element],
-                identification=found_value,
-                name=description,
-                classification=classification
-            )
-            
-            print(f"Processed element {element.GlobalId} with EBKP code: {found_value} -> {description}")
+    # One classification reference per EBKP code, assigned to all its elements
+    elements_by_code = {}
+    for element, code, description in zip(elements, codes, descriptions):
+        elements_by_code.setdefault((code, description or code), []).append(element)
+    for (code, description), products in elements_by_code.items():
+        ifcopenshell.api.run("classification.add_reference",
+            ifc_file,
+            products=products,
+            identification=code,
+            name=description,
+            classification=classification
+        )
+        logger.debug(f"Added classification for {len(products)} elements: {code} -> {description}")
     
-    print(f"Processed {elements_processed} elements, found {elements_with_ebkp} with EBKP property")
-    print(f"Successfully matched {elements_with_match} EBKP codes with descriptions")
+    logger.info(f"Processed {elements_processed} elements, found {len(elements)} with EBKP property")
+    logger.info(f"Successfully matched {lookups.get('hit', 0)} EBKP codes with descriptions, "
+                f"{lookups.get('fallback', 0)} with the description of a parent code")
     # Save the modified file
     ifc_file.write(output_path)
-    print(f"Modified file saved to: {output_path}")
+    logger.info(f"Modified file saved to: {output_path}")
     return output_path
 
 if __name__ == "__main__":
+    # Per-code details with LOG_LEVEL=DEBUG
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format='%(asctime)s - %(levelname)s - %(message)s')
     # Check if file path was provided as command-line argument
     if len(sys.argv) > 1:
         ifc_file_path = sys.argv[1]
@@ -4,33 +4,12 @@ import re
 import random
 import os
 import sys
+from pathlib import Path
 
-# Function to normalize EBKP codes to a standard format
-def normalize_ebkp_code(code):
-    # Remove spaces first
-    code = code.replace(" ", "")
-    
-    # Extract the letter and numbers
-    match = re.match(r'([A-Z])(\d+)(?:\.(\d+))?(?:\.(\d+))?', code)
-    if match:
-        letter, main, sub1, sub2 = match.groups()
-        
-        # Remove leading zeros
-        if main:
-            main = str(int(main))
-        if sub1:
-            sub1 = str(int(sub1))
-        if sub2:
-            sub2 = str(int(sub2))
-            
-        # Reconstruct the code without leading zeros
-        if sub1 and sub2:
-            return f"{letter}{main}.{sub1}.{sub2}"
-        elif sub1:
-            return f"{letter}{main}.{sub1}"
-        else:
-            return f"{letter}{main}"
-    return code
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from modules.ebkp_index import normalize_ebkp_code
 
 # Load EBKP codes from ebkp.md file
 def load_ebkp_codes(md_file_path, filter_letter='C'):
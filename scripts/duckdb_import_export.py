@@ -395,6 +395,9 @@ class DatabaseLoader:
                                 failed_elements, processing_time, kbob_version, created_at
                             ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                         """, entry)
+
+                # Counters of the imported data
+                self.db.refresh_project_stats(project[0])
             
             logging.info(f"Successfully imported all data from {input_dir}")
         except Exception as e:
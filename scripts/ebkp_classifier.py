@@ -1,8 +1,18 @@
 import ifcopenshell
 import ifcopenshell.api
+import logging
 import os
 import re
 import sys
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from modules.ebkp_index import EbkpIndex, normalize_ebkp_code
+from scripts.ifc_properties import property_values
+
+logger = logging.getLogger(__name__)
 
 def load_ebkp_descriptions(ebkp_file_path):
     """
@@ -28,47 +38,15 @@ def load_ebkp_descriptions(ebkp_file_path):
                 
     return ebkp_dict
 
-def normalize_ebkp_code(code):
-    """
-    Normalize eBKP code to standard format by:
-    1. Removing spaces
-    2. Removing leading zeros in numbers
-    3. Ensuring consistent format
-    
-    Examples:
-    "B 1.1" -> "B1.1"
-    "C02.01" -> "C2.1"
-    "C 02.01" -> "C2.1"
-    """
-    # Remove spaces
-    code = code.replace(" ", "")
-    
-    # Extract the letter and numbers with potential leading zeros
-    match = re.match(r'([A-Z])(\d+)(?:\.(\d+))?', code)
-    if match:
-        letter, main, sub = match.groups()
-        
-        # Remove leading zeros by converting to int and back to string
-        main_num = str(int(main))
-        sub_num = str(int(sub)) if sub else None
-        
-        # Reconstruct the code
-        if sub_num:
-            return f"{letter}{main_num}.{sub_num}"
-        else:
-            return f"{letter}{main_num}"
-            
-    return code
-
 def process_ifc_file(ifc_file_path, ebkp_file_path):
     """
     Process an IFC file to extract eBKP properties and create classifications
     """
-    print(f"Processing file: {os.path.basename(ifc_file_path)}")
+    logger.info(f"Processing file: {os.path.basename(ifc_file_path)}")
     
     # Load eBKP descriptions
     ebkp_descriptions = load_ebkp_descriptions(ebkp_file_path)
-    print(f"Loaded {len(ebkp_descriptions)} eBKP codes with descriptions")
+    logger.info(f"Loaded {len(ebkp_descriptions)} eBKP codes with descriptions")
     
     # Open the IFC file
     ifc_file = ifcopenshell.open(ifc_file_path)
@@ -82,70 +60,44 @@ def process_ifc_file(ifc_file_path, ebkp_file_path):
         ifc_file, classification="eBKP"
     )
     
-    # Track statistics
-    elements_processed = 0
-    elements_with_ebkp = 0
-    elements_with_match = 0
+    # eBKP value per element, from one pass over the property relationships
+    found_values = property_values(ifc_file, "ebkp")
+    elements_processed = len(ifc_file.by_type("IfcElement"))
     
-    # Iterate through all elements in the IFC file
-    for element in ifc_file.by_type("IfcElement"):
-        elements_processed += 1
-        
-        # Check if the element has property sets
-        if hasattr(element, "IsDefinedBy"):
-            ebkp_value = None
-            
-            # Look for eBKP property in all property sets
-            for rel in element.IsDefinedBy:
-                if rel.is_a("IfcRelDefinesByProperties"):
-                    pset = rel.RelatingPropertyDefinition
-                    
-                    # Check if it's a property set
-                    if pset.is_a("IfcPropertySet") and hasattr(pset, "HasProperties"):
-                        for prop in pset.HasProperties:
-                            # Look for property named "eBKP" (case-insensitive)
-                            if prop.Name.lower() == "ebkp":
-                                if hasattr(prop, "NominalValue") and prop.NominalValue:
-                                    ebkp_value = prop.NominalValue.wrappedValue
-                                break
-                
-                if ebkp_value is not None:
-                    break
-            
-            # If eBKP property was found, create a classification reference
-            if ebkp_value is not None and ebkp_value.strip():
-                elements_with_ebkp += 1
-                
-                # Normalize the eBKP code
-                normalized_code = normalize_ebkp_code(ebkp_value)
-                
-                # Get description from the mapping if available
-                description = ebkp_descriptions.get(normalized_code, ebkp_value)
-                
-                if normalized_code in ebkp_descriptions:
-                    elements_with_match += 1
-                
-                # Add classification reference and assign it to the product
-                reference = ifcopenshell.api.run("classification.add_reference",
-                    ifc_file,
-                    products=[element],
-                    identification=normalized_code,
-                    name=description,
-                    classification=classification
-                )
-                
-                print(f"Added classification for element {element.GlobalId}: {normalized_code} -> {description}")
+    # Normalize the eBKP codes; descriptions fall back to parent codes, then to the value itself
+    elements = list(found_values)
+    codes = [normalize_ebkp_code(found_values[element]) for element in elements]
+    lookups = {}
+    descriptions = EbkpIndex(ebkp_descriptions.items(), name="ebkp_descriptions").resolve(codes, stats=lookups)
+    
+    # One classification reference per eBKP code, assigned to all its elements
+    elements_by_code = {}
+    for element, normalized_code, description in zip(elements, codes, descriptions):
+        description = description or found_values[element]
+        elements_by_code.setdefault((normalized_code, description), []).append(element)
+    for (normalized_code, description), products in elements_by_code.items():
+        ifcopenshell.api.run("classification.add_reference",
+            ifc_file,
+            products=products,
+            identification=normalized_code,
+            name=description,
+            classification=classification
+        )
+        logger.debug(f"Added classification for {len(products)} elements: {normalized_code} -> {description}")
     
     # Save the modified file
     ifc_file.write(output_path)
     
-    print(f"Processed {elements_processed} elements, found {elements_with_ebkp} with eBKP property")
-    print(f"Successfully matched {elements_with_match} eBKP codes with descriptions")
-    print(f"Modified file saved to: {output_path}")
+    logger.info(f"Processed {elements_processed} elements, found {len(elements)} with eBKP property")
+    logger.info(f"Successfully matched {lookups.get('hit', 0)} eBKP codes with descriptions, "
+                f"{lookups.get('fallback', 0)} with the description of a parent code")
+    logger.info(f"Modified file saved to: {output_path}")
     
     return output_path
 
 if __name__ == "__main__":
+    # Per-code details with LOG_LEVEL=DEBUG
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format='%(asctime)s - %(levelname)s - %(message)s')
     # Check if file paths were provided as command-line arguments
     if len(sys.argv) > 2:
         ifc_file_path = sys.argv[1]
@@ -0,0 +1,45 @@
+from typing import Any, Dict, Optional
+
+
+def _property_value(definition, name: str) -> Optional[str]:
+    """Value of the property name (lower case) in a property set, "" if it has none, None if absent."""
+    if not definition.is_a("IfcPropertySet"):
+        return None
+    for prop in definition.HasProperties or ():
+        if prop.Name and prop.Name.lower() == name:
+            nominal_value = getattr(prop, "NominalValue", None)
+            return str(nominal_value.wrappedValue).strip() if nominal_value else ""
+    return None
+
+
+def property_values(ifc_file, property_name: str, element_type: str = "IfcElement") -> Dict[Any, str]:
+    """Non-empty values of a property (name matched case-insensitively) per element of element_type.
+
+    Walks the IfcRelDefinesByProperties relationships once instead of the
+    IsDefinedBy relationships of every element; property sets shared by
+    several relationships are read once. An element defined by several
+    property sets with the property gets the first non-empty value in file
+    order.
+    """
+    name = property_name.lower()
+    values_by_definition: Dict[int, Optional[str]] = {}
+    values: Dict[Any, str] = {}
+    for rel in ifc_file.by_type("IfcRelDefinesByProperties"):
+        definitions = rel.RelatingPropertyDefinition
+        # IFC4 allows a set of property set definitions
+        if not isinstance(definitions, (list, tuple)):
+            definitions = (definitions,)
+        value = None
+        for definition in definitions:
+            key = definition.id()
+            if key not in values_by_definition:
+                values_by_definition[key] = _property_value(definition, name)
+            value = values_by_definition[key]
+            if value:
+                break
+        if not value:
+            continue
+        for related in rel.RelatedObjects:
+            if related not in values and related.is_a(element_type):
+                values[related] = value
+    return values
@@ -0,0 +1,452 @@
+"""
+End-to-end load test of the orchestrator with local stand-ins.
+
+Kafka is replaced by an in-process queue, MinIO by a filesystem-backed object
+store and the extraction API by a local HTTP server replaying recorded (or
+synthetic) responses. N jobs are pushed through the real Orchestrator,
+LCAProcessor and CostProcessor against a local DuckDB file by C concurrent
+workers, each with its own consumer, producer and DatabaseManager like
+separate orchestrator instances.
+
+Usage:
+    python scripts/load_test.py --jobs 20 --concurrency 4 --elements 500
+    python scripts/load_test.py --jobs 50 --concurrency 8 --payloads data/input/recorded/ --output report.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import queue
+import random
+import shutil
+import argparse
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from confluent_kafka import OFFSET_INVALID
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from orchestrator import Orchestrator
+from modules.storage.db_manager import DatabaseManager, DEFAULT_PROJECT_ID
+from utils.metrics import DB_QUERY_DURATION
+from scripts.synthetic_elements import generate_payload, seed_reference_data
+
+INPUT_TOPIC = "ifc-files"
+OUTPUT_TOPIC = "ifc_processed"
+IFC_BUCKET = "ifc-files"
+
+
+class LocalMessage:
+    """Kafka message stand-in carrying the enqueue time of the job."""
+
+    def __init__(self, topic: str, value: bytes, headers: Optional[List[Tuple[str, bytes]]], offset: int):
+        self._topic = topic
+        self._value = value
+        self._headers = headers or []
+        self._offset = offset
+        self.enqueued_at = time.perf_counter()
+
+    def value(self) -> bytes:
+        return self._value
+
+    def headers(self) -> List[Tuple[str, bytes]]:
+        return self._headers
+
+    def topic(self) -> str:
+        return self._topic
+
+    def partition(self) -> int:
+        return 0
+
+    def offset(self) -> int:
+        return self._offset
+
+    def error(self):
+        return None
+
+
+class LocalBroker:
+    """In-process topics; consumers of a topic share its queue like one consumer group."""
+
+    def __init__(self):
+        self._queues: Dict[str, queue.Queue] = {}
+        self._offsets: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def topic(self, name: str) -> queue.Queue:
+        with self._lock:
+            return self._queues.setdefault(name, queue.Queue())
+
+    def publish(self, topic: str, value: bytes, headers=None) -> LocalMessage:
+        with self._lock:
+            offset = self._offsets.get(topic, 0)
+            self._offsets[topic] = offset + 1
+        message = LocalMessage(topic, value, headers, offset)
+        self.topic(topic).put(message)
+        return message
+
+    def high_watermark(self, topic: str) -> int:
+        with self._lock:
+            return self._offsets.get(topic, 0)
+
+
+class LocalConsumer:
+    """Subset of confluent_kafka.Consumer used by the orchestrator."""
+
+    def __init__(self, broker: LocalBroker):
+        self.broker = broker
+        self.topics: List[str] = []
+        # Offset of the next message per topic after the last one polled
+        self.positions: Dict[str, int] = {}
+
+    def subscribe(self, topics: List[str]) -> None:
+        self.topics = topics
+
+    def poll(self, timeout: float = 1.0) -> Optional[LocalMessage]:
+        try:
+            message = self.broker.topic(self.topics[0]).get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.positions[message.topic()] = message.offset() + 1
+        return message
+
+    def get_watermark_offsets(self, partition, timeout: float = 1.0) -> Tuple[int, int]:
+        return 0, self.broker.high_watermark(partition.topic)
+
+    def position(self, partitions: List[Any]) -> List[Any]:
+        for partition in partitions:
+            partition.offset = self.positions.get(partition.topic, OFFSET_INVALID)
+        return partitions
+
+    def close(self) -> None:
+        pass
+
+
+class LocalProducer:
+    """Subset of confluent_kafka.Producer used by the orchestrator."""
+
+    def __init__(self, broker: LocalBroker):
+        self.broker = broker
+        self.produced = 0
+
+    def produce(self, topic: str, value: bytes = None, headers=None, **kwargs) -> None:
+        self.broker.publish(topic, value, headers)
+        self.produced += 1
+
+    def flush(self, timeout: float = None) -> int:
+        return 0
+
+
+class _LocalObject:
+    """Object listing entry and GET response stand-in."""
+
+    def __init__(self, object_name: str, path: str):
+        self.object_name = object_name
+        self._path = path
+        self.last_modified = datetime.fromtimestamp(os.path.getmtime(path))
+
+    def read(self) -> bytes:
+        with open(self._path, "rb") as f:
+            return f.read()
+
+    def close(self) -> None:
+        pass
+
+    def release_conn(self) -> None:
+        pass
+
+
+class FileObjectStore:
+    """Subset of the minio.Minio client, storing objects as files below a root directory."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, bucket: str, object_name: str) -> str:
+        return os.path.join(self.root, bucket, *object_name.split("/"))
+
+    def bucket_exists(self, bucket: str) -> bool:
+        return os.path.isdir(os.path.join(self.root, bucket))
+
+    def make_bucket(self, bucket: str) -> None:
+        os.makedirs(os.path.join(self.root, bucket), exist_ok=True)
+
+    def put_object(self, bucket: str, object_name: str, data, length: int, **kwargs) -> None:
+        path = self._path(bucket, object_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data.read(length) if length >= 0 else data.read())
+
+    def get_object(self, bucket: str, object_name: str) -> _LocalObject:
+        path = self._path(bucket, object_name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No such object: {bucket}/{object_name}")
+        return _LocalObject(object_name, path)
+
+    def list_objects(self, bucket: str, prefix: str = "", recursive: bool = False) -> List[_LocalObject]:
+        bucket_dir = os.path.join(self.root, bucket)
+        objects = []
+        for directory, _, files in os.walk(bucket_dir):
+            for name in files:
+                path = os.path.join(directory, name)
+                object_name = os.path.relpath(path, bucket_dir).replace(os.sep, "/")
+                if object_name.startswith(prefix) and (recursive or "/" not in object_name[len(prefix):]):
+                    objects.append(_LocalObject(object_name, path))
+        return objects
+
+
+class StubExtractionServer:
+    """Local HTTP server answering extraction requests with recorded payloads in round-robin order."""
+
+    def __init__(self, payloads: List[bytes], latency: float = 0.0):
+        self.payloads = payloads
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-extraction-api", daemon=True)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    payload = stub.payloads[stub.requests % len(stub.payloads)]
+                    stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/api/ifc/extract-building-elements"
+
+    def __enter__(self) -> "StubExtractionServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def load_payloads(directory: Optional[str], elements: int, seed: int) -> List[bytes]:
+    """Load recorded extraction responses (*.json) or generate a synthetic one."""
+    if directory:
+        payloads = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".json"):
+                with open(os.path.join(directory, name), "rb") as f:
+                    payloads.append(f.read())
+        if not payloads:
+            raise ValueError(f"No recorded payloads (*.json) found in {directory}")
+        return payloads
+    return [json.dumps(generate_payload(elements, seed=seed)).encode("utf-8")]
+
+
+def db_time_snapshot() -> Dict[str, Tuple[float, float]]:
+    """Get (calls, total seconds) per DatabaseManager operation from the metrics registry."""
+    snapshot: Dict[str, List[float]] = {}
+    for metric in DB_QUERY_DURATION.collect():
+        for sample in metric.samples:
+            operation = sample.labels.get("operation")
+            if sample.name.endswith("_count"):
+                snapshot.setdefault(operation, [0.0, 0.0])[0] = sample.value
+            elif sample.name.endswith("_sum"):
+                snapshot.setdefault(operation, [0.0, 0.0])[1] = sample.value
+    return {operation: (calls, seconds) for operation, (calls, seconds) in snapshot.items()}
+
+
+class ConflictCounter(logging.Handler):
+    """Count logged DuckDB transaction conflicts (concurrent writes to the same rows)."""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.conflicts = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if "conflict" in record.getMessage().lower():
+            self.conflicts += 1
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    return round(float(np.percentile(values, q)), 4) if values else None
+
+
+def run_worker(orchestrator: Orchestrator, producer: LocalProducer, remaining: List[int],
+               lock: threading.Lock, records: List[Dict[str, Any]]) -> None:
+    """Consume jobs until all have been handled, recording latency and outcome per job."""
+    while True:
+        with lock:
+            if remaining[0] <= 0:
+                return
+            remaining[0] -= 1
+        message = None
+        while message is None:
+            message = orchestrator.consumer.poll(0.1)
+        started = time.perf_counter()
+        produced_before = producer.produced
+        orchestrator.update_consumer_lag(message)
+        orchestrator.handle_message(message)
+        finished = time.perf_counter()
+        records.append({
+            "queue_seconds": started - message.enqueued_at,
+            "service_seconds": finished - started,
+            "latency_seconds": finished - message.enqueued_at,
+            # handle_message logs failures; only successful jobs publish a response
+            "succeeded": producer.produced > produced_before,
+        })
+
+
+def run_load_test(jobs: int, concurrency: int, workdir: str, payloads: List[bytes],
+                  api_latency: float = 0.0, profile_sample_rate: float = 0.0) -> Dict[str, Any]:
+    """Push jobs through concurrent orchestrator workers and summarize latency and DB time.
+
+    Latency runs from publishing a job to the end of its handling (queue wait
+    plus service time); service time starts when a worker picks the job up.
+    """
+    db_path = os.path.join(workdir, "load_test.duckdb")
+    seed_db = DatabaseManager(db_path)
+    seed_reference_data(seed_db, DEFAULT_PROJECT_ID)
+    seed_db.close()
+
+    store = FileObjectStore(os.path.join(workdir, "objects"))
+    store.make_bucket(IFC_BUCKET)
+    for i in range(jobs):
+        data = f"ISO-10303-21; synthetic model {i}".encode("utf-8")
+        store.put_object(IFC_BUCKET, f"model_{i}.ifc", io.BytesIO(data), len(data))
+
+    broker = LocalBroker()
+    records: List[Dict[str, Any]] = []
+    remaining, lock = [jobs], threading.Lock()
+
+    with StubExtractionServer(payloads, latency=api_latency) as server:
+        workers = []
+        for _ in range(concurrency):
+            consumer, producer = LocalConsumer(broker), LocalProducer(broker)
+            orchestrator = Orchestrator(
+                consumer=consumer,
+                producer=producer,
+                db=DatabaseManager(db_path, write_queue=True),
+                minio_client=store,
+                ifc_api_endpoint=server.url
+            )
+            orchestrator.profile_sample_rate = profile_sample_rate
+            orchestrator.profile_output_dir = os.path.join(workdir, "output")
+            workers.append(threading.Thread(
+                target=run_worker, args=(orchestrator, producer, remaining, lock, records), name="load-test-worker"
+            ))
+
+        conflict_counter = ConflictCounter()
+        logging.getLogger().addHandler(conflict_counter)
+        db_before = db_time_snapshot()
+        start = time.perf_counter()
+        for i in range(jobs):
+            broker.publish(INPUT_TOPIC, f"http://local/{IFC_BUCKET}/model_{i}.ifc".encode("utf-8"))
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        wall = time.perf_counter() - start
+        db_after = db_time_snapshot()
+        logging.getLogger().removeHandler(conflict_counter)
+
+    db_operations = {}
+    for operation, (calls, seconds) in db_after.items():
+        calls_before, seconds_before = db_before.get(operation, (0.0, 0.0))
+        if calls > calls_before:
+            db_operations[operation] = {
+                "calls": int(calls - calls_before),
+                "total_seconds": round(seconds - seconds_before, 4),
+                "mean_ms": round((seconds - seconds_before) / (calls - calls_before) * 1000, 3),
+            }
+    latencies = [record["latency_seconds"] for record in records]
+    service_times = [record["service_seconds"] for record in records]
+
+    return {
+        "jobs": jobs,
+        "concurrency": concurrency,
+        "succeeded": sum(record["succeeded"] for record in records),
+        "failed": sum(not record["succeeded"] for record in records),
+        "wall_seconds": round(wall, 4),
+        "throughput_jobs_per_second": round(jobs / wall, 4) if wall else None,
+        "latency_seconds": {q: percentile(latencies, int(q[1:])) for q in ("p50", "p95", "p99")},
+        "service_seconds": {q: percentile(service_times, int(q[1:])) for q in ("p50", "p95", "p99")},
+        "extraction_requests": server.requests,
+        "db": {
+            # Logged errors caused by write-write conflicts between workers
+            "conflict_errors": conflict_counter.conflicts,
+            # Time inside DatabaseManager calls (nested calls are also counted on their own);
+            # compare mean_ms against a --concurrency 1 run to see lock and conflict overhead
+            "operations": dict(sorted(db_operations.items(), key=lambda item: -item[1]["total_seconds"])),
+        },
+    }
+
+
+def main():
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Load test the orchestrator with local stand-ins")
+    parser.add_argument("--jobs", type=int, default=20, help="Number of jobs to push through")
+    parser.add_argument("--concurrency", type=int, default=4, help="Number of concurrent orchestrator workers")
+    parser.add_argument("--payloads", help="Directory of recorded extraction API responses (*.json)")
+    parser.add_argument("--elements", type=int, default=500, help="Elements per synthetic payload without --payloads")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the synthetic payload")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Simulated extraction API latency in seconds")
+    parser.add_argument("--profile-sample-rate", type=float, default=0.0, help="Share of jobs run under the job profiler")
+    parser.add_argument("--workdir", help="Directory for the database and object store (default: temporary)")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    parser.add_argument("--log-level", default="CRITICAL", help="Console log level of the pipeline during the run")
+    args = parser.parse_args()
+
+    # Errors must still reach the conflict counter when the console is quieter
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers:
+        handler.setLevel(args.log_level)
+    root_logger.setLevel(min(logging.ERROR, logging.getLevelName(args.log_level.upper())))
+
+    random.seed(args.seed)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="nhmzh-load-test-")
+    try:
+        report = run_load_test(
+            args.jobs, args.concurrency, workdir,
+            load_payloads(args.payloads, args.elements, args.seed),
+            api_latency=args.api_latency,
+            profile_sample_rate=args.profile_sample_rate
+        )
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,110 +1,175 @@
-# python NHMzh-modules\scripts\profiler.py NHMzh-modules\data\input\large_dataset.csv
+"""
+Profile the DB-backed pipeline against a local DuckDB file.
+
+Reports wall time, CPU time and peak memory (tracemalloc) per pipeline stage
+and writes the sampled Python stacks in folded format for flamegraph tools.
+
+Usage:
+    # Profile 10'000 synthetic elements in a fresh database
+    python scripts/profiler.py run --db data/profile.duckdb --synthetic 10000
+
+    # Profile an existing project
+    python scripts/profiler.py run --db data/nhmzh_data.duckdb --project-id <project_id>
+
+    # Compare two runs
+    python scripts/profiler.py diff data/output/qa/base/profile.json data/output/qa/head/profile.json
+"""
 
-import cProfile
-import pstats
-import sys
 import os
-import logging
+import sys
 import json
-from collections import defaultdict
 import time
+import argparse
+import logging
+from contextlib import closing
 
 # Add the parent directory to sys.path
 current_dir = os.path.dirname(os.path.abspath(__file__))  # Path to 'scripts/'
-parent_dir = os.path.dirname(current_dir)  # Path to 'NHMzh-modules/'
+parent_dir = os.path.dirname(current_dir)  # Path to project root
 sys.path.insert(0, parent_dir)
 
-from run_processors import main as run_main
-from utils.shared_utils import ensure_output_directory
+from modules.lca_processor import LCAProcessor
+from modules.cost_processor import CostProcessor
+from modules.storage.db_manager import DatabaseManager, DEFAULT_PROJECT_ID
+from utils.metrics import stage_timer
+from utils.profiling import StackSampler, StageProfiler, diff_profiles, load_profile
+from utils.shared_utils import ensure_output_directory, load_data
+from scripts.synthetic_elements import generate_elements, seed_reference_data
+
+DEFAULT_OUTPUT_DIR = os.path.join(parent_dir, "data", "output", "qa")
+
+
+def run_pipeline(db: DatabaseManager, project_id: str, processors, elements=None) -> None:
+    """Store the given elements (if any), then run the requested processors."""
+    if elements is not None:
+        with stage_timer("store", rows=len(elements)):
+            db.store_ifc_elements(elements, project_id)
+    # Processors get a connection of their own, closed here; db stays usable
+    if "lca" in processors:
+        with closing(db.fork()) as lca_db:
+            LCAProcessor(None, None, lca_db, project_id=project_id).run()
+    if "cost" in processors:
+        with closing(db.fork()) as cost_db:
+            CostProcessor(None, None, None, cost_db, project_id=project_id).run()
+
+
+def profile_command(args) -> None:
+    if os.path.dirname(args.db):
+        ensure_output_directory(os.path.dirname(args.db))
+    db = DatabaseManager(args.db)
+    elements = None
+    if args.synthetic:
+        seed_reference_data(db, args.project_id)
+        elements = generate_elements(args.synthetic, seed=args.seed)
+    elif args.input:
+        elements = load_data(args.input)["elements"]
+
+    sampler = StackSampler(interval=args.interval)
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    with StageProfiler() as profiler:
+        sampler.start()
+        try:
+            run_pipeline(db, args.project_id, args.processors, elements)
+        finally:
+            sampler.stop()
+            peak_memory_mb = profiler.peak_memory_mb()
+    wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+    db.close()
+
+    summary = {
+        "db": args.db,
+        "project_id": args.project_id,
+        "elements": len(elements) if elements is not None else None,
+        "total": {
+            "wall_seconds": round(wall, 4),
+            "cpu_seconds": round(cpu, 4),
+            "peak_memory_mb": round(peak_memory_mb, 4),
+        },
+        "stages": profiler.summary(),
+        "sample_interval": args.interval,
+        "samples": sampler.total_samples,
+        "functions": sampler.function_stats(),
+    }
+
+    ensure_output_directory(args.output_dir)
+    summary_path = os.path.join(args.output_dir, "profile.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=4)
+    stacks_path = os.path.join(args.output_dir, "stacks.folded")
+    with open(stacks_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(sampler.folded()) + "\n")
+
+    print(f"{'Stage':<20}{'Calls':>6}{'Wall [s]':>12}{'CPU [s]':>12}{'Peak [MB]':>12}")
+    for name, stats in summary["stages"].items():
+        print(f"{name:<20}{stats['calls']:>6}{stats['wall_seconds']:>12.3f}"
+              f"{stats['cpu_seconds']:>12.3f}{stats['peak_memory_mb']:>12.1f}")
+    total = summary["total"]
+    print(f"{'total':<20}{'':>6}{total['wall_seconds']:>12.3f}{total['cpu_seconds']:>12.3f}{total['peak_memory_mb']:>12.1f}")
+    logging.info(f"Profile written to {summary_path}, stacks to {stacks_path}")
+
+
+def _format_pair(pair, change) -> str:
+    before, after = pair
+    text = f"{before if before is not None else '-':>10} → {after if after is not None else '-':<10}"
+    return text + (f" ({change:+.1f}%)" if change is not None else "")
+
+
+def diff_command(args) -> None:
+    diff = diff_profiles(load_profile(args.base), load_profile(args.head), limit=args.limit)
+
+    regressions = []
+    print("Stages (wall s, CPU s, peak MB):")
+    for row in diff["stages"]:
+        print(f"  {row['stage']:<20}"
+              f"{_format_pair(row['wall_seconds'], row['wall_seconds_change_pct'])}  "
+              f"{_format_pair(row['cpu_seconds'], row['cpu_seconds_change_pct'])}  "
+              f"{_format_pair(row['peak_memory_mb'], row['peak_memory_mb_change_pct'])}")
+        change = row["wall_seconds_change_pct"]
+        if args.fail_threshold is not None and change is not None and change > args.fail_threshold:
+            regressions.append(row["stage"])
+
+    print("\nFunctions by change in sampled self time:")
+    for row in diff["functions"]:
+        before, after = row["self_seconds"]
+        print(f"  {row['delta_seconds']:+9.3f}s  {before:>8.3f} → {after:<8.3f} {row['function']}")
+
+    if regressions:
+        logging.error(f"Wall time regressed by more than {args.fail_threshold}% in: {', '.join(regressions)}")
+        sys.exit(1)
+
 
-if __name__ == "__main__":
-    # Configure logging
+def main():
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout)
-        ]
+        handlers=[logging.StreamHandler(sys.stdout)]
     )
 
-    if len(sys.argv) != 2:
-        print("Usage: profiler.py <input_file_path>")
-        sys.exit(1)
-
-    input_file_path = sys.argv[1]
-
-    # Start total runtime timer
-    total_start_time = time.time()
+    parser = argparse.ArgumentParser(description="Profile the LCA/cost pipeline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
 
-    # Create a cProfile profiler
-    profiler = cProfile.Profile()
-    profiler.enable()
+    run_parser = subparsers.add_parser("run", help="Profile a pipeline run")
+    run_parser.add_argument("--db", required=True, help="Path of the local DuckDB file")
+    run_parser.add_argument("--project-id", default=DEFAULT_PROJECT_ID, help="Project to process")
+    source = run_parser.add_mutually_exclusive_group()
+    source.add_argument("--synthetic", type=int, help="Seed reference data and store this many synthetic elements")
+    source.add_argument("--input", help="Extraction API JSON whose elements are stored before processing")
+    run_parser.add_argument("--seed", type=int, default=0, help="Random seed of the synthetic elements")
+    run_parser.add_argument("--processors", nargs="+", choices=["lca", "cost"], default=["lca", "cost"])
+    run_parser.add_argument("--interval", type=float, default=0.005, help="Stack sampling interval in seconds")
+    run_parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Directory of profile.json and stacks.folded")
+    run_parser.set_defaults(func=profile_command)
 
-    try:
-        # Set sys.argv for run_processors.py
-        sys.argv = ['run_processors.py', input_file_path]
+    diff_parser = subparsers.add_parser("diff", help="Compare two profile.json files")
+    diff_parser.add_argument("base", help="Baseline profile.json")
+    diff_parser.add_argument("head", help="Profile to compare against the baseline")
+    diff_parser.add_argument("--limit", type=int, default=20, help="Number of functions to show")
+    diff_parser.add_argument("--fail-threshold", type=float, help="Exit with 1 if a stage's wall time grows by more than this percentage")
+    diff_parser.set_defaults(func=diff_command)
 
-        # Run the main function from run_processors.py
-        run_main()
+    args = parser.parse_args()
+    args.func(args)
 
-        logging.info("Processing completed successfully.")
-
-    except Exception as e:
-        logging.error(f"An error occurred during execution: {str(e)}")
-        sys.exit(1)
-
-    finally:
-        profiler.disable()
-        total_end_time = time.time()
-        total_runtime = total_end_time - total_start_time
-
-        output_directory = os.path.join(parent_dir, "data", "output", "qa")
-        ensure_output_directory(output_directory)
-        stats = pstats.Stats(profiler)
-        stats.dump_stats(os.path.join(output_directory, 'profile_stats.prof'))
-
-        # Process stats to create a summary per .py file
-        stats.sort_stats('cumtime')
-
-        # Aggregate cumulative times per .py file
-        file_stats = defaultdict(lambda: {'tottime': 0.0, 'cumtime': 0.0})
-
-        for func_tuple, stat in stats.stats.items():
-            filename, lineno, function_name = func_tuple
-            cc, nc, tt, ct, callers = stat
-
-            if filename.endswith('.py'):
-                # Only consider .py files
-                # Normalize filename to relative path from project root
-                if filename.startswith(parent_dir):
-                    # Project files
-                    file_path = os.path.relpath(filename, parent_dir)
-                else:
-                    # Other files, keep as is
-                    file_path = filename
-                file_stats[file_path]['tottime'] += tt
-                file_stats[file_path]['cumtime'] += ct
-
-        # Convert file_stats to a list and sort
-        file_stats_list = []
-        for file_path, times in file_stats.items():
-            file_stat = {
-                'file': file_path,
-                'tottime': round(times['tottime'], 6),
-                'cumtime': round(times['cumtime'], 6),
-            }
-            file_stats_list.append(file_stat)
-
-        file_stats_list.sort(key=lambda x: x['cumtime'], reverse=True)
-
-        # Prepare the final summary
-        profiling_summary = {
-            'total_runtime': round(total_runtime, 6),
-            'file_stats': file_stats_list
-        }
-
-        # Save the summary to a JSON file
-        summary_file_path = os.path.join(output_directory, 'profile_summary_by_file.json')
-        with open(summary_file_path, 'w') as f:
-            json.dump(profiling_summary, f, indent=4)
 
+if __name__ == "__main__":
+    main()
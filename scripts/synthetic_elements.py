@@ -0,0 +1,255 @@
+"""
+Synthetic workload generator shaped like the IFC extraction API response.
+
+Generates elements with nested `quantities`, `properties.ebkp` and
+`material_volumes`, plus matching reference data (KBOB materials, life
+expectancy, cost reference, material mappings), so the DB-backed pipeline
+can be benchmarked and profiled at arbitrary scale.
+
+Usage:
+    python scripts/synthetic_elements.py <num_elements> <output_json> [--seed 0]
+"""
+
+import os
+import sys
+import json
+import uuid
+import argparse
+import logging
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Add the parent directory to sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from modules.storage.db_manager import DatabaseManager
+
+SYNTHETIC_KBOB_VERSION = "synthetic-1.0"
+
+# IFC GlobalId alphabet (base64 variant used by IFC)
+GLOBAL_ID_CHARS = np.array(list("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_$"))
+
+# name: (density [kg/m3], GWP [kg CO2-eq/kg], PENRE [kWh oil-eq/kg], UBP [pts/kg])
+MATERIALS = {
+    "Beton C30/37": (2400.0, 0.11, 0.17, 160.0),
+    "Beton C25/30": (2350.0, 0.10, 0.16, 150.0),
+    "Magerbeton": (2200.0, 0.08, 0.12, 120.0),
+    "Bewehrungsstahl": (7850.0, 0.68, 2.20, 2900.0),
+    "Stahl": (7850.0, 1.50, 5.00, 4600.0),
+    "Backstein": (1100.0, 0.25, 0.60, 420.0),
+    "Kalksandstein": (1800.0, 0.13, 0.25, 200.0),
+    "Glaswolle": (30.0, 1.40, 6.50, 2400.0),
+    "Steinwolle": (80.0, 1.20, 4.30, 1900.0),
+    "EPS": (20.0, 3.80, 27.0, 5300.0),
+    "XPS": (35.0, 4.50, 28.0, 6100.0),
+    "Gipsplatte": (850.0, 0.30, 1.10, 520.0),
+    "Brettschichtholz": (470.0, 0.25, 1.90, 800.0),
+    "Aluminium": (2700.0, 8.30, 35.0, 17000.0),
+    "Glas": (2500.0, 1.10, 3.90, 1800.0),
+    "Zementestrich": (2000.0, 0.13, 0.22, 190.0),
+    "Bitumenbahn": (1100.0, 1.60, 13.0, 2600.0),
+    "Kies": (1700.0, 0.01, 0.03, 20.0),
+    "Putz": (1400.0, 0.20, 0.45, 330.0),
+    "Holzwerkstoffplatte": (600.0, 0.55, 3.20, 1200.0),
+}
+
+# ifc_class: (share of elements, eBKP-H code, cost unit, candidate materials, materials per element weights)
+IFC_CLASSES = {
+    "IfcWall": (0.35, "C2.1", "m2",
+                ["Beton C30/37", "Backstein", "Kalksandstein", "Glaswolle", "Steinwolle", "EPS", "Gipsplatte", "Putz"],
+                [0.30, 0.20, 0.25, 0.15, 0.10]),
+    "IfcSlab": (0.20, "C4.1", "m2",
+                ["Beton C30/37", "Beton C25/30", "Bewehrungsstahl", "Zementestrich", "XPS", "Bitumenbahn"],
+                [0.40, 0.25, 0.20, 0.15]),
+    "IfcBeam": (0.12, "C4.4", "m",
+                ["Beton C30/37", "Stahl", "Brettschichtholz", "Bewehrungsstahl"],
+                [0.80, 0.20]),
+    "IfcColumn": (0.08, "C3.1", "m",
+                  ["Beton C30/37", "Stahl", "Bewehrungsstahl"],
+                  [0.75, 0.25]),
+    "IfcWindow": (0.10, "E3.1", "m2",
+                  ["Glas", "Aluminium", "Brettschichtholz"],
+                  [0.10, 0.70, 0.20]),
+    "IfcDoor": (0.05, "G3.1", "m2",
+                ["Holzwerkstoffplatte", "Aluminium", "Stahl", "Glas"],
+                [0.40, 0.40, 0.20]),
+    "IfcCovering": (0.07, "G2.1", "m2",
+                    ["Gipsplatte", "Putz", "Holzwerkstoffplatte"],
+                    [0.70, 0.30]),
+    "IfcFooting": (0.03, "C1.1", "m2",
+                   ["Beton C25/30", "Magerbeton", "Kies", "Bewehrungsstahl"],
+                   [0.40, 0.40, 0.20]),
+}
+
+# Reference data for the eBKP-H codes used above: code -> (description, life expectancy, cost per unit)
+EBKP_REFERENCE = {
+    "C1.1": ("Bodenplatte, Fundament", 60, 420.0),
+    "C2.1": ("Aussenwand", 60, 380.0),
+    "C3.1": ("Stütze", 60, 310.0),
+    "C4.1": ("Decke", 60, 290.0),
+    "C4.4": ("Träger", 60, 260.0),
+    "E3.1": ("Fenster", 30, 950.0),
+    "G2.1": ("Bodenbelag, Wandbekleidung", 30, 120.0),
+    "G3.1": ("Innentür", 40, 640.0),
+}
+
+
+def kbob_uuid(material_name: str) -> str:
+    """Get a stable synthetic KBOB UUID for a material name."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"nhmzh-synthetic/{material_name}")).upper()
+
+
+def zero_padded(ebkp_code: str) -> str:
+    """Write an eBKP-H code with two-digit numbers, e.g. C2.1 -> C02.01."""
+    letter, numbers = ebkp_code[0], ebkp_code[1:].split(".")
+    return letter + ".".join(f"{int(number):02d}" for number in numbers)
+
+
+def generate_elements(num_elements: int, seed: int = 0, zero_padded_share: float = 0.2) -> List[Dict[str, Any]]:
+    """Generate elements in the shape returned by the IFC extraction API.
+
+    Args:
+        num_elements: Number of elements to generate
+        seed: Random seed for reproducible workloads
+        zero_padded_share: Share of elements whose eBKP-H code is written
+                           zero-padded (C02.01 instead of C2.1), as found in real models
+    """
+    rng = np.random.default_rng(seed)
+    class_names = list(IFC_CLASSES)
+    shares = np.array([IFC_CLASSES[name][0] for name in class_names])
+    classes = rng.choice(len(class_names), size=num_elements, p=shares / shares.sum())
+
+    global_ids = ["".join(chars) for chars in rng.choice(GLOBAL_ID_CHARS, size=(num_elements, 22))]
+    lengths = rng.lognormal(mean=1.2, sigma=0.5, size=num_elements).round(3)
+    widths = rng.uniform(0.1, 0.5, size=num_elements).round(3)
+    heights = rng.uniform(2.4, 3.6, size=num_elements).round(3)
+    padded = rng.random(num_elements) < zero_padded_share
+    load_bearing = rng.random(num_elements) < 0.6
+    is_external = rng.random(num_elements) < 0.3
+
+    elements = []
+    for i in range(num_elements):
+        ifc_class = class_names[classes[i]]
+        _, ebkp, _, candidates, count_weights = IFC_CLASSES[ifc_class]
+        num_materials = rng.choice(len(count_weights), p=count_weights) + 1
+        materials = list(rng.choice(candidates, size=min(num_materials, len(candidates)), replace=False))
+
+        area = round(float(lengths[i] * heights[i]), 3)
+        volume = round(float(area * widths[i]), 4)
+        fractions = rng.dirichlet(np.ones(len(materials)))
+
+        material_volumes = {}
+        for material, fraction in zip(materials, fractions):
+            material_volumes[material] = {
+                "fraction": round(float(fraction), 4),
+                "volume": round(float(volume * fraction), 4),
+                "width": round(float(widths[i] * fraction * 1000), 1),
+                "density": MATERIALS[material][0]
+            }
+
+        elements.append({
+            "id": global_ids[i],
+            "ifc_class": ifc_class,
+            "object_type": f"{ifc_class[3:]}-{classes[i]}",
+            "properties": {
+                "loadBearing": bool(load_bearing[i]),
+                "isExternal": bool(is_external[i]),
+                "ebkp": zero_padded(ebkp) if padded[i] else ebkp
+            },
+            "quantities": {
+                "volume": {"net": volume, "gross": round(volume * 1.02, 4)},
+                "area": {"net": area, "gross": round(area * 1.02, 3)},
+                "dimensions": {
+                    "length": float(lengths[i]),
+                    "width": float(widths[i]),
+                    "height": float(heights[i])
+                }
+            },
+            "materials": materials,
+            "material_volumes": material_volumes
+        })
+    return elements
+
+
+def generate_payload(num_elements: int, seed: int = 0) -> Dict[str, Any]:
+    """Generate a full extraction API response with elements and metadata."""
+    elements = generate_elements(num_elements, seed=seed)
+    return {
+        "elements": elements,
+        "metadata": {
+            "total_elements": len(elements),
+            "total_pages": 1,
+            "current_page": 1,
+            "page_size": len(elements),
+            "units": {"length": "METRE", "area": "METRE²", "volume": "METRE³"}
+        }
+    }
+
+
+def seed_reference_data(db: DatabaseManager, project_id: str, version: str = SYNTHETIC_KBOB_VERSION,
+                        project_name: Optional[str] = None) -> None:
+    """Load KBOB materials, life expectancy, cost reference and mappings matching the generator."""
+    conn = db.conn
+    kbob_df = pd.DataFrame([
+        {
+            "uuid": kbob_uuid(name),
+            "name": name,
+            "indicator_co2eq": gwp,
+            "indicator_penre": penre,
+            "indicator_ubp": ubp,
+            "density": density,
+            "version": version
+        }
+        for name, (density, gwp, penre, ubp) in MATERIALS.items()
+    ])
+    conn.execute("DELETE FROM kbob_materials WHERE version = ?", [version])
+    conn.execute("DELETE FROM kbob_versions WHERE version = ?", [version])
+    conn.execute("""
+        INSERT INTO kbob_materials (uuid, name, indicator_co2eq, indicator_penre, indicator_ubp, density, version)
+        SELECT uuid, name, indicator_co2eq, indicator_penre, indicator_ubp, density, version FROM kbob_df
+    """)
+    conn.execute("""
+        INSERT INTO kbob_versions (version, release_date, description)
+        VALUES (?, ?, ?)
+    """, [version, date.today().isoformat(), "Synthetic KBOB data"])
+    db.set_active_kbob_version(version)
+
+    db.init_life_expectancy_data([
+        {"ebkp_code": code, "description": description, "years": years}
+        for code, (description, years, _) in EBKP_REFERENCE.items()
+    ])
+
+    units = {ebkp: unit for _, ebkp, unit, _, _ in IFC_CLASSES.values()}
+    conn.execute("DELETE FROM cost_reference WHERE version = ?", [version])
+    for code, (description, _, cost) in EBKP_REFERENCE.items():
+        conn.execute("""
+            INSERT INTO cost_reference (ebkp_code, description, unit, cost_per_unit, version)
+            VALUES (?, ?, ?, ?, ?)
+        """, [code, description, units[code], cost, version])
+
+    db.init_project(project_id, project_name or f"Synthetic Project {project_id}", version)
+    db.update_material_mappings(project_id, {name: kbob_uuid(name) for name in MATERIALS})
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Generate an extraction-API-shaped synthetic IFC payload")
+    parser.add_argument("num_elements", type=int, help="Number of elements to generate")
+    parser.add_argument("output_json", help="Path of the JSON file to write")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    payload = generate_payload(args.num_elements, seed=args.seed)
+    with open(args.output_json, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    logging.info(f"Wrote {args.num_elements} synthetic elements to {args.output_json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import sys
+import json
+from pathlib import Path
+from unittest.mock import Mock
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import pytest
+
+from modules.base_processor import BaseProcessor
+
+
+class DummyProcessor(BaseProcessor):
+    result_type = "lca"
+    result_filename = "test_results"
+
+    def validate_data(self):
+        pass
+
+    def process_data(self):
+        pass
+
+
+@pytest.fixture
+def results():
+    return [
+        {
+            "guid": "element_1",
+            "components": [
+                {"guid": "element_1", "material": "Beton", "ebkp_h": "C2.1", "gwp_absolute": 10.5, "failed": False},
+                {"guid": "element_1", "material": "Stahl", "failed": True, "error": "Material mapping not found: Stahl"}
+            ],
+            "shared_guid": True
+        },
+        {
+            "guid": "element_2",
+            "components": [
+                {"guid": "element_2", "material": "Holz", "ebkp_h": "E2.1", "gwp_absolute": 3.0, "failed": False}
+            ],
+            "shared_guid": False
+        }
+    ]
+
+
+def test_results_to_table_flattens_components(results, monkeypatch):
+    monkeypatch.setattr("modules.base_processor.RESULT_BATCH_SIZE", 1)
+    processor = DummyProcessor(input_file_path=None)
+    processor.results = results
+
+    table = processor.results_to_table()
+
+    assert table.num_rows == 3
+    assert table.column("material").to_pylist() == ["Beton", "Stahl", "Holz"]
+    # Batches without metrics are unified with the ones that have them
+    assert table.column("gwp_absolute").to_pylist() == [10.5, None, 3.0]
+    assert table.column("shared_guid").to_pylist() == [True, True, False]
+
+
+def test_results_to_table_keeps_metrics_after_failed_first_component(results):
+    processor = DummyProcessor(input_file_path=None)
+    results[0]["components"].reverse()
+    processor.results = results
+
+    table = processor.results_to_table()
+
+    # One batch of the default size, starting with the failed component
+    assert table.column("material").to_pylist() == ["Stahl", "Beton", "Holz"]
+    assert table.column("gwp_absolute").to_pylist() == [None, 10.5, 3.0]
+    assert table.column("ebkp_h").to_pylist() == [None, "C2.1", "E2.1"]
+    assert table.column("error").to_pylist() == ["Material mapping not found: Stahl", None, None]
+
+
+
+def test_results_to_table_handles_nan_codes_and_mixed_numbers(results, monkeypatch):
+    monkeypatch.setattr("modules.base_processor.RESULT_BATCH_SIZE", 1)
+    processor = DummyProcessor(input_file_path=None)
+    # An empty eBKP-H cell read from CSV, and a whole-number cost in the first batch
+    results[0]["components"][0].update(ebkp_h=float("nan"), total_cost=12)
+    results[1]["components"][0]["total_cost"] = 7.5
+    processor.results = results
+
+    table = processor.results_to_table()
+
+    assert table.column("ebkp_h").to_pylist() == [None, None, "E2.1"]
+    assert table.column("total_cost").type == "double"
+    assert table.column("total_cost").to_pylist() == [12.0, None, 7.5]
+
+
+def test_save_results_uploads_table_and_streams_json(results, tmp_path):
+    output_file = tmp_path / "out" / "results.json"
+    processor = DummyProcessor(input_file_path=None, output_file=str(output_file))
+    processor.project_id = "test_project"
+    processor.minio_manager = Mock()
+    processor.results = results
+
+    processor.save_results()
+
+    project_id, filename, table, data_type = processor.minio_manager.store_results.call_args[0]
+    assert (project_id, filename, data_type) == ("test_project", "test_results", "lca")
+    assert table.num_rows == 3
+    with open(output_file, encoding="utf-8") as f:
+        assert json.load(f) == results
+
+
+def test_save_results_without_results_raises():
+    processor = DummyProcessor(input_file_path=None)
+    with pytest.raises(ValueError):
+        processor.save_results()
@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from modules.cost_processor import CostProcessor
+from modules.ebkp_index import EbkpIndex, life_expectancy_index, normalize_ebkp_code
+from modules.storage.db_manager import DatabaseManager
+from scripts.synthetic_elements import generate_elements, seed_reference_data
+
+
+def test_normalize_ebkp_code():
+    assert normalize_ebkp_code("C 02.01") == "C2.1"
+    assert normalize_ebkp_code("E03.01.02 Fenster") == "E3.1.2"
+    assert normalize_ebkp_code("c4") == "C4"
+    assert normalize_ebkp_code("n/a") == "n/a"
+
+
+def test_index_resolves_with_parent_fallback():
+    index = EbkpIndex([("C2.1", 40), ("C02.01", 30), ("C", 80), ("E3", 25)], combine=min)
+    stats = {}
+
+    values = index.resolve(["C2.1", "C02.01.05", "C4.1", "E 03", "G1", None, "C2.1"], default=60, stats=stats)
+
+    assert values == [30, 30, 80, 25, 60, 60, 30]
+    assert stats == {"hit": 3, "fallback": 2, "miss": 2}
+    assert index.stats == stats
+    assert len(index) == 3
+
+
+def test_index_follows_reference_table_and_processors_match_padded_codes(tmp_path):
+    db = DatabaseManager(str(tmp_path / "ebkp.duckdb"))
+    seed_reference_data(db, "p1")
+    index = life_expectancy_index(db)
+    assert life_expectancy_index(db) is index
+    assert index.lookup("E03.01") == 30
+
+    db.conn.execute("UPDATE life_expectancy SET years = 35 WHERE ebkp_code = 'E3.1'")
+    assert life_expectancy_index(db) is not index
+    assert life_expectancy_index(db).lookup("E3.1.1") == 35
+
+    elements = generate_elements(100, seed=3, zero_padded_share=0.5)
+    db.store_ifc_elements(elements, "p1")
+    processor = CostProcessor(None, None, None, db, project_id="p1")
+    processor.load_data()
+    processor.process_data()
+    failed = [result for result in processor.results if result["components"][0]["failed"]]
+    assert not any("KeyError" in str(result["components"][0].get("error")) for result in failed)
+    assert any(result["components"][0]["ebkp_h"].startswith(("C0", "E0", "G0")) and not result["components"][0]["failed"]
+               for result in processor.results)
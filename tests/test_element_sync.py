@@ -0,0 +1,118 @@
+import copy
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from modules.cost_processor import CostProcessor
+from modules.lca_processor import LCAProcessor
+from modules.storage.db_manager import DatabaseManager, stable_element_id
+from scripts.synthetic_elements import generate_elements, seed_reference_data
+
+RESULT_QUERY = """
+    SELECT element_id, material_name, volume, gwp_absolute, failed FROM processing_results
+    WHERE project_id = 'p1' AND result_type = 'lca' ORDER BY element_id, material_name
+"""
+
+
+def revision(elements):
+    """Elements as stored by IFCExtractBuildingElementsService: id derived from the GlobalId."""
+    revised = copy.deepcopy(elements)
+    for element in revised:
+        element["global_id"] = element["id"]
+        element["id"] = stable_element_id("p1", element["global_id"])
+    return revised
+
+
+def run_lca(db, element_ids=None):
+    processor = LCAProcessor(None, None, db, project_id="p1", element_ids=element_ids)
+    processor.memo_max_entries = 0
+    processor.load_data()
+    processor.process_data()
+    processor.save_results()
+
+
+def test_sync_writes_only_the_delta_and_lca_recomputes_changed_elements(tmp_path):
+    db = DatabaseManager(str(tmp_path / "sync.duckdb"))
+    seed_reference_data(db, "p1")
+    elements = generate_elements(50, seed=2)
+
+    first = revision(elements)
+    assert db.sync_ifc_elements(first, "p1") == {"added": [e["id"] for e in first], "changed": [], "removed": []}
+    run_lca(db)
+    # Storing the same revision again changes nothing
+    assert db.sync_ifc_elements(revision(elements), "p1") == {"added": [], "changed": [], "removed": []}
+
+    second = revision(elements[1:] + generate_elements(1, seed=9))
+    material = second[0]["materials"][0]
+    second[0]["material_volumes"][material]["volume"] *= 2
+    diff = db.sync_ifc_elements(second, "p1")
+    assert diff == {"added": [second[-1]["id"]], "changed": [second[0]["id"]], "removed": [first[0]["id"]]}
+    assert db.conn.execute("SELECT COUNT(*) FROM ifc_elements WHERE project_id = 'p1'").fetchone()[0] == 50
+
+    run_lca(db, element_ids=diff["added"] + diff["changed"])
+    incremental = db.conn.execute(RESULT_QUERY).fetchall()
+    # The history records project-wide totals, processed_elements only the recomputed ones
+    latest = db.get_project_info("p1")["latest_processing"]
+    assert (latest["total_elements"], latest["processed_elements"]) == (50, 2)
+    run_lca(db)
+    full = db.get_project_info("p1")["latest_processing"]
+    assert (full["total_elements"], full["failed_elements"]) == (50, latest["failed_elements"])
+    assert incremental == db.conn.execute(RESULT_QUERY).fetchall()
+    assert first[0]["id"] not in {row[0] for row in incremental}
+
+
+def test_project_stats_follow_writes(tmp_path):
+    db = DatabaseManager(str(tmp_path / "stats.duckdb"), write_queue=True)
+    seed_reference_data(db, "p1")
+    elements = generate_elements(30, seed=4)
+
+    db.sync_ifc_elements(revision(elements), "p1")
+    second = revision(elements[3:] + generate_elements(2, seed=8))
+    second[0]["materials"] = second[0]["materials"][:1]
+    db.sync_ifc_elements(second, "p1")
+    db.delete_ifc_element(second[1]["id"])
+    run_lca(db)
+    db.log_processing_error("p1", {"element_id": "x", "error_type": "missing_kbob"})
+    db.update_processing_history("p1", {"total_elements": 28, "processed_elements": 27, "kbob_version": "6.2"})
+
+    info = db.get_project_info("p1")
+    assert info["latest_processing"]["processed_elements"] == 27
+    maintained = {key: info[key] for key in ("total_elements", "total_materials", "total_errors")}
+    assert maintained["total_elements"] == 28
+
+    # The maintained counters match a full recount
+    db.refresh_project_stats("p1")
+    recounted = db.get_project_info("p1")
+    assert maintained == {key: recounted[key] for key in maintained}
+    assert recounted["latest_processing"] == info["latest_processing"]
+
+    db.delete_project_elements("p1")
+    info = db.get_project_info("p1")
+    assert (info["total_elements"], info["total_materials"]) == (0, 0)
+
+
+def test_incremental_cost_run_keeps_stored_failures(tmp_path):
+    db = DatabaseManager(str(tmp_path / "cost.duckdb"))
+    seed_reference_data(db, "p1")
+    elements = revision(generate_elements(20, seed=5))
+    elements[0]["properties"]["ebkp"] = "Z9.9"
+    db.sync_ifc_elements(elements, "p1")
+
+    def run_cost(element_ids=None):
+        processor = CostProcessor(None, None, None, db, project_id="p1", element_ids=element_ids)
+        processor.load_data()
+        processor.process_data()
+        processor.save_results()
+        return processor
+
+    assert run_cost().project_status == "failed"
+    # Only a valid element is recomputed; the stored failure of the unchanged one still counts
+    processor = run_cost(element_ids=[elements[1]["id"]])
+    assert processor.project_status == "failed"
+    latest = db.get_project_info("p1")["latest_processing"]
+    assert (latest["total_elements"], latest["processed_elements"]) == (20, 1)
+    assert latest["failed_elements"] >= 1
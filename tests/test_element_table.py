@@ -0,0 +1,161 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from modules.element_table import ElementTable
+from modules.lca_processor import LCAProcessor
+from modules.storage.db_manager import DatabaseManager
+from scripts.synthetic_elements import generate_elements, seed_reference_data
+
+ELEMENTS = [
+    {
+        "id": "wall",
+        "properties": {"ebkp": "C2.1"},
+        "materials": ["Beton C25/30", "Putz"],
+        "material_volumes": {
+            "Beton C25/30": {"volume": 2.0, "fraction": 0.9, "density": 2350.0},
+            "Putz": {"volume": 0.1, "fraction": 0.1},
+        },
+    },
+    {"id": "empty", "materials": [], "material_volumes": {}},
+    {
+        "guid": "slab",
+        "ebkp": "C4.1",
+        "materials": ["Beton C25/30"],
+        "material_volumes": {"Beton C25/30": {"volume": 0.0}},
+    },
+]
+
+
+def test_element_table_from_elements():
+    table = ElementTable.from_elements(ELEMENTS)
+
+    assert list(table.ids) == ["wall", "empty", "slab"]
+    assert list(table.offsets) == [0, 2, 2, 3]
+    assert table.materials == ["Beton C25/30", "Putz"]
+    assert list(table.material) == [0, 1, 0]
+    assert list(table.ebkp) == [0, -1, 1]
+    assert np.isnan(table.density[1])
+    assert list(table.element_index) == [0, 0, 2]
+
+    selected = table.select(np.array([True, False, True]))
+    assert list(selected.ids) == ["wall", "slab"]
+    assert list(selected.offsets) == [0, 2, 3]
+    assert list(selected.volume) == [2.0, 0.1, 0.0]
+
+
+def test_element_table_from_db_matches_elements(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.duckdb"))
+    try:
+        db.store_ifc_elements(ELEMENTS, "p1")
+        table = ElementTable.from_arrow(db.get_ifc_element_components("p1"))
+    finally:
+        db.close()
+
+    assert list(table.ids) == ["wall", "empty", "slab"]
+    assert list(table.offsets) == [0, 2, 2, 3]
+    assert [table.materials[code] for code in table.material] == ["Beton C25/30", "Putz", "Beton C25/30"]
+    assert [table.ebkp_codes[code] if code >= 0 else None for code in table.ebkp] == ["C2.1", None, None]
+    assert list(table.volume) == [2.0, 0.1, 0.0]
+
+
+def test_lca_processor_computes_on_element_table(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.duckdb"))
+    seed_reference_data(db, "p1")
+    db.store_ifc_elements(ELEMENTS, "p1")
+
+    processor = LCAProcessor(None, None, db, project_id="p1")
+    processor.load_data()
+    processor.process_data()
+
+    # "empty" has no materials and "slab" no positive volume
+    assert processor.rejections.to_pylist() == [
+        {"element_id": "empty", "reason": "no_materials"},
+        {"element_id": "slab", "reason": "no_positive_volume"},
+    ]
+    assert processor.rejection_summary == {"missing_id": 0, "no_materials": 1, "no_positive_volume": 1}
+    logged = db.conn.execute(
+        "SELECT element_id, error_type FROM processing_errors WHERE project_id = 'p1' ORDER BY element_id"
+    ).fetchall()
+    assert logged == [("empty", "no_materials"), ("slab", "no_positive_volume")]
+
+    results = processor.results.to_list()
+    assert [result["guid"] for result in results] == ["wall"]
+    concrete, plaster = results[0]["components"]
+    assert results[0]["shared_guid"] is True
+    assert concrete["volume"] == 2.0 and concrete["density"] == 2350.0
+    assert concrete["gwp_absolute"] == round(2.0 * 2350.0 * 0.10, 3)
+    assert concrete["gwp_relative"] == round(2.0 * 2350.0 * 0.10 / concrete["amortization"], 3)
+    # Missing density falls back to the KBOB density
+    assert plaster["density"] == 1400.0 and not plaster["failed"]
+
+    processor.save_results()
+    stored = db.conn.execute(
+        "SELECT material_name, failed FROM processing_results WHERE project_id = 'p1' ORDER BY material_name"
+    ).fetchall()
+    assert stored == [("Beton C25/30", False), ("Putz", False)]
+
+
+def test_lca_processor_sharded_matches_serial(tmp_path):
+    results = []
+    for n_jobs in (1, 2):
+        db = DatabaseManager(str(tmp_path / f"shards_{n_jobs}.duckdb"))
+        seed_reference_data(db, "p1")
+        db.store_ifc_elements(generate_elements(200, seed=3), "p1")
+        processor = LCAProcessor(None, None, db, project_id="p1")
+        processor.parallel_threshold = 0
+        processor.n_jobs = n_jobs
+        processor.load_data()
+        processor.process_data()
+        results.append(processor.results.table)
+
+    serial, sharded = results
+    assert sharded.equals(serial)
+
+
+def test_lca_processor_reuses_memoized_components(tmp_path):
+    db = DatabaseManager(str(tmp_path / "memo.duckdb"))
+    seed_reference_data(db, "p1")
+    db.store_ifc_elements(generate_elements(200, seed=5), "p1")
+
+    results = []
+    for memo_max_entries in (0, 1000, 1000):
+        processor = LCAProcessor(None, None, db, project_id="p1")
+        processor.memo_max_entries = memo_max_entries
+        processor.load_data()
+        processor.process_data()
+        results.append((processor.memo_hits, processor.results.table))
+
+    (_, plain), (first_hits, first), (second_hits, second) = results
+    assert first_hits == 0 and second_hits > 0
+    assert first.equals(plain) and second.equals(plain)
+
+    # Least recently used entries are evicted beyond the limit
+    assert db.prune_component_memo(10, 90) == 10
+
+
+def test_component_memo_follows_reimported_kbob_data(tmp_path):
+    db = DatabaseManager(str(tmp_path / "memo_kbob.duckdb"))
+    seed_reference_data(db, "p1")
+    db.store_ifc_elements(generate_elements(100, seed=6), "p1")
+
+    def gwp_total():
+        processor = LCAProcessor(None, None, db, project_id="p1")
+        processor.memo_max_entries = 1000
+        processor.load_data()
+        processor.process_data()
+        return processor.memo_hits, processor.results.table.column("gwp_absolute").to_numpy(zero_copy_only=False)
+
+    _, before = gwp_total()
+    # A corrected import of the same KBOB version replaces the indicator values
+    db.conn.execute("UPDATE kbob_materials SET indicator_co2eq = indicator_co2eq * 2")
+    hits, after = gwp_total()
+
+    assert hits == 0
+    assert np.nansum(after) > 1.9 * np.nansum(before)
@@ -0,0 +1,65 @@
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from scripts.ifc_properties import property_values
+
+
+class Entity:
+    """Minimal stand-in for an ifcopenshell entity: its type (with supertypes), id and attributes."""
+
+    def __init__(self, types, entity_id, **attributes):
+        self.types = types
+        self.entity_id = entity_id
+        self.__dict__.update(attributes)
+
+    def is_a(self, ifc_type):
+        return ifc_type in self.types
+
+    def id(self):
+        return self.entity_id
+
+
+class Model:
+    def __init__(self, entities):
+        self.entities = entities
+
+    def by_type(self, ifc_type):
+        return [entity for entity in self.entities if entity.is_a(ifc_type)]
+
+
+def prop(entity_id, name, value):
+    return Entity(["IfcPropertySingleValue"], entity_id, Name=name,
+                  NominalValue=Entity(["IfcLabel"], 0, wrappedValue=value) if value is not None else None)
+
+
+def pset(entity_id, *properties):
+    return Entity(["IfcPropertySet"], entity_id, HasProperties=properties)
+
+
+def rel(entity_id, definition, *objects):
+    return Entity(["IfcRelDefinesByProperties"], entity_id, RelatingPropertyDefinition=definition,
+                  RelatedObjects=objects)
+
+
+def test_property_values_single_pass():
+    wall, slab, window, wall_type = (Entity(["IfcWall", "IfcElement"], 1), Entity(["IfcSlab", "IfcElement"], 2),
+                                     Entity(["IfcWindow", "IfcElement"], 3), Entity(["IfcWallType"], 4))
+    shared = pset(10, prop(11, "Name", "x"), prop(12, "eBKP", " C02.01 "))
+    empty = pset(20, prop(21, "EBKP", None))
+    window_set = (pset(30, prop(31, "Other", "y")), pset(32, prop(33, "ebkp", "E3.1")))
+    model = Model([
+        rel(100, empty, wall),
+        rel(101, shared, wall, slab, wall_type),
+        rel(102, pset(40, prop(41, "ebkp", "C4.1")), slab),
+        rel(103, window_set, window),
+    ])
+
+    values = property_values(model, "EBKP")
+
+    # Empty values are skipped, the first non-empty one wins, types are not elements
+    assert values == {wall: "C02.01", slab: "C02.01", window: "E3.1"}
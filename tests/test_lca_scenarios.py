@@ -0,0 +1,94 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from modules.lca_processor import LCAProcessor
+from modules.lca_scenarios import ScenarioCache, compare_kbob_versions
+from modules.storage.db_manager import DatabaseManager
+from scripts.synthetic_elements import MATERIALS, SYNTHETIC_KBOB_VERSION, generate_elements, kbob_uuid, seed_reference_data
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "scenarios.duckdb"))
+    seed_reference_data(db, "p1")
+    db.store_ifc_elements(generate_elements(300, seed=11), "p1")
+    # A later release with doubled GWP and without densities
+    db.conn.execute("""
+        INSERT INTO kbob_materials (uuid, name, indicator_co2eq, indicator_penre, indicator_ubp, density, version)
+        SELECT uuid, name, indicator_co2eq * 2, indicator_penre, indicator_ubp, NULL, 'next'
+        FROM kbob_materials WHERE version = ?
+    """, [SYNTHETIC_KBOB_VERSION])
+    db.conn.execute("INSERT INTO kbob_versions (version, release_date, description) VALUES ('next', DATE '2030-01-01', 'Next release')")
+    yield db
+    db.close()
+
+
+def test_compare_kbob_versions_matches_processor_without_side_effects(db):
+    processor = LCAProcessor(None, None, db, project_id="p1")
+    processor.memo_max_entries = 0
+    processor.load_data()
+    processor.process_data()
+    processor.save_results()
+    stored = db.conn.execute("SELECT COUNT(*), SUM(gwp_absolute), SUM(ubp_relative) FROM processing_results").fetchone()
+
+    comparison = compare_kbob_versions(db, "p1", [SYNTHETIC_KBOB_VERSION, "next"])
+
+    current, following = comparison["versions"][SYNTHETIC_KBOB_VERSION], comparison["versions"]["next"]
+    components = processor.results_to_table().num_rows
+    # Totals of unrounded components vs. the sum of rounded ones
+    assert current["gwp_absolute"] == pytest.approx(stored[1], abs=components * 0.0005)
+    assert current["ubp_relative"] == pytest.approx(stored[2], abs=components * 0.5)
+    assert current["failed_components"] == int(processor.results_to_table().column("failed").to_numpy().sum())
+    assert sum(group["gwp_absolute"] for group in current["by_ebkp_group"].values()) == pytest.approx(current["gwp_absolute"])
+    # The synthetic model carries densities, so the missing KBOB densities do not matter
+    assert following["gwp_absolute"] == pytest.approx(2 * current["gwp_absolute"], rel=1e-9)
+    assert following["ubp_absolute"] == pytest.approx(current["ubp_absolute"])
+
+    assert comparison["active_version"] == SYNTHETIC_KBOB_VERSION
+    assert db.conn.execute("SELECT COUNT(*), SUM(gwp_absolute), SUM(ubp_relative) FROM processing_results").fetchone() == stored
+
+
+def test_compare_kbob_versions_rejects_unknown_versions(db):
+    with pytest.raises(ValueError, match="missing"):
+        compare_kbob_versions(db, "p1", ["missing"])
+
+
+def test_substitution_scenario_deltas(db):
+    cache = ScenarioCache()
+    scenario = cache.get(db, "p1")
+    result = scenario.apply({"Beton C30/37": "Beton C25/30", kbob_uuid("Stahl"): kbob_uuid("Bewehrungsstahl"), "Holz": "Stahl"})
+
+    assert result["substituted"] == {
+        "Beton C30/37": {"from": kbob_uuid("Beton C30/37"), "to": kbob_uuid("Beton C25/30")},
+        "Stahl": {"from": kbob_uuid("Stahl"), "to": kbob_uuid("Bewehrungsstahl")},
+    }
+    assert result["unmatched"] == ["Holz"]
+
+    # Substituted components keep their volume and take the density of the new material
+    expected = 0.0
+    for old, new in (("Beton C30/37", "Beton C25/30"), ("Stahl", "Bewehrungsstahl")):
+        volume, mass = db.conn.execute("""
+            SELECT SUM(m.volume), SUM(m.volume * m.density) FROM ifc_element_materials m
+            JOIN ifc_elements e ON e.id = m.element_id
+            WHERE e.project_id = 'p1' AND m.material_name = ? AND m.volume > 0
+        """, [old]).fetchone()
+        expected += volume * MATERIALS[new][0] * MATERIALS[new][1] - mass * MATERIALS[old][1]
+    # KBOB indicators are stored as REAL
+    assert result["delta"]["gwp_absolute"] == pytest.approx(expected, rel=1e-6)
+    assert sum(group["gwp_absolute"] for group in result["delta_by_ebkp_group"].values()) == pytest.approx(expected, rel=1e-6)
+    assert db.conn.execute("SELECT COUNT(*) FROM processing_results").fetchone()[0] == 0
+
+    with pytest.raises(ValueError, match="not found"):
+        scenario.apply({"Beton C30/37": "Recyclingbeton"})
+
+    # Reused until the project's elements change
+    assert cache.get(db, "p1") is scenario
+    db.store_ifc_elements(generate_elements(5, seed=12), "p1")
+    assert cache.get(db, "p1") is not scenario
@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from modules.lca_scenarios import compare_kbob_versions
+from modules.lca_uncertainty import project_uncertainty
+from modules.storage.db_manager import DatabaseManager
+from scripts.synthetic_elements import SYNTHETIC_KBOB_VERSION, generate_elements, seed_reference_data
+
+NO_UNCERTAINTY = {"volume": 0, "density": 0, "indicators": 0}
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "uncertainty.duckdb"))
+    seed_reference_data(db, "p1")
+    db.store_ifc_elements(generate_elements(200, seed=5), "p1")
+    yield db
+    db.close()
+
+
+def test_uncertainty_without_spread_matches_point_values(db):
+    expected = compare_kbob_versions(db, "p1", [SYNTHETIC_KBOB_VERSION])["versions"][SYNTHETIC_KBOB_VERSION]
+
+    # Blocks of a few components each, to cover the streaming
+    result = project_uncertainty(db, "p1", samples=8, uncertainty=NO_UNCERTAINTY, max_block_bytes=8 * 4 * 4 * 5)
+
+    assert result["failed_components"] == expected["failed_components"]
+    for name in ("gwp_absolute", "penr_relative", "ubp_absolute"):
+        assert result["project"][name]["p5"] == pytest.approx(expected[name], rel=1e-5)
+        assert result["project"][name]["p95"] == pytest.approx(expected[name], rel=1e-5)
+        for group, metrics in expected["by_ebkp_group"].items():
+            assert result["by_ebkp_group"][group][name]["p50"] == pytest.approx(metrics[name], rel=1e-5)
+    elements = result["elements"]
+    assert elements.num_rows == 200
+    assert sum(elements.column("gwp_absolute_p50").to_pylist()) == pytest.approx(expected["gwp_absolute"], rel=1e-5)
+
+
+def test_uncertainty_percentiles(db):
+    point = project_uncertainty(db, "p1", samples=1, uncertainty=NO_UNCERTAINTY)["project"]["gwp_absolute"]["p50"]
+
+    result = project_uncertainty(db, "p1", samples=2000, seed=7, percentiles=[5, 50, 95])
+    again = project_uncertainty(db, "p1", samples=2000, seed=7, percentiles=[5, 50, 95])
+
+    gwp = result["project"]["gwp_absolute"]
+    assert gwp["p5"] < gwp["p50"] < gwp["p95"]
+    # Factors have mean 1
+    assert gwp["mean"] == pytest.approx(point, rel=0.02)
+    assert result["project"] == again["project"]
+    elements = result["elements"]
+    assert all(low <= high for low, high in zip(elements.column("ubp_relative_p5").to_pylist(),
+                                                elements.column("ubp_relative_p95").to_pylist()))
+
+    with pytest.raises(ValueError, match="Unknown uncertainty"):
+        project_uncertainty(db, "p1", samples=10, uncertainty={"mass": 0.1})
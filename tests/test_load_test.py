@@ -0,0 +1,121 @@
+import io
+import json
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from modules.storage.db_manager import DatabaseManager, DEFAULT_PROJECT_ID
+import orchestrator as orchestrator_module
+from orchestrator import Orchestrator, app
+from scripts.load_test import (IFC_BUCKET, FileObjectStore, LocalBroker, LocalConsumer, LocalProducer,
+                               StubExtractionServer, load_payloads, run_load_test)
+from scripts.synthetic_elements import generate_payload, seed_reference_data
+from utils.pipeline import CACHED, SUCCEEDED
+
+
+def test_file_object_store_roundtrip(tmp_path):
+    store = FileObjectStore(str(tmp_path))
+    store.make_bucket("bucket")
+    store.put_object("bucket", "lca/project/results.parquet", io.BytesIO(b"data"), 4)
+    store.put_object("bucket", "lca/other.parquet", io.BytesIO(b"x"), 1)
+
+    assert store.get_object("bucket", "lca/project/results.parquet").read() == b"data"
+    assert [obj.object_name for obj in store.list_objects("bucket", prefix="lca/project/")] == ["lca/project/results.parquet"]
+    assert len(store.list_objects("bucket", prefix="lca/", recursive=True)) == 2
+    assert [obj.object_name for obj in store.list_objects("bucket", prefix="lca/")] == ["lca/other.parquet"]
+
+
+def test_load_test_runs_jobs_through_orchestrator(tmp_path):
+    report = run_load_test(jobs=2, concurrency=1, workdir=str(tmp_path), payloads=load_payloads(None, 20, seed=0))
+
+    assert report["succeeded"] == 2
+    assert report["extraction_requests"] == 2
+    assert report["latency_seconds"]["p50"] > 0
+    assert report["latency_seconds"]["p99"] >= report["latency_seconds"]["p50"]
+    assert report["db"]["conflict_errors"] == 0
+    assert report["db"]["operations"]["sync_ifc_elements"]["calls"] == 2
+
+
+def local_orchestrator(tmp_path, server):
+    """Orchestrator on a seeded database and a local object store holding model.ifc."""
+    db_path = str(tmp_path / "cached.duckdb")
+    seed_db = DatabaseManager(db_path)
+    seed_reference_data(seed_db, DEFAULT_PROJECT_ID)
+    seed_db.close()
+    store = FileObjectStore(str(tmp_path / "objects"))
+    store.make_bucket(IFC_BUCKET)
+    store.put_object(IFC_BUCKET, "model.ifc", io.BytesIO(b"ISO-10303-21;"), 13)
+    broker = LocalBroker()
+    return Orchestrator(consumer=LocalConsumer(broker), producer=LocalProducer(broker),
+                        db=DatabaseManager(db_path, write_queue=True), minio_client=store,
+                        ifc_api_endpoint=server.url)
+
+
+MODEL_URL = f"http://local/{IFC_BUCKET}/model.ifc"
+
+
+def test_cached_cost_stage_keeps_the_cost_status(tmp_path):
+    # An element without a cost reference fails the cost calculation
+    payload = generate_payload(30, seed=1)
+    payload["elements"][0]["properties"]["ebkp"] = "Z9.9"
+
+    with StubExtractionServer([json.dumps(payload).encode("utf-8")]) as server:
+        orchestrator = local_orchestrator(tmp_path, server)
+        orchestrator.process_ifc(MODEL_URL)
+        first_status = orchestrator.stage_results["cost"].value.project_status
+        orchestrator.process_ifc(MODEL_URL)
+
+    assert orchestrator.stage_results["cost"].status == CACHED
+    assert first_status == "failed"
+    assert orchestrator.db.get_project_info(DEFAULT_PROJECT_ID)["status"] == first_status
+    orchestrator.db.close()
+
+
+def test_lca_stage_reruns_after_kbob_reimport_of_the_same_version(tmp_path):
+    with StubExtractionServer(load_payloads(None, 30, seed=2)) as server:
+        orchestrator = local_orchestrator(tmp_path, server)
+        db = orchestrator.db
+
+        def gwp_total():
+            return db.conn.execute(
+                "SELECT SUM(gwp_absolute) FROM processing_results WHERE result_type = 'lca'"
+            ).fetchone()[0]
+
+        orchestrator.process_ifc(MODEL_URL)
+        before = gwp_total()
+        orchestrator.process_ifc(MODEL_URL)
+        assert orchestrator.stage_results["lca"].status == CACHED
+
+        # A corrected import keeps the version name but changes the indicator values
+        db.conn.execute("UPDATE kbob_materials SET indicator_co2eq = indicator_co2eq * 2")
+        orchestrator.process_ifc(MODEL_URL)
+
+    assert orchestrator.stage_results["lca"].status == SUCCEEDED
+    assert orchestrator.stage_results["cost"].status == CACHED
+    assert gwp_total() > 1.9 * before
+    db.close()
+
+
+def test_api_routes_create_the_orchestrator_on_first_use(tmp_path, monkeypatch):
+    with StubExtractionServer(load_payloads(None, 5, seed=3)) as server:
+        created = []
+
+        def create():
+            created.append(local_orchestrator(tmp_path, server))
+            return created[-1]
+
+        # Served from an import (WSGI server, flask run): no orchestrator was created on startup
+        monkeypatch.setattr(orchestrator_module, "orchestrator", None)
+        monkeypatch.setattr(orchestrator_module, "Orchestrator", create)
+        client = app.test_client()
+        first = client.get(f"/api/kbob-comparison/{DEFAULT_PROJECT_ID}?versions=unknown")
+        second = client.get(f"/api/kbob-comparison/{DEFAULT_PROJECT_ID}?versions=unknown")
+
+    assert first.status_code == second.status_code == 400
+    assert "unknown" in first.get_json()["error"]
+    assert len(created) == 1 and orchestrator_module.orchestrator is created[0]
+    created[0].db.close()
@@ -0,0 +1,108 @@
+import sys
+from pathlib import Path
+
+import pytest
+from prometheus_client import REGISTRY
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from orchestrator import Orchestrator, app
+from modules.storage.db_manager import DatabaseManager
+from scripts.load_test import LocalBroker, LocalConsumer, LocalProducer
+from utils.metrics import stage_timer, timed_db_call
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_stage_timer_records_duration_rows_and_failures():
+    count = sample("nhmzh_stage_duration_seconds_count", stage="test_stage")
+    rows = sample("nhmzh_rows_processed_total", stage="test_stage")
+    failures = sample("nhmzh_stage_failures_total", stage="test_stage")
+
+    with stage_timer("test_stage") as stage:
+        stage["rows"] = 40
+    with pytest.raises(RuntimeError):
+        with stage_timer("test_stage", rows=2):
+            raise RuntimeError("stage failed")
+
+    assert sample("nhmzh_stage_duration_seconds_count", stage="test_stage") == count + 2
+    # Rows are recorded for failed runs too, as far as they were counted
+    assert sample("nhmzh_rows_processed_total", stage="test_stage") == rows + 42
+    assert sample("nhmzh_stage_failures_total", stage="test_stage") == failures + 1
+    assert sample("nhmzh_rows_per_second", stage="test_stage") > 0
+
+
+def test_timed_db_call_records_latency_under_method_name():
+    class Manager:
+        @timed_db_call
+        def lookup_rows(self, value):
+            """Docstring kept by the decorator."""
+            if value is None:
+                raise ValueError("no value")
+            return value
+
+    count = sample("nhmzh_db_query_duration_seconds_count", operation="lookup_rows")
+    manager = Manager()
+
+    assert manager.lookup_rows(3) == 3
+    with pytest.raises(ValueError):
+        manager.lookup_rows(None)
+
+    assert sample("nhmzh_db_query_duration_seconds_count", operation="lookup_rows") == count + 2
+    assert Manager.lookup_rows.__name__ == "lookup_rows"
+    assert Manager.lookup_rows.__doc__ == "Docstring kept by the decorator."
+
+
+def test_metrics_endpoint_serves_prometheus_text():
+    with stage_timer("test_endpoint", rows=1):
+        pass
+
+    response = app.test_client().get("/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert "# TYPE nhmzh_stage_duration_seconds histogram" in body
+    assert 'nhmzh_stage_duration_seconds_count{stage="test_endpoint"} 1.0' in body
+    assert "nhmzh_queue_depth" not in body
+
+
+class CountingConsumer(LocalConsumer):
+    def __init__(self, broker):
+        super().__init__(broker)
+        self.watermark_calls = 0
+
+    def get_watermark_offsets(self, partition, timeout=1.0):
+        self.watermark_calls += 1
+        return super().get_watermark_offsets(partition, timeout)
+
+
+def test_consumer_lag_uses_cached_watermark_and_position(tmp_path):
+    broker = LocalBroker()
+    consumer = CountingConsumer(broker)
+    orchestrator = Orchestrator(consumer=consumer, producer=LocalProducer(broker),
+                                db=DatabaseManager(str(tmp_path / "lag.duckdb")))
+    for i in range(5):
+        broker.publish(orchestrator.input_topic, f"message {i}".encode("utf-8"))
+
+    def lag():
+        return sample("nhmzh_kafka_consumer_lag", topic=orchestrator.input_topic, partition="0")
+
+    orchestrator.update_consumer_lag(consumer.poll(0))
+    assert lag() == 4
+    orchestrator.update_consumer_lag(consumer.poll(0))
+    # The watermark is fetched once per refresh interval, the position moves with every message
+    assert consumer.watermark_calls == 1
+    assert lag() == 3
+
+    orchestrator.watermark_refresh_seconds = 0
+    broker.publish(orchestrator.input_topic, b"message 5")
+    orchestrator.update_consumer_lag(consumer.poll(0))
+    assert consumer.watermark_calls == 2
+    assert lag() == 3
+    orchestrator.db.close()
@@ -3,7 +3,11 @@ import pandas as pd
 import numpy as np
 from unittest.mock import Mock, patch
 import io
-from modules.storage.minio_manager import MinioManager
+import os
+import tempfile
+import pyarrow.parquet as pq
+from pyarrow import fs as pafs
+from modules.storage.minio_manager import MinioManager, ParquetWriterProfile
 
 class TestMinioManager(unittest.TestCase):
     def setUp(self):
@@ -115,9 +119,13 @@ class TestMinioManager(unittest.TestCase):
         
         # Setup mock responses
         mock_list_object = Mock()
-        mock_list_object.object_name = "test_object"
+        mock_list_object.object_name = "lca/test_project/test_file_2024-01-01T00:00:00.parquet"
         mock_list_object.last_modified = "2024-01-01"
-        mock_client.list_objects.return_value = [mock_list_object]
+        # A newer upload of another file whose name starts with the requested one
+        other_object = Mock()
+        other_object.object_name = "lca/test_project/test_file_summary_2024-02-01T00:00:00.parquet"
+        other_object.last_modified = "2024-02-01"
+        mock_client.list_objects.return_value = [mock_list_object, other_object]
         mock_client.get_object.return_value = mock_object
         
         mock_minio.return_value = mock_client
@@ -127,6 +135,7 @@ class TestMinioManager(unittest.TestCase):
 
         # Retrieve test data
         df = manager.get_lca_data("test_project", "test_file")
+        self.assertEqual(mock_client.get_object.call_args[0][1], mock_list_object.object_name)
 
         # Verify the data was retrieved correctly
         pd.testing.assert_frame_equal(df, self.test_lca_data)
@@ -144,7 +153,7 @@ class TestMinioManager(unittest.TestCase):
         
         # Setup mock responses
         mock_list_object = Mock()
-        mock_list_object.object_name = "test_object"
+        mock_list_object.object_name = "cost/test_project/test_file_2024-01-01T00:00:00.parquet"
         mock_list_object.last_modified = "2024-01-01"
         mock_client.list_objects.return_value = [mock_list_object]
         mock_client.get_object.return_value = mock_object
@@ -160,5 +169,151 @@ class TestMinioManager(unittest.TestCase):
         # Verify the data was retrieved correctly
         pd.testing.assert_frame_equal(df, self.test_cost_data)
 
+    @patch('modules.storage.minio_manager.Minio')
+    def test_store_writes_sorted_row_groups_with_statistics(self, mock_minio):
+        """Test that stored parquet data is sorted and carries row-group statistics."""
+        # Setup mock
+        mock_client = Mock()
+        mock_client.bucket_exists.return_value = True
+        mock_minio.return_value = mock_client
+
+        # Create manager instance
+        manager = MinioManager(self.mock_config)
+
+        data = pd.DataFrame({
+            'guid': ['3', '1', '2'],
+            'ebkp_h': ['E2.1', 'C2.1', 'C1.1'],
+            'gwp_absolute': [30.0, 10.0, 20.0]
+        })
+        manager.store_lca_data("test_project", "test_file", data)
+
+        # Read back what was handed to put_object
+        uploaded = mock_client.put_object.call_args[0][2]
+        parquet_file = pq.ParquetFile(uploaded)
+        stored = parquet_file.read().to_pandas()
+
+        self.assertEqual(list(stored['ebkp_h']), ['C1.1', 'C2.1', 'E2.1'])
+        stats = parquet_file.metadata.row_group(0).column(1).statistics
+        self.assertTrue(stats.has_min_max)
+        self.assertEqual(stats.min, 'C1.1')
+        self.assertEqual(stats.max, 'E2.1')
+
+    @patch('modules.storage.minio_manager.Minio')
+    def test_get_lca_data_with_columns_and_filters(self, mock_minio):
+        """Test projected and filtered reads go through the pyarrow filesystem."""
+        # Setup mock
+        mock_client = Mock()
+        mock_client.bucket_exists.return_value = True
+
+        mock_list_object = Mock()
+        mock_list_object.object_name = "lca/test_project/test_file_2024-01-01T00:00:00.parquet"
+        mock_list_object.last_modified = "2024-01-01"
+        mock_client.list_objects.return_value = [mock_list_object]
+        mock_minio.return_value = mock_client
+
+        manager = MinioManager(self.mock_config)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Lay out the object like it would be in the bucket
+            object_dir = os.path.join(tmp_dir, 'test-bucket', 'lca', 'test_project')
+            os.makedirs(object_dir)
+            data = pd.DataFrame({
+                'guid': ['1', '2', '3'],
+                'ebkp_h': ['C1.1', 'C2.1', 'C2.1'],
+                'gwp_absolute': [10.0, 20.0, 30.0]
+            })
+            data.to_parquet(os.path.join(object_dir, 'test_file_2024-01-01T00:00:00.parquet'))
+
+            manager._filesystem = pafs.SubTreeFileSystem(tmp_dir, pafs.LocalFileSystem())
+            df = manager.get_lca_data(
+                "test_project", "test_file",
+                columns=['guid', 'gwp_absolute'],
+                filters=[('ebkp_h', '=', 'C2.1')]
+            )
+
+        # Projected reads must not download the full object
+        mock_client.get_object.assert_not_called()
+        self.assertEqual(list(df.columns), ['guid', 'gwp_absolute'])
+        self.assertEqual(list(df['guid']), ['2', '3'])
+
+    @patch('modules.storage.minio_manager.Minio')
+    def test_store_uses_writer_profile(self, mock_minio):
+        """Test that the writer profile controls compression and dictionary encoding."""
+        # Setup mock
+        mock_client = Mock()
+        mock_client.bucket_exists.return_value = True
+        mock_minio.return_value = mock_client
+
+        manager = MinioManager(self.mock_config, writer_profile=ParquetWriterProfile())
+
+        data = pd.DataFrame({
+            'guid': ['1', '2'],
+            'material': ['Beton', 'Beton'],
+            'gwp_absolute': [10.0, 20.0]
+        })
+        manager.store_lca_data("test_project", "test_file", data)
+
+        uploaded = mock_client.put_object.call_args[0][2]
+        metadata = pq.ParquetFile(uploaded).metadata
+        columns = {metadata.row_group(0).column(i).path_in_schema: metadata.row_group(0).column(i)
+                   for i in range(metadata.num_columns)}
+
+        self.assertEqual(columns['material'].compression, 'ZSTD')
+        self.assertIn('RLE_DICTIONARY', columns['material'].encodings)
+        self.assertNotIn('RLE_DICTIONARY', columns['guid'].encodings)
+
+    @patch('modules.storage.minio_manager.Minio')
+    def test_partitioned_store_and_read(self, mock_minio):
+        """Test hive-partitioned exports by project and eBKP-H group."""
+        # Setup mock
+        mock_client = Mock()
+        mock_client.bucket_exists.return_value = True
+        mock_minio.return_value = mock_client
+
+        manager = MinioManager(
+            self.mock_config,
+            writer_profile=ParquetWriterProfile(partition_by_ebkp_group=True)
+        )
+
+        data = pd.DataFrame({
+            'guid': ['1', '2', '3'],
+            'ebkp_h': ['C1.1', 'C2.1', 'E2.1'],
+            'gwp_absolute': [10.0, 20.0, 30.0]
+        })
+        prefix = manager.store_lca_data("test_project", "test_file", data)
+
+        self.assertEqual(prefix, "lca/project_id=test_project/")
+        self.assertEqual(mock_client.put_object.call_count, 2)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # Replay the uploads into a local directory standing in for the bucket
+            listed = []
+            for call in mock_client.put_object.call_args_list:
+                object_path, buffer = call[0][1], call[0][2]
+                self.assertTrue(object_path.startswith(prefix + "ebkp_group="))
+                local_path = os.path.join(tmp_dir, 'test-bucket', object_path)
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                with open(local_path, 'wb') as f:
+                    f.write(buffer.getvalue())
+                listed_object = Mock()
+                listed_object.object_name = object_path
+                listed_object.last_modified = "2024-01-01"
+                listed.append(listed_object)
+            # A newer upload of another file whose name starts with the requested one is not read
+            summary_object = Mock()
+            summary_object.object_name = prefix + "ebkp_group=C/test_file_summary_2024-02-01T00:00:00.parquet"
+            summary_object.last_modified = "2024-02-01"
+            listed.append(summary_object)
+            mock_client.list_objects.return_value = listed
+
+            manager._filesystem = pafs.SubTreeFileSystem(tmp_dir, pafs.LocalFileSystem())
+            df = manager.get_lca_data(
+                "test_project", "test_file",
+                columns=['guid'],
+                filters=[('ebkp_group', '=', 'C')]
+            )
+
+        self.assertEqual(sorted(df['guid']), ['1', '2'])
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,100 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from utils.pipeline import CACHED, FAILED, SKIPPED, SUCCEEDED, Stage, fingerprint, run_stages
+
+
+def test_run_stages_runs_independent_stages_concurrently():
+    order = []
+
+    def step(name, seconds):
+        def run():
+            time.sleep(seconds)
+            order.append(name)
+            return name
+        return run
+
+    start = time.perf_counter()
+    results = run_stages([
+        Stage("extract", step("extract", 0.05)),
+        Stage("lca", step("lca", 0.3), depends_on=["extract"]),
+        Stage("cost", step("cost", 0.3), depends_on=["extract"]),
+    ])
+    elapsed = time.perf_counter() - start
+
+    assert order[0] == "extract"
+    assert all(result.status == SUCCEEDED for result in results.values())
+    assert results["lca"].value == "lca"
+    assert results["cost"].wall_seconds >= 0.3
+    # Close to the slowest path (0.35 s), not the sum of the stages (0.65 s)
+    assert elapsed < 0.6
+
+
+def test_run_stages_isolates_failures():
+    def fail():
+        raise RuntimeError("cost reference missing")
+
+    results = run_stages([
+        Stage("extract", lambda: None),
+        Stage("cost", fail, depends_on=["extract"]),
+        Stage("lca", lambda: "lca results", depends_on=["extract"]),
+        Stage("report", lambda: None, depends_on=["cost"]),
+    ])
+
+    assert results["lca"].status == SUCCEEDED and results["lca"].value == "lca results"
+    assert results["cost"].status == FAILED
+    assert results["cost"].to_dict()["error"] == "cost reference missing"
+    assert results["report"].status == SKIPPED
+
+
+def test_run_stages_rejects_cycles():
+    with pytest.raises(ValueError, match="cycle"):
+        run_stages([Stage("a", lambda: None, depends_on=["b"]), Stage("b", lambda: None, depends_on=["a"])])
+
+
+class DictFingerprints:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, stage):
+        return self.values.get(stage)
+
+    def set(self, stage, value):
+        self.values[stage] = value
+
+
+def test_run_stages_skips_stages_with_unchanged_fingerprint():
+    store = DictFingerprints()
+    calls = []
+    inputs = {"ifc": "v1", "mappings": "m1"}
+
+    def stages():
+        return [
+            Stage("extract", lambda: calls.append("extract"), fingerprint=lambda: fingerprint(inputs["ifc"])),
+            Stage("lca", lambda: calls.append("lca"), depends_on=["extract"],
+                  fingerprint=lambda: fingerprint(inputs["ifc"], inputs["mappings"])),
+            Stage("cost", lambda: calls.append("cost"), depends_on=["extract"], fingerprint=lambda: None),
+        ]
+
+    run_stages(stages(), fingerprints=store)
+    assert sorted(calls) == ["cost", "extract", "lca"]
+
+    # Same inputs: only the stage without a fingerprint runs again
+    calls.clear()
+    results = run_stages(stages(), fingerprints=store)
+    assert calls == ["cost"]
+    assert results["extract"].status == CACHED and results["lca"].ok
+
+    # Changed mappings rerun LCA only
+    calls.clear()
+    inputs["mappings"] = "m2"
+    run_stages(stages(), fingerprints=store)
+    assert sorted(calls) == ["cost", "lca"]
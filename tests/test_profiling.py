@@ -0,0 +1,118 @@
+import sys
+import time
+from pathlib import Path
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from modules.storage.db_manager import DatabaseManager
+from utils.metrics import stage_timer
+from utils.profiling import (
+    JobProfiler,
+    StackSampler,
+    StageProfiler,
+    current_profile_path,
+    diff_profiles,
+    profile_requested,
+)
+
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_stage_profiler_records_nested_stages():
+    with StageProfiler() as profiler:
+        with stage_timer("outer"):
+            with stage_timer("inner"):
+                data = [bytearray(1024) for _ in range(2048)]  # ~2 MB
+                del data
+            busy_wait(0.01)
+
+    stages = profiler.summary()
+    assert stages["outer"]["calls"] == stages["inner"]["calls"] == 1
+    assert stages["outer"]["wall_seconds"] >= stages["inner"]["wall_seconds"]
+    assert stages["inner"]["peak_memory_mb"] >= 2
+    # The inner stage's allocations count towards the outer stage
+    assert stages["outer"]["peak_memory_mb"] >= stages["inner"]["peak_memory_mb"]
+
+
+def test_stage_timer_without_profiler_is_not_recorded():
+    profiler = StageProfiler()
+    with stage_timer("unprofiled"):
+        pass
+    assert profiler.summary() == {}
+
+
+def test_stack_sampler_emits_folded_stacks():
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    busy_wait(0.1)
+    sampler.stop()
+
+    assert sampler.total_samples > 0
+    stack, count = sampler.folded()[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert stack.split(";")[-1] == "tests/test_profiling.py:busy_wait"
+    assert sampler.function_stats()[0]["function"] == "tests/test_profiling.py:busy_wait"
+
+
+def test_diff_profiles_reports_regressions():
+    base = {
+        "stages": {"lca_compute": {"wall_seconds": 1.0, "cpu_seconds": 1.0, "peak_memory_mb": 10.0}},
+        "functions": [{"function": "lca_processor.py:process_data", "self_seconds": 0.5}]
+    }
+    head = {
+        "stages": {
+            "lca_compute": {"wall_seconds": 1.5, "cpu_seconds": 1.2, "peak_memory_mb": 10.0},
+            "cost": {"wall_seconds": 0.3, "cpu_seconds": 0.3, "peak_memory_mb": 1.0}
+        },
+        "functions": [{"function": "lca_processor.py:process_data", "self_seconds": 0.9}]
+    }
+
+    diff = diff_profiles(base, head)
+
+    stages = {row["stage"]: row for row in diff["stages"]}
+    assert stages["lca_compute"]["wall_seconds_change_pct"] == 50.0
+    assert stages["lca_compute"]["peak_memory_mb_change_pct"] == 0.0
+    assert stages["cost"]["wall_seconds_change_pct"] is None
+    assert diff["functions"][0] == {
+        "function": "lca_processor.py:process_data", "self_seconds": (0.5, 0.9), "delta_seconds": 0.4
+    }
+
+
+def test_profile_requested_by_header_or_sample_rate():
+    assert profile_requested([("x-profile", b"1")])
+    assert profile_requested([("X-Profile", "true")])
+    # An explicit header wins over sampling
+    assert not profile_requested([("x-profile", b"0")], sample_rate=1.0)
+    assert not profile_requested([("traceparent", b"00-abc")])
+    assert not profile_requested(None)
+    assert profile_requested(None, sample_rate=1.0)
+
+
+def test_job_profile_is_linked_in_processing_history(tmp_path):
+    db = DatabaseManager(str(tmp_path / "test.duckdb"))
+    try:
+        with JobProfiler("profiles/test_project/profile.json", interval=0.001) as profiler:
+            with stage_timer("lca_compute"):
+                busy_wait(0.05)
+            db.update_processing_history("test_project", {"kbob_version": "2024-6.2"})
+        assert current_profile_path() is None
+
+        profile = profiler.to_dict()
+        assert profile["stages"]["lca_compute"]["calls"] == 1
+        # Production profiles skip tracemalloc
+        assert "peak_memory_mb" not in profile["stages"]["lca_compute"]
+        assert profile["samples"] > 0 and profile["stacks"]
+
+        stored = db.conn.execute(
+            "SELECT profile_path FROM processing_history WHERE project_id = ?", ["test_project"]
+        ).fetchone()[0]
+        assert stored == "profiles/test_project/profile.json"
+    finally:
+        db.close()
@@ -0,0 +1,84 @@
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from modules.storage.db_manager import DatabaseManager
+from modules.storage.retention import IdleMaintenance, run_retention
+from scripts.synthetic_elements import seed_reference_data
+
+
+def add_runs(db, project_id, runs, errors_per_run):
+    """Log runs one day apart, each with its errors shortly before its history row."""
+    for run in range(runs):
+        for error in range(errors_per_run):
+            db.conn.execute("""
+                INSERT INTO processing_errors (project_id, element_id, error_type, created_at)
+                VALUES (?, ?, ?, TIMESTAMP '2024-01-01' + to_days(?) - to_minutes(1))
+            """, [project_id, f"e{error}", "no_materials" if error % 2 else "missing_kbob", run])
+        db.conn.execute("""
+            INSERT INTO processing_history (project_id, total_elements, kbob_version, created_at)
+            VALUES (?, ?, '6.2', TIMESTAMP '2024-01-01' + to_days(?))
+        """, [project_id, errors_per_run, run])
+
+
+def test_compact_processing_logs_keeps_last_runs(tmp_path):
+    db = DatabaseManager(str(tmp_path / "retention.duckdb"))
+    seed_reference_data(db, "p1")
+    add_runs(db, "p1", runs=5, errors_per_run=4)
+    assert db.get_project_info("p1")["total_errors"] == 20
+
+    assert db.compact_processing_logs("p1", keep_runs=2) == {"errors_rolled_up": 12, "history_deleted": 3}
+
+    assert db.conn.execute("SELECT COUNT(*) FROM processing_errors").fetchone()[0] == 8
+    assert db.conn.execute("SELECT COUNT(*) FROM processing_history").fetchone()[0] == 2
+    info = db.get_project_info("p1")
+    assert info["total_errors"] == 20
+    assert info["latest_processing"]["total_elements"] == 4
+    assert db.get_error_summary("p1") == {"missing_kbob": 10, "no_materials": 10}
+
+    # Already within the window: nothing left to do; older counts accumulate
+    assert db.compact_processing_logs("p1", keep_runs=2) == {"errors_rolled_up": 0, "history_deleted": 0}
+    assert db.compact_processing_logs("p1", keep_runs=0)["errors_rolled_up"] == 8
+    assert db.get_error_summary("p1") == {"missing_kbob": 10, "no_materials": 10}
+
+
+def test_idle_maintenance_runs_retention_when_idle(tmp_path):
+    db = DatabaseManager(str(tmp_path / "idle.duckdb"), write_queue=True)
+    seed_reference_data(db, "p1")
+    add_runs(db, "p1", runs=3, errors_per_run=2)
+
+    now = [0.0]
+    maintenance = IdleMaintenance(db, keep_runs=1, idle_seconds=60, interval_seconds=600, clock=lambda: now[0])
+    now[0] = 30
+    assert maintenance.run_if_idle() is None
+
+    now[0] = 61
+    report = maintenance.run_if_idle()
+    assert report["errors_rolled_up"] == 4 and report["history_deleted"] == 2
+    assert report["checkpoints"][0]["skipped"] is False
+
+    # Not again within the interval, and not while busy
+    now[0] = 120
+    assert maintenance.run_if_idle() is None
+    maintenance.activity()
+    now[0] = 700
+    assert maintenance.run_if_idle() is not None
+
+
+def test_run_retention_checkpoints_project_shards(tmp_path):
+    db = DatabaseManager(str(tmp_path / "catalog.duckdb"), shard_dir=str(tmp_path / "shards"))
+    seed_reference_data(db, "p1")
+    with db.project_session("p1") as session:
+        add_runs(session, "p1", runs=3, errors_per_run=2)
+
+    report = run_retention(db, keep_runs=1)
+
+    assert report["projects"] == {"p1": {"errors_rolled_up": 4, "history_deleted": 2}}
+    assert [checkpoint["database"] for checkpoint in report["checkpoints"]][-1] == "catalog"
+    assert len(report["checkpoints"]) == 2
+    with db.project_session("p1") as session:
+        assert session.get_project_info("p1")["total_errors"] == 6
@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from modules.lca_processor import LCAProcessor
+from modules.storage.db_manager import DatabaseManager
+from modules.storage.shards import shard_alias, shard_path
+from scripts.synthetic_elements import generate_elements, seed_reference_data
+
+
+def test_project_sessions_work_on_their_own_shard(tmp_path):
+    shard_dir = str(tmp_path / "shards")
+    catalog = DatabaseManager(str(tmp_path / "catalog.duckdb"), shard_dir=shard_dir, max_open_shards=1)
+    for project_id in ("p1", "p2"):
+        seed_reference_data(catalog, project_id)
+
+    for project_id, count in (("p1", 30), ("p2", 20)):
+        with catalog.project_session(project_id) as db:
+            db.init_project(project_id, project_id, "N/A")
+            db.sync_ifc_elements(generate_elements(count, seed=1), project_id)
+            processor = LCAProcessor(None, None, db, project_id=project_id)
+            processor.run()
+            assert db.get_project_info(project_id)["total_elements"] == count
+        assert Path(shard_path(shard_dir, project_id)).exists()
+
+    # Project tables live in the shards only; projects and reference data in the catalog
+    tables = {row[0] for row in catalog.conn.execute(
+        "SELECT table_name FROM duckdb_tables() WHERE database_name = 'catalog'"
+    ).fetchall()}
+    assert "projects" in tables and "kbob_materials" in tables and "ifc_elements" not in tables
+    with catalog.project_session("p2") as db:
+        assert db.conn.execute("SELECT COUNT(*) FROM ifc_elements").fetchone()[0] == 20
+        assert db.conn.execute("SELECT COUNT(*) FROM processing_results WHERE result_type = 'lca'").fetchone()[0] > 0
+
+    # Only the most recently used idle shard stays attached
+    assert list(catalog._shards.attached) == [shard_alias("p2")]
+    catalog.close()
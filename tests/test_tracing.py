@@ -0,0 +1,79 @@
+import sys
+import json
+from pathlib import Path
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+
+from modules.storage.db_manager import DatabaseManager
+from utils.tracing import FileSpanExporter, current_trace_id, extract_context, init_tracing, inject_headers
+
+
+@pytest.fixture
+def provider(tmp_path):
+    """Tracer provider exporting to a local JSON lines file"""
+    trace_file = tmp_path / "traces.jsonl"
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(FileSpanExporter(str(trace_file))))
+    yield provider, trace_file
+    provider.shutdown()
+
+
+def test_trace_context_roundtrip_through_kafka_headers(provider):
+    tracer_provider, trace_file = provider
+    tracer = tracer_provider.get_tracer("test")
+
+    with tracer.start_as_current_span("producer"):
+        headers = inject_headers()
+        producer_trace_id = current_trace_id()
+
+    assert any(key == "traceparent" for key, _ in headers)
+
+    # The consumer continues the producer's trace
+    with tracer.start_as_current_span("consumer", context=extract_context(headers)):
+        assert current_trace_id() == producer_trace_id
+
+    spans = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert [span["name"] for span in spans] == ["producer", "consumer"]
+    assert spans[1]["parent_id"] == "0x" + spans[0]["context"]["span_id"][2:]
+
+
+def test_no_trace_id_outside_spans():
+    assert current_trace_id() is None
+
+
+def test_processing_history_stores_trace_id(provider, tmp_path):
+    tracer = provider[0].get_tracer("test")
+    db = DatabaseManager(str(tmp_path / "test.duckdb"))
+    try:
+        with tracer.start_as_current_span("job"):
+            trace_id = current_trace_id()
+            db.update_processing_history("test_project", {"kbob_version": "2024-6.2"})
+
+        stored = db.conn.execute(
+            "SELECT trace_id FROM processing_history WHERE project_id = ?", ["test_project"]
+        ).fetchone()[0]
+        assert stored == trace_id
+    finally:
+        db.close()
+
+
+def test_init_tracing_installs_a_single_provider(monkeypatch, tmp_path):
+    installed = []
+    monkeypatch.setattr("utils.tracing._tracing_initialized", False)
+    monkeypatch.setattr(trace, "set_tracer_provider", installed.append)
+
+    init_tracing("file", str(tmp_path / "traces.jsonl"))
+    # Later calls, e.g. from further Orchestrator instances, leave the first provider in place
+    init_tracing("file", str(tmp_path / "other.jsonl"))
+    init_tracing("console")
+
+    assert len(installed) == 1
+    installed[0].shutdown()
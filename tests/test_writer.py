@@ -0,0 +1,95 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add project root to Python path
+project_root = str(Path(__file__).parent.parent)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from modules.storage.db_manager import DatabaseManager
+from scripts.synthetic_elements import seed_reference_data
+
+
+def hold_writer(db, release, sql=None):
+    """Queue a write that keeps the writer busy (in an open transaction with sql) until release is set."""
+    def hold(writer_db):
+        if sql:
+            writer_db.conn.execute("BEGIN TRANSACTION")
+            writer_db.conn.execute(sql)
+        release.wait(5)
+        if sql:
+            writer_db.conn.execute("COMMIT")
+    return db._writer.submit(hold, None, None, (), {})
+
+
+def test_write_queue_coalesces_queued_writes(tmp_path):
+    db = DatabaseManager(str(tmp_path / "queue.duckdb"), write_queue=True)
+    seed_reference_data(db, "p1")
+    writer = db._writer
+    transactions = writer.transactions
+
+    release = threading.Event()
+    held = hold_writer(db, release)
+    futures = [db.submit_write("update_processing_history", "p1", {"total_elements": i, "kbob_version": "6.2"})
+               for i in range(20)]
+    release.set()
+    held.result(5)
+    assert [future.result(5) for future in futures] == [None] * 20
+    # The held write, then the 20 queued history rows in one transaction
+    assert writer.transactions - transactions == 2
+
+    release = threading.Event()
+    held = hold_writer(db, release)
+    valid = db.submit_write("save_stage_fingerprint", "p1", "lca", "abc")
+    invalid = db.submit_write("save_stage_fingerprint", "p1", "cost", None)
+    status = db.submit_write("update_project_status", "p1", "completed")
+    release.set()
+    held.result(5)
+    # The failing write does not take the others in its batch down
+    with pytest.raises(Exception, match="NOT NULL"):
+        invalid.result(5)
+    assert valid.result(5) is None and status.result(5) is None
+
+    assert db.conn.execute("SELECT COUNT(*) FROM processing_history WHERE project_id = 'p1'").fetchone()[0] == 20
+    assert db.get_stage_fingerprint("p1", "lca") == "abc"
+    assert db.get_project_info("p1")["status"] == "completed"
+
+
+def test_write_queue_serializes_writes_from_threads(tmp_path):
+    db = DatabaseManager(str(tmp_path / "threads.duckdb"), write_queue=True)
+    seed_reference_data(db, "p1")
+
+    def write(i):
+        forked = db.fork()
+        for j in range(10):
+            forked.save_stage_fingerprint("p1", "lca", f"{i}-{j}")
+            forked.update_project_status("p1", "processing")
+        forked.close()
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Without the queue the concurrent upserts of the same rows conflict
+    assert db.get_stage_fingerprint("p1", "lca").endswith("-9")
+
+
+def test_reads_do_not_wait_for_open_write_transaction(tmp_path):
+    db = DatabaseManager(str(tmp_path / "reads.duckdb"), write_queue=True)
+    seed_reference_data(db, "p1")
+
+    release = threading.Event()
+    held = hold_writer(db, release, "INSERT INTO stage_fingerprints (project_id, stage, fingerprint) VALUES ('p1', 'cost', 'x')")
+    try:
+        # Answered from committed data while the writer's transaction is open
+        assert db.get_stage_fingerprint("p1", "cost") is None
+        assert db.get_project_info("p1") is not None
+    finally:
+        release.set()
+    held.result(5)
+    assert db.get_stage_fingerprint("p1", "cost") == "x"
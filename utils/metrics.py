@@ -0,0 +1,104 @@
+import time
+import functools
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from utils.profiling import profile_stage
+from utils.tracing import tracer
+
+# Pipeline stages range from milliseconds (DB lookups) to minutes (extraction API on large models)
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+DB_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_DURATION = Histogram(
+    "nhmzh_stage_duration_seconds",
+    "Wall time of a pipeline stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+STAGE_FAILURES = Counter(
+    "nhmzh_stage_failures_total",
+    "Number of pipeline stage runs that raised an exception",
+    ["stage"]
+)
+DB_QUERY_DURATION = Histogram(
+    "nhmzh_db_query_duration_seconds",
+    "Latency of DatabaseManager calls",
+    ["operation"],
+    buckets=DB_BUCKETS
+)
+ROWS_PROCESSED = Counter(
+    "nhmzh_rows_processed_total",
+    "Rows (elements or components) processed by a pipeline stage",
+    ["stage"]
+)
+ROWS_PER_SECOND = Gauge(
+    "nhmzh_rows_per_second",
+    "Throughput of the latest run of a pipeline stage",
+    ["stage"]
+)
+KAFKA_CONSUMER_LAG = Gauge(
+    "nhmzh_kafka_consumer_lag",
+    "Messages between the committed position and the high watermark",
+    ["topic", "partition"]
+)
+EBKP_LOOKUPS = Counter(
+    "nhmzh_ebkp_lookups_total",
+    "eBKP code lookups in a reference index by outcome (hit, fallback to a parent code, miss)",
+    ["index", "result"]
+)
+
+
+def record_rows(stage: str, rows: int, duration: float) -> None:
+    """Record rows processed by a stage and its throughput."""
+    ROWS_PROCESSED.labels(stage=stage).inc(rows)
+    if duration > 0:
+        ROWS_PER_SECOND.labels(stage=stage).set(rows / duration)
+
+
+@contextmanager
+def stage_timer(stage: str, rows: Optional[int] = None):
+    """Time a pipeline stage, recording it in the stage histogram, as a trace span
+    and in the active StageProfiler (see utils.profiling).
+
+    The row count can be given up front or set on the yielded dict once known:
+
+        with stage_timer("cost") as stage:
+            results = ...
+            stage["rows"] = len(results)
+    """
+    stats = {"rows": rows}
+    start = time.perf_counter()
+    with tracer.start_as_current_span(stage) as span, profile_stage(stage):
+        try:
+            yield stats
+        except Exception:
+            STAGE_FAILURES.labels(stage=stage).inc()
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            STAGE_DURATION.labels(stage=stage).observe(duration)
+            if stats["rows"] is not None:
+                record_rows(stage, stats["rows"], duration)
+                span.set_attribute("rows", stats["rows"])
+
+
+def timed_db_call(func):
+    """Decorator recording the latency of a DatabaseManager method under its name."""
+    histogram = DB_QUERY_DURATION.labels(operation=func.__name__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start)
+    return wrapper
+
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """Render all metrics in the Prometheus text format."""
+    return generate_latest(), CONTENT_TYPE_LATEST
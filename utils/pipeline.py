@@ -0,0 +1,167 @@
+import time
+import hashlib
+import logging
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Name prefix of the stage worker threads, also sampled by utils.profiling.JobProfiler
+STAGE_THREAD_PREFIX = "stage"
+
+SUCCEEDED = "succeeded"
+# Not run because its input fingerprint matches the last successful run; counts as success
+CACHED = "cached"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+def fingerprint(*parts: Any) -> str:
+    """Hash the given input descriptions (content hashes, versions, ...) into one fingerprint."""
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+class Stage:
+    """A pipeline step that runs once all stages it depends on have succeeded.
+
+    fingerprint, if given, is called when the stage is due and returns a hash
+    of its inputs (or None when they cannot be fingerprinted). The stage is
+    not run when the hash matches the one of its last successful run.
+    """
+
+    def __init__(self, name: str, func: Callable[[], Any], depends_on: Sequence[str] = (),
+                 fingerprint: Optional[Callable[[], Optional[str]]] = None):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+        self.fingerprint = fingerprint
+
+
+class FingerprintStore:
+    """Fingerprints of the last successful stage runs of a project, kept in the stage_fingerprints table."""
+
+    def __init__(self, db, project_id: str):
+        self.db = db
+        self.project_id = project_id
+
+    def get(self, stage: str) -> Optional[str]:
+        return self.db.get_stage_fingerprint(self.project_id, stage)
+
+    def set(self, stage: str, value: str) -> None:
+        self.db.save_stage_fingerprint(self.project_id, stage, value)
+
+
+class StageResult:
+    def __init__(self, name: str, status: str, value: Any = None, error: Optional[BaseException] = None,
+                 wall_seconds: float = 0.0, fingerprint: Optional[str] = None):
+        self.name = name
+        self.status = status
+        self.value = value
+        self.error = error
+        self.wall_seconds = wall_seconds
+        self.fingerprint = fingerprint
+
+    @property
+    def ok(self) -> bool:
+        return self.status in (SUCCEEDED, CACHED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "wall_seconds": round(self.wall_seconds, 4),
+            "error": str(self.error) if self.error else None,
+        }
+
+
+class PipelineError(Exception):
+    """Raised after a pipeline run in which stages failed or were skipped."""
+
+    def __init__(self, results: Dict[str, StageResult]):
+        self.results = results
+        failed = [name for name, result in results.items() if not result.ok]
+        super().__init__(f"Pipeline stages did not succeed: {', '.join(failed)}")
+
+
+def _run_stage(stage: Stage, stage_fingerprint: Optional[str]) -> StageResult:
+    start = time.perf_counter()
+    try:
+        value = stage.func()
+    except Exception as e:
+        logging.exception(f"Stage {stage.name} failed")
+        return StageResult(stage.name, FAILED, error=e, wall_seconds=time.perf_counter() - start)
+    return StageResult(stage.name, SUCCEEDED, value=value, wall_seconds=time.perf_counter() - start,
+                       fingerprint=stage_fingerprint)
+
+
+def _cached_fingerprint(stage: Stage, fingerprints: Optional[FingerprintStore]) -> Tuple[Optional[str], bool]:
+    """Compute the input fingerprint of a due stage and check it against the last successful run."""
+    if stage.fingerprint is None or fingerprints is None:
+        return None, False
+    value = stage.fingerprint()
+    return value, value is not None and value == fingerprints.get(stage.name)
+
+
+def _check_dependencies(stages: List[Stage]) -> None:
+    """Raise ValueError for unknown dependencies and dependency cycles."""
+    names = {stage.name for stage in stages}
+    for stage in stages:
+        unknown = [name for name in stage.depends_on if name not in names]
+        if unknown:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages: {', '.join(unknown)}")
+    resolved = set()
+    pending = list(stages)
+    while pending:
+        ready = [stage for stage in pending if set(stage.depends_on) <= resolved]
+        if not ready:
+            raise ValueError(f"Stage dependencies contain a cycle: {', '.join(stage.name for stage in pending)}")
+        resolved.update(stage.name for stage in ready)
+        pending = [stage for stage in pending if stage.name not in resolved]
+
+
+def run_stages(stages: List[Stage], max_workers: Optional[int] = None,
+               fingerprints: Optional[FingerprintStore] = None) -> Dict[str, StageResult]:
+    """Run a DAG of stages, each as soon as its dependencies have succeeded.
+
+    Independent stages run concurrently in worker threads, each in a copy of
+    the caller's context so trace spans and profilers carry over. A failing
+    stage does not stop the others; stages depending on it are skipped.
+    With a fingerprint store, stages whose input fingerprint is unchanged
+    since their last successful run are reported as cached without running,
+    and the fingerprints of successful runs are saved.
+    Returns the result of every stage in the given order.
+    """
+    _check_dependencies(stages)
+    results: Dict[str, StageResult] = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages), thread_name_prefix=STAGE_THREAD_PREFIX) as executor:
+        while len(results) < len(stages):
+            for stage in stages:
+                if stage.name in results or stage.name in running.values():
+                    continue
+                dependencies = [results.get(name) for name in stage.depends_on]
+                if any(result is not None and not result.ok for result in dependencies):
+                    results[stage.name] = StageResult(stage.name, SKIPPED)
+                    logging.warning(f"Skipping stage {stage.name}: a dependency did not succeed")
+                elif all(result is not None for result in dependencies):
+                    try:
+                        stage_fingerprint, cached = _cached_fingerprint(stage, fingerprints)
+                    except Exception as e:
+                        logging.exception(f"Fingerprint of stage {stage.name} failed")
+                        results[stage.name] = StageResult(stage.name, FAILED, error=e)
+                        continue
+                    if cached:
+                        results[stage.name] = StageResult(stage.name, CACHED, fingerprint=stage_fingerprint)
+                        logging.info(f"Stage {stage.name} inputs unchanged since its last successful run, not rerunning")
+                        continue
+                    context = contextvars.copy_context()
+                    running[executor.submit(context.run, _run_stage, stage, stage_fingerprint)] = stage.name
+            if not running:
+                # Only skips in this pass; they resolve further stages in the next one
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results[result.name] = result
+                del running[future]
+                if result.status == SUCCEEDED and result.fingerprint is not None:
+                    fingerprints.set(result.name, result.fingerprint)
+    return {stage.name: results[stage.name] for stage in stages}
@@ -0,0 +1,312 @@
+import os
+import sys
+import json
+import time
+import random
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Kafka header requesting a profile of the job, e.g. ("x-profile", b"1")
+PROFILE_HEADER = "x-profile"
+PROFILE_TRUE_VALUES = ("1", "true", "yes")
+
+# Profile collecting stage statistics, set while a StageProfiler is active in the current thread
+_active_profiler: ContextVar[Optional["StageProfiler"]] = ContextVar("active_profiler", default=None)
+# Storage path of the profile of the running job, recorded in processing_history
+_profile_path: ContextVar[Optional[str]] = ContextVar("profile_path", default=None)
+
+
+def frame_label(frame) -> str:
+    """Label a frame as path:function, with project files relative to the project root."""
+    filename = frame.f_code.co_filename
+    if filename.startswith(PROJECT_ROOT):
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{frame.f_code.co_name}"
+
+
+class StackSampler:
+    """Sample the Python stack of one thread at a fixed interval.
+
+    Stacks are counted in folded form ("outer;inner;leaf"), the input format
+    of flamegraph.pl, speedscope and inferno. With thread_prefix, threads
+    whose name starts with it (e.g. the stage workers of utils.pipeline) are
+    sampled as well.
+    """
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None, thread_prefix: Optional[str] = None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.thread_prefix = thread_prefix
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.thread_id = self.thread_id or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            thread_ids = [self.thread_id]
+            if self.thread_prefix:
+                thread_ids += [
+                    thread.ident for thread in threading.enumerate()
+                    if thread.name.startswith(self.thread_prefix) and thread.ident != self.thread_id
+                ]
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                labels = []
+                while frame is not None:
+                    labels.append(frame_label(frame))
+                    frame = frame.f_back
+                if labels:
+                    self.stacks[";".join(reversed(labels))] += 1
+            # Holding on to the frames across the wait could make this thread drop the last
+            # reference to objects of the sampled threads and run their finalizers here
+            del frames, frame
+
+    @property
+    def total_samples(self) -> int:
+        return sum(self.stacks.values())
+
+    def folded(self) -> List[str]:
+        """Get the sampled stacks as folded lines, most frequent first."""
+        return [f"{stack} {count}" for stack, count in self.stacks.most_common()]
+
+    def function_stats(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Estimate self and total time per function from the samples, highest self time first."""
+        self_samples: Counter = Counter()
+        total_samples: Counter = Counter()
+        for stack, count in self.stacks.items():
+            labels = stack.split(";")
+            self_samples[labels[-1]] += count
+            # Recursive functions count once per sample
+            for label in set(labels):
+                total_samples[label] += count
+        hottest = sorted(total_samples, key=lambda label: (self_samples[label], total_samples[label]), reverse=True)
+        return [
+            {
+                "function": label,
+                "self_seconds": round(self_samples[label] * self.interval, 4),
+                "total_seconds": round(total_samples[label] * self.interval, 4),
+            }
+            for label in hottest[:limit]
+        ]
+
+
+class StageProfiler:
+    """Collect wall time, CPU time and tracemalloc peak memory per pipeline stage.
+
+    While active, every utils.metrics.stage_timer block of the current thread
+    is recorded. Peaks of nested stages also count towards their enclosing
+    stages. With trace_memory=False, tracemalloc (which slows down
+    allocations considerably) stays off and no memory figures are reported.
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.peak = 0
+        self._open: List[Dict[str, Any]] = []
+        self._started_tracemalloc = False
+        self._token = None
+
+    def __enter__(self) -> "StageProfiler":
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._token = _active_profiler.set(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _active_profiler.reset(self._token)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _propagate_peak(self) -> None:
+        if not self.trace_memory:
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        self.peak = max(self.peak, peak)
+        for stage in self._open:
+            stage["peak"] = max(stage["peak"], peak)
+
+    @contextmanager
+    def stage(self, name: str):
+        self._propagate_peak()
+        current = 0
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+        record = {"name": name, "baseline": current, "peak": current}
+        self._open.append(record)
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+            self._propagate_peak()
+            # Stages of concurrent threads (utils.pipeline) may close out of order
+            self._open.remove(record)
+            stats = self.stages.setdefault(name, {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0})
+            stats["calls"] += 1
+            stats["wall_seconds"] += wall
+            stats["cpu_seconds"] += cpu
+            if self.trace_memory:
+                peak_memory_mb = (record["peak"] - record["baseline"]) / 2**20
+                stats["peak_memory_mb"] = max(stats.get("peak_memory_mb", 0.0), peak_memory_mb)
+
+    def peak_memory_mb(self) -> float:
+        """Peak traced memory over the whole profile (call while active)."""
+        self._propagate_peak()
+        return self.peak / 2**20
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {key: round(value, 4) if isinstance(value, float) else value for key, value in stats.items()}
+            for name, stats in self.stages.items()
+        }
+
+
+@contextmanager
+def profile_stage(name: str):
+    """Record a stage in the active StageProfiler; does nothing when none is active."""
+    profiler = _active_profiler.get()
+    if profiler is None:
+        yield
+        return
+    with profiler.stage(name):
+        yield
+
+
+class JobProfiler:
+    """Sampling profile of one orchestrator job.
+
+    Combines a StackSampler with per-stage wall/CPU times (no tracemalloc) so
+    a production job can be profiled at low overhead. While active, the
+    storage path of the profile is available via current_profile_path().
+    """
+
+    def __init__(self, profile_path: str, interval: float = 0.01, thread_prefix: Optional[str] = "stage"):
+        self.profile_path = profile_path
+        # Also samples the stage workers of utils.pipeline.run_stages (STAGE_THREAD_PREFIX)
+        self.sampler = StackSampler(interval=interval, thread_prefix=thread_prefix)
+        self.stages = StageProfiler(trace_memory=False)
+        self.started_at = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self._token = None
+
+    def __enter__(self) -> "JobProfiler":
+        self._token = _profile_path.set(self.profile_path)
+        self.started_at = datetime.now().isoformat()
+        self.stages.__enter__()
+        self.sampler.start()
+        self._wall_start, self._cpu_start = time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self.cpu_seconds = time.process_time() - self._cpu_start
+        self.sampler.stop()
+        self.stages.__exit__(*exc)
+        _profile_path.reset(self._token)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "profile_path": self.profile_path,
+            "started_at": self.started_at,
+            "total": {
+                "wall_seconds": round(self.wall_seconds or 0.0, 4),
+                "cpu_seconds": round(self.cpu_seconds or 0.0, 4),
+            },
+            "stages": self.stages.summary(),
+            "sample_interval": self.sampler.interval,
+            "samples": self.sampler.total_samples,
+            "functions": self.sampler.function_stats(),
+            "stacks": self.sampler.folded(),
+        }
+
+
+def current_profile_path() -> Optional[str]:
+    """Get the storage path of the profile of the running job, or None when it is not profiled."""
+    return _profile_path.get()
+
+
+def profile_object_path(project_id: str) -> str:
+    """Get the MinIO object path of a new job profile, next to the project's results."""
+    return f"profiles/{project_id}/profile_{datetime.now().isoformat()}.json"
+
+
+def profile_requested(headers: Optional[Sequence[Tuple[str, Any]]], sample_rate: float = 0.0) -> bool:
+    """Decide whether to profile a job from its Kafka headers and a sampling rate.
+
+    A job is profiled when it carries the x-profile header with a true value,
+    or otherwise with probability sample_rate (PROFILE_SAMPLE_RATE).
+    """
+    for key, value in headers or []:
+        if key.lower() == PROFILE_HEADER:
+            if isinstance(value, bytes):
+                value = value.decode("utf-8", errors="replace")
+            return str(value).strip().lower() in PROFILE_TRUE_VALUES
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def load_profile(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _change(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    if not before or after is None:
+        return None
+    return round((after - before) / before * 100, 1)
+
+
+def diff_profiles(base: Dict[str, Any], head: Dict[str, Any], limit: int = 20) -> Dict[str, Any]:
+    """Compare two profile summaries written by scripts/profiler.py.
+
+    Returns per-stage changes and the functions whose sampled self time
+    changed most, largest regressions first.
+    """
+    stages = []
+    for name in sorted(set(base["stages"]) | set(head["stages"])):
+        before = base["stages"].get(name, {})
+        after = head["stages"].get(name, {})
+        row = {"stage": name}
+        for metric in ("wall_seconds", "cpu_seconds", "peak_memory_mb"):
+            row[metric] = (before.get(metric), after.get(metric))
+            row[f"{metric}_change_pct"] = _change(before.get(metric), after.get(metric))
+        stages.append(row)
+
+    before_functions = {row["function"]: row["self_seconds"] for row in base.get("functions", [])}
+    after_functions = {row["function"]: row["self_seconds"] for row in head.get("functions", [])}
+    functions = [
+        {
+            "function": label,
+            "self_seconds": (before_functions.get(label, 0.0), after_functions.get(label, 0.0)),
+            "delta_seconds": round(after_functions.get(label, 0.0) - before_functions.get(label, 0.0), 4),
+        }
+        for label in set(before_functions) | set(after_functions)
+    ]
+    functions.sort(key=lambda row: row["delta_seconds"], reverse=True)
+    return {"stages": stages, "functions": functions[:limit]}
@@ -42,6 +42,24 @@ def save_data_to_json(data, file_path: str) -> None:
     with open(file_path, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=4, ensure_ascii=False)
 
+def stream_data_to_json(items, file_path: str) -> None:
+    """Write an iterable as a compact JSON array, encoding one item at a time.
+
+    Unlike save_data_to_json, the full document is never built as one string,
+    so large result lists only need memory for the item being written.
+    """
+    if os.path.dirname(file_path):
+        ensure_output_directory(os.path.dirname(file_path))
+    encoder = json.JSONEncoder(ensure_ascii=False)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for index, item in enumerate(items):
+            if index:
+                f.write(',\n')
+            for chunk in encoder.iterencode(item):
+                f.write(chunk)
+        f.write(']')
+
 def validate_columns(data, required_columns: list) -> None:
     """Validate that all required columns/keys are present in the data structure."""
     if isinstance(data, pd.DataFrame):
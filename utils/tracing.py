@@ -0,0 +1,122 @@
+import os
+import json
+import logging
+import functools
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from opentelemetry import propagate, trace
+from opentelemetry.context import Context
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+
+SERVICE_NAME = "nhmzh-lca-cost"
+
+tracer = trace.get_tracer("nhmzh")
+
+# init_tracing installs the provider once per process; only the first set_tracer_provider call takes effect
+_tracing_initialized = False
+_tracing_lock = threading.Lock()
+
+
+class FileSpanExporter(SpanExporter):
+    """Export finished spans as JSON lines to a local file for offline analysis."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        try:
+            with self._lock, open(self.file_path, "a", encoding="utf-8") as f:
+                for span in spans:
+                    f.write(json.dumps(json.loads(span.to_json())) + "\n")
+            return SpanExportResult.SUCCESS
+        except Exception as e:
+            logging.error(f"Failed to export spans to {self.file_path}: {e}")
+            return SpanExportResult.FAILURE
+
+    def shutdown(self) -> None:
+        pass
+
+
+def init_tracing(exporter: Optional[str] = None, file_path: Optional[str] = None) -> None:
+    """Install a tracer provider with a console or file exporter.
+
+    Only the first call of a process configures tracing; later calls (e.g.
+    from further Orchestrator instances) do nothing, so no providers and
+    exporter threads are left behind.
+
+    Args:
+        exporter: "console", "file" or "none". Defaults to the TRACES_EXPORTER
+                  environment variable; without it, spans are not recorded.
+        file_path: Target of the file exporter. Defaults to TRACES_FILE_PATH.
+    """
+    global _tracing_initialized
+    with _tracing_lock:
+        if _tracing_initialized:
+            return
+        exporter = (exporter or os.getenv("TRACES_EXPORTER", "none")).lower()
+        if exporter == "none":
+            _tracing_initialized = True
+            return
+
+        if exporter == "console":
+            span_exporter = ConsoleSpanExporter()
+        elif exporter == "file":
+            span_exporter = FileSpanExporter(file_path or os.getenv("TRACES_FILE_PATH", "data/output/traces.jsonl"))
+        else:
+            raise ValueError(f"Unknown traces exporter: {exporter}")
+
+        provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+        provider.add_span_processor(BatchSpanProcessor(span_exporter))
+        trace.set_tracer_provider(provider)
+        _tracing_initialized = True
+    logging.info(f"Tracing enabled with {exporter} exporter")
+
+
+def traced(span_name: Optional[str] = None):
+    """Decorator running a function inside a span named after it (or span_name)."""
+    def decorator(func):
+        name = span_name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def extract_context(headers: Optional[List[Tuple[str, Any]]]) -> Context:
+    """Extract a trace context from Kafka message headers."""
+    carrier = {}
+    for key, value in headers or []:
+        if isinstance(value, bytes):
+            value = value.decode("utf-8", errors="replace")
+        carrier[key] = value
+    return propagate.extract(carrier)
+
+
+def inject_headers() -> List[Tuple[str, bytes]]:
+    """Get Kafka message headers carrying the current trace context."""
+    carrier: Dict[str, str] = {}
+    propagate.inject(carrier)
+    return [(key, value.encode("utf-8")) for key, value in carrier.items()]
+
+
+def current_trace_id() -> Optional[str]:
+    """Get the hex trace ID of the active span, or None when nothing is being traced."""
+    span_context = trace.get_current_span().get_span_context()
+    if not span_context.is_valid:
+        return None
+    return trace.format_trace_id(span_context.trace_id)